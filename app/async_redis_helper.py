@@ -0,0 +1,85 @@
+import asyncio
+import contextvars
+from contextlib import asynccontextmanager
+from .redis_client import create_async_redis_client
+from .redis_helper import (ENQUEUE_SCRIPT, DEQUEUE_SCRIPT, FETCH_DEPLOYMENTS_SCRIPT, cluster_queue, pack_demand,
+                           parse_deployments, priority_index, queue_keys, queue_priority)
+
+# asyncio counterparts of the queue helpers in redis_helper, over the same keys and scripts,
+# for the listener and async endpoints: many clusters can be served concurrently from one
+# event loop through a single bounded pool instead of one thread per connection.
+#
+# A client and its pool belong to the event loop that opened its connections, so the helpers
+# use the client of the current session(); run() runs a coroutine on a new event loop inside
+# one, e.g. from a Flask view.
+
+_client = contextvars.ContextVar("async_redis_client")
+
+def get_client():
+    return _client.get()
+
+@asynccontextmanager
+async def session():
+    # A client of its own for the running event loop, closed with its connections at the end
+    client = create_async_redis_client()
+    token = _client.set(client)
+    try:
+        yield client
+    finally:
+        _client.reset(token)
+        await client.close()
+
+def run(coroutine_function, *args):
+    async def main():
+        async with session():
+            return await coroutine_function(*args)
+    return asyncio.run(main())
+
+async def add_deployment_to_queue(queue, deployment_id, cpu, ram, gpu):
+    script = get_client().register_script(ENQUEUE_SCRIPT)
+    args = [deployment_id, cpu, pack_demand(cpu, ram, gpu), queue_priority(queue)[1]]
+    return await script(keys=queue_keys(queue), args=args)
+
+async def remove_deployments_from_queue(queue, deployment_ids):
+    script = get_client().register_script(DEQUEUE_SCRIPT)
+    return await script(keys=queue_keys(queue), args=[queue_priority(queue)[1], *deployment_ids])
+
+async def fetch_deployments_from_queue(queue, max_cpu, max_ram, max_gpu):
+    return await _fetch_deployments(queue, [max_cpu, max_ram, max_gpu])
+
+async def fetch_deployments_freed_from_queue(queue, previous, current):
+    return await _fetch_deployments(queue, list(current) + list(previous))
+
+async def _fetch_deployments(queue, args):
+    script = get_client().register_script(FETCH_DEPLOYMENTS_SCRIPT)
+    return parse_deployments(await script(keys=queue_keys(queue)[:2], args=args))
+
+async def queue_version(queue):
+    return int(await get_client().get(f"{queue}:version") or 0)
+
+async def queued_priorities(tag):
+    return [int(priority) for priority in await get_client().zrevrange(priority_index(tag), 0, -1)]
+
+async def fetch_clusters(capacities, priority):
+    # Fetches the queue of every cluster concurrently; `capacities` maps a cluster id to its
+    # free (cpu, ram, gpu) and the result maps it to the deployments that fit
+    cluster_ids = list(capacities)
+    results = await asyncio.gather(*(fetch_deployments_from_queue(cluster_queue(cluster_id, priority), *capacities[cluster_id])
+                                     for cluster_id in cluster_ids))
+    return dict(zip(cluster_ids, results))
+
+async def queue_summary(tag):
+    # Queued deployments and smallest (cpu, ram, gpu) demand of every non-empty level of the
+    # queues of one cluster or organization, highest level first
+    priorities = await queued_priorities(tag)
+    client = get_client()
+    queues = [f"P{priority}:{tag}" for priority in priorities]
+    lengths = await asyncio.gather(*(client.zcard(f"{queue}:index") for queue in queues))
+    bounds = await asyncio.gather(*(client.hmget(f"{queue}:bounds", "cpu", "ram", "gpu") for queue in queues))
+    return [{"priority": priority, "queued": length,
+             "min_demand": None if None in bound else [float(value) for value in bound]}
+            for priority, length, bound in zip(priorities, lengths, bounds)]
+
+async def queue_summaries(tags):
+    # queue_summary of every tag, fetched concurrently
+    return dict(zip(tags, await asyncio.gather(*(queue_summary(tag) for tag in tags))))
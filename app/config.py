@@ -6,4 +6,32 @@ load_dotenv()
 class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///site.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY')
\ No newline at end of file
+    JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY')
+    SCHEDULING_TIME_BUDGET_MS = float(os.getenv('SCHEDULING_TIME_BUDGET_MS', 5))
+    SCHEDULE_CACHE_SIZE = int(os.getenv('SCHEDULE_CACHE_SIZE', 1024))
+    # Queues whose last scheduling run is kept for warm-starting the next one
+    QUEUE_STATE_CACHE_SIZE = int(os.getenv('QUEUE_STATE_CACHE_SIZE', 1024))
+    # Priority levels accepted for deployments, e.g. "9,8,7,6,5,4,3,2,1,0"; higher levels are scheduled first
+    PRIORITY_LEVELS = sorted({int(level) for level in os.getenv('PRIORITY_LEVELS', '1,0').split(',')}, reverse=True)
+    # Finished deployments are claimed in batches of up to COMPLETION_BATCH_SIZE every
+    # COMPLETION_POLL_INTERVAL_MS; a claim not acknowledged within COMPLETION_LEASE_SECONDS is retried
+    COMPLETION_POLL_INTERVAL_MS = float(os.getenv('COMPLETION_POLL_INTERVAL_MS', 100))
+    COMPLETION_BATCH_SIZE = int(os.getenv('COMPLETION_BATCH_SIZE', 100))
+    COMPLETION_LEASE_SECONDS = float(os.getenv('COMPLETION_LEASE_SECONDS', 60))
+    # Completions claimed within this window are released together, one scheduling pass per cluster
+    COMPLETION_COALESCE_WINDOW_MS = float(os.getenv('COMPLETION_COALESCE_WINDOW_MS', 50))
+    # Threads owning the clusters; each organization's clusters are mutated by exactly one of them
+    SCHEDULER_WORKERS = int(os.getenv('SCHEDULER_WORKERS', 4))
+    # Scheduling events are spread over EVENT_PARTITIONS streams by organization; consumers read
+    # up to EVENT_BATCH_SIZE entries per partition, and take over entries another consumer left
+    # unacknowledged for EVENT_CLAIM_IDLE_MS
+    EVENT_PARTITIONS = int(os.getenv('EVENT_PARTITIONS', 16))
+    EVENT_BATCH_SIZE = int(os.getenv('EVENT_BATCH_SIZE', 100))
+    EVENT_POLL_INTERVAL_MS = float(os.getenv('EVENT_POLL_INTERVAL_MS', 50))
+    EVENT_CLAIM_IDLE_MS = int(os.getenv('EVENT_CLAIM_IDLE_MS', 60000))
+    # Allocated resources of clusters and nodes are written from the Redis capacity ledgers every
+    # CAPACITY_SYNC_INTERVAL_MS; the ledgers are checked against the database every CAPACITY_RECONCILE_INTERVAL_S
+    CAPACITY_SYNC_INTERVAL_MS = float(os.getenv('CAPACITY_SYNC_INTERVAL_MS', 1000))
+    CAPACITY_RECONCILE_INTERVAL_S = float(os.getenv('CAPACITY_RECONCILE_INTERVAL_S', 300))
+    # Deployments submitted to /submit_deployment within this window are admitted as one batch per cluster
+    ADMISSION_BATCH_WINDOW_MS = float(os.getenv('ADMISSION_BATCH_WINDOW_MS', 5))
@@ -0,0 +1,213 @@
+import argparse
+import logging
+import time
+import redis
+from threading import Thread
+from app import create_app, db
+from app.config import Config
+from app.events import ack_events, claim_stale_events, ensure_group, partition, publish_event, read_events
+from app.models.models import Cluster, Deployment
+from app.redis_helper import ack_completions, claim_due_completions
+from app.services.capacity_ledger import CapacityLedger
+from app.services.cluster_workers import cluster_workers
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# Scheduling event consumer. Start one process per share of the partitions:
+#   python -m app.event_consumer --index 0 --count 3
+#   python -m app.event_consumer --index 1 --count 3
+#   python -m app.event_consumer --index 2 --count 3
+# Each process consumes the partitions p with p % count == index, handles their events on its
+# cluster workers and also polls for finished deployments, which it publishes as events, and
+# keeps the capacity columns of the clusters of its partitions in step with their ledgers.
+
+def owned_partitions(index, count):
+    return [p for p in range(Config.EVENT_PARTITIONS) if p % count == index]
+
+def process_cluster_events(cluster_id, organization_id, release_ids, trigger, submit_ids=()):
+    from app.services.deployment_service import DeploymentService
+    released = DeploymentService.handle_expire_deployments(release_ids) if release_ids else 0
+    # Submissions are admitted after the queue had its turn at the freed capacity
+    if submit_ids:
+        DeploymentService.admit_submitted(cluster_id, organization_id, submit_ids)
+    # Releasing already ran a scheduling pass
+    if trigger and not released:
+        if cluster_id is not None:
+            DeploymentService.trigger_deployment_in_cluster(cluster_id)
+        DeploymentService.trigger_deployment_in_organization(organization_id)
+
+def handle_events(partition, entries):
+    # Coalesces the events of each cluster into one task on the worker owning it; returns the
+    # ids of the entries that were handled
+    handled = [entry_id for entry_id, event in entries if event is None]
+    groups = {}
+    for entry_id, event in entries:
+        if event is None:
+            continue
+        group = groups.setdefault((event["cluster_id"], event["organization_id"]), {"release": [], "submit": [], "trigger": False, "entries": []})
+        group["entries"].append(entry_id)
+        if event["type"] in ("release", "submit"):
+            group[event["type"]].extend(event["deployment_ids"])
+        else:
+            group["trigger"] = True
+
+    futures = {key: cluster_workers.submit(key[1], process_cluster_events, key[0], key[1], group["release"], group["trigger"], group["submit"])
+               for key, group in groups.items()}
+    for key, future in futures.items():
+        try:
+            future.result()
+            handled.extend(groups[key]["entries"])
+        except Exception as e:
+            logger.error(f"Error handling events of cluster {key[0]} in partition {partition}: {e}")
+    return handled
+
+def consume(app, index, count):
+    partitions = owned_partitions(index, count)
+    consumer = f"consumer-{index}"
+    interval = Config.EVENT_POLL_INTERVAL_MS / 1000
+    window = Config.ADMISSION_BATCH_WINDOW_MS / 1000
+    for partition in partitions:
+        ensure_group(partition)
+    logger.info(f"Consuming scheduling events of partitions {partitions} as {consumer}...")
+
+    with app.app_context():
+        # Entries given to this consumer before a restart are handled first, each read once:
+        # `pending` holds the last one read per partition until none are left. Those that fail
+        # again stay pending and are taken over by claim_stale_events once idle.
+        pending = {partition: "0" for partition in partitions}
+        last_claim = time.time()
+        while True:
+            try:
+                busy = False
+                batches = {}
+                for partition in partitions:
+                    after = pending.get(partition)
+                    entries = read_events(partition, consumer, Config.EVENT_BATCH_SIZE, after)
+                    if after is not None:
+                        if entries:
+                            pending[partition] = entries[-1][0]
+                        else:
+                            del pending[partition]
+                    if entries:
+                        batches[partition] = (entries, after is not None)
+                # Submissions arriving within ADMISSION_BATCH_WINDOW_MS of the first are admitted with it
+                waiting = [partition for partition, (entries, was_pending) in batches.items()
+                           if not was_pending and len(entries) < Config.EVENT_BATCH_SIZE
+                           and any(event and event["type"] == "submit" for _, event in entries)]
+                if waiting and window > 0:
+                    time.sleep(window)
+                    for partition in waiting:
+                        entries = batches[partition][0]
+                        entries += read_events(partition, consumer, Config.EVENT_BATCH_SIZE - len(entries))
+                for partition, (entries, _) in batches.items():
+                    busy = True
+                    ack_events(partition, handle_events(partition, entries))
+
+                if time.time() - last_claim >= Config.EVENT_CLAIM_IDLE_MS / 1000:
+                    last_claim = time.time()
+                    for partition in partitions:
+                        entries = claim_stale_events(partition, consumer, Config.EVENT_CLAIM_IDLE_MS, Config.EVENT_BATCH_SIZE)
+                        if entries:
+                            busy = True
+                            ack_events(partition, handle_events(partition, entries))
+                if not busy:
+                    time.sleep(interval)
+            except redis.exceptions.ConnectionError as e:
+                logger.error(f"Redis connection error: {e}")
+                time.sleep(5)  # Wait for 5 seconds before retrying
+            except Exception as e:
+                # Entries read but not acknowledged stay pending and are claimed again later
+                logger.exception(f"Error consuming scheduling events: {e}")
+                time.sleep(interval)
+
+def publish_completions(app, deployment_ids):
+    # Publishes one release event per cluster for the finished deployments and returns the ids
+    # that are done with; the others are retried
+    with app.app_context():
+        rows = db.session.query(Deployment.id, Deployment.cluster_id, Cluster.organization_id).outerjoin(
+            Cluster, Deployment.cluster_id == Cluster.id).filter(Deployment.id.in_(deployment_ids)).all()
+    by_cluster = {}
+    for deployment_id, cluster_id, organization_id in rows:
+        if cluster_id is not None:
+            by_cluster.setdefault((cluster_id, organization_id), []).append(deployment_id)
+    for (cluster_id, organization_id), ids in by_cluster.items():
+        publish_event("release", cluster_id, organization_id, ids)
+    return deployment_ids
+
+def poll_completions(app):
+    # Claims every finished deployment in one call per tick. Completions that came due while
+    # no poller was running are claimed on the first tick; claims of a crashed poller lapse and
+    # are retried, which is safe since only running deployments are released. Completions
+    # arriving within COMPLETION_COALESCE_WINDOW_MS of the first join the same release event.
+    interval = Config.COMPLETION_POLL_INTERVAL_MS / 1000
+    window = Config.COMPLETION_COALESCE_WINDOW_MS / 1000
+    batch_size = Config.COMPLETION_BATCH_SIZE
+    logger.info("Polling for finished deployments...")
+    while True:
+        try:
+            deployment_ids = claim_due_completions(batch_size, Config.COMPLETION_LEASE_SECONDS)
+            if deployment_ids and len(deployment_ids) < batch_size and window > 0:
+                time.sleep(window)
+                deployment_ids += claim_due_completions(batch_size - len(deployment_ids), Config.COMPLETION_LEASE_SECONDS)
+            if deployment_ids:
+                ack_completions(publish_completions(app, deployment_ids))
+            # A full batch means more are due, so claim again right away
+            if len(deployment_ids) < batch_size:
+                time.sleep(interval)
+        except redis.exceptions.ConnectionError as e:
+            logger.error(f"Redis connection error: {e}")
+            time.sleep(5)  # Wait for 5 seconds before retrying
+        except Exception as e:
+            logger.exception(f"Error publishing finished deployments: {e}")
+            time.sleep(interval)
+
+def owned_clusters(partitions):
+    return [cluster for cluster in Cluster.query.all() if partition(cluster.organization_id) in partitions]
+
+def maintain_capacity(app, index, count):
+    # Writes the allocated resources of the owned clusters from their ledgers every
+    # CAPACITY_SYNC_INTERVAL_MS, and checks the ledgers against the database every
+    # CAPACITY_RECONCILE_INTERVAL_S on this process's workers owning the clusters
+    partitions = set(owned_partitions(index, count))
+    interval = Config.CAPACITY_SYNC_INTERVAL_MS / 1000
+    last_reconcile = time.time()
+    logger.info("Syncing cluster capacity from the ledgers...")
+    with app.app_context():
+        while True:
+            try:
+                clusters = owned_clusters(partitions)
+                CapacityLedger.sync(clusters)
+                if time.time() - last_reconcile >= Config.CAPACITY_RECONCILE_INTERVAL_S:
+                    last_reconcile = time.time()
+                    futures = [cluster_workers.submit(cluster.organization_id, CapacityLedger.reconcile, cluster.id) for cluster in clusters]
+                    rebuilt = sum(1 for future in futures if future.result())
+                    if rebuilt:
+                        logger.info(f"Rebuilt the capacity ledgers of {rebuilt} clusters")
+            except redis.exceptions.ConnectionError as e:
+                logger.error(f"Redis connection error: {e}")
+                time.sleep(5)  # Wait for 5 seconds before retrying
+            except Exception as e:
+                db.session.rollback()
+                logger.exception(f"Error syncing cluster capacity: {e}")
+            finally:
+                db.session.remove()
+            time.sleep(interval)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Consume scheduling events.")
+    parser.add_argument("--index", type=int, default=0, help="Index of this consumer")
+    parser.add_argument("--count", type=int, default=1, help="Number of consumer processes")
+    args = parser.parse_args(argv)
+    if not 0 <= args.index < args.count:
+        parser.error("--index must be between 0 and --count - 1")
+
+    app = create_app()
+    cluster_workers.start(app)
+    Thread(target=poll_completions, args=(app,), daemon=True).start()
+    Thread(target=maintain_capacity, args=(app, args.index, args.count), daemon=True).start()
+    consume(app, args.index, args.count)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import logging
+from redis.exceptions import ResponseError
+from .config import Config
+from .redis_client import r
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# Scheduling events (deployments released, submitted or queued, manual triggers) are appended
+# to one of EVENT_PARTITIONS Redis streams, chosen by the organization that owns the cluster,
+# and read by a consumer group. Every partition is consumed by exactly one consumer process, so
+# the clusters of an organization still have a single writer; entries are acknowledged once
+# handled and stay pending, to be delivered again, if their consumer dies first.
+GROUP = "schedulers"
+
+def partition(organization_id):
+    return (organization_id or 0) % Config.EVENT_PARTITIONS
+
+def stream_key(partition):
+    return f"events:{{{partition}}}"
+
+def publish_event(event_type, cluster_id=None, organization_id=None, deployment_ids=()):
+    fields = {
+        "type": event_type,
+        "cluster_id": "" if cluster_id is None else cluster_id,
+        "organization_id": "" if organization_id is None else organization_id,
+        "deployment_ids": ",".join(str(deployment_id) for deployment_id in deployment_ids),
+    }
+    return r.xadd(stream_key(partition(organization_id)), fields)
+
+def parse_event(fields):
+    fields = {k.decode() if isinstance(k, bytes) else k: v.decode() if isinstance(v, bytes) else v
+              for k, v in fields.items()}
+    return {
+        "type": fields["type"],
+        "cluster_id": int(fields["cluster_id"]) if fields["cluster_id"] else None,
+        "organization_id": int(fields["organization_id"]) if fields["organization_id"] else None,
+        "deployment_ids": [int(deployment_id) for deployment_id in fields["deployment_ids"].split(",") if deployment_id],
+    }
+
+def parse_entry(entry_id, fields):
+    # The event of a stream entry, or None for one trimmed while pending or one that cannot be
+    # parsed; both are acknowledged, since delivering them again cannot help
+    if not fields:
+        return None
+    try:
+        return parse_event(fields)
+    except (KeyError, ValueError) as e:
+        logger.warning(f"Dropping malformed event {entry_id}: {e}")
+        return None
+
+def ensure_group(partition):
+    try:
+        r.xgroup_create(stream_key(partition), GROUP, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+def read_events(partition, consumer, count, after=None):
+    # New entries of the partition for this consumer, or with `after` the ones it was given
+    # before and never acknowledged that follow that entry id ("0" for the first). Returns
+    # (entry id, event) pairs, see parse_entry.
+    response = r.xreadgroup(GROUP, consumer, {stream_key(partition): ">" if after is None else after}, count=count)
+    entries = response[0][1] if response else []
+    return [(entry_id, parse_entry(entry_id, fields)) for entry_id, fields in entries]
+
+def claim_stale_events(partition, consumer, min_idle_ms, count):
+    # Takes over entries another consumer of the group left unacknowledged for min_idle_ms
+    response = r.xautoclaim(stream_key(partition), GROUP, consumer, min_idle_ms, count=count)
+    return [(entry_id, parse_entry(entry_id, fields)) for entry_id, fields in response[1]]
+
+def ack_events(partition, entry_ids):
+    # Acknowledged entries are deleted as well, so streams only hold unhandled work
+    if entry_ids:
+        pipe = r.pipeline(transaction=False)
+        pipe.xack(stream_key(partition), GROUP, *entry_ids)
+        pipe.xdel(stream_key(partition), *entry_ids)
+        pipe.execute()
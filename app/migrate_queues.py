@@ -0,0 +1,81 @@
+import argparse
+from app import create_app
+from app.models.models import Deployment
+from app.redis_client import r
+from app.redis_helper import QUEUE_NAME, index_queue, legacy_queue_name, migrate_legacy_queue, migrate_legacy_timers, add_deployment_to_queue
+
+# Converts every deployment queue written by an older version (P{priority}:cluster:{id} or
+# P{priority}:org:{id}, as three sorted sets :cpu/:ram/:gpu or as :index/:demand) to the
+# current hash-tagged index + demand layout. Run it once with the schedulers stopped, against
+# the standalone Redis the old version used, before starting the new version. Queues already in
+# the current layout are added to the priority index of their cluster or organization. A
+# deployment whose legacy record is incomplete is enqueued again from its database row if it
+# is still queued there. Running deployments the old version timed with deployment:<id> keys
+# get a completion time at the key's expiry:
+#   python -m app.migrate_queues [--dry-run]
+
+TIMER_BATCH_SIZE = 1000
+
+def legacy_queues():
+    queues = set()
+    for key in r.scan_iter(match="P*:*"):
+        key = key.decode() if isinstance(key, bytes) else key
+        legacy, _, _ = key.rpartition(":")
+        if legacy_queue_name(legacy):
+            queues.add(legacy)
+    return sorted(queues)
+
+def current_queues():
+    queues = set()
+    for key in r.scan_iter(match="P*:{*}:index"):
+        key = key.decode() if isinstance(key, bytes) else key
+        queue, _, _ = key.rpartition(":")
+        if QUEUE_NAME.match(queue):
+            queues.add(queue)
+    return sorted(queues)
+
+def legacy_timers():
+    keys = [key.decode() if isinstance(key, bytes) else key for key in r.scan_iter(match="deployment:*")]
+    return sorted(keys)
+
+def requeue(queue, deployment_ids):
+    # Enqueues the deployments still queued in the database from their rows; returns their ids
+    deployments = Deployment.query.filter(Deployment.id.in_(deployment_ids), Deployment.status == 'queued').all()
+    for deployment in deployments:
+        add_deployment_to_queue(queue, deployment.id, deployment.cpu, deployment.ram, deployment.gpu)
+    return [deployment.id for deployment in deployments]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrate deployment queues to the current Redis layout.")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the queues that would be migrated")
+    args = parser.parse_args(argv)
+
+    total = 0
+    app = None
+    for legacy in legacy_queues():
+        queue = legacy_queue_name(legacy)
+        if args.dry_run:
+            print(f"{legacy} -> {queue}")
+            continue
+        moved, dropped = migrate_legacy_queue(legacy)
+        total += moved
+        print(f"{legacy} -> {queue}: migrated {moved} deployments")
+        if dropped:
+            app = app or create_app()
+            with app.app_context():
+                requeued = requeue(queue, dropped)
+            total += len(requeued)
+            print(f"  Incomplete records of deployments {dropped}: re-enqueued {requeued} from the database, "
+                  f"the others are no longer queued")
+    timers = legacy_timers()
+    if args.dry_run:
+        print(f"{len(timers)} running deployment timers -> completions")
+    else:
+        print(f"Migrated {total} deployments")
+        indexed = sum(index_queue(queue) for queue in current_queues())
+        print(f"Indexed {indexed} queues by priority")
+        scheduled = sum(migrate_legacy_timers(timers[i:i + TIMER_BATCH_SIZE]) for i in range(0, len(timers), TIMER_BATCH_SIZE))
+        print(f"Scheduled the completion of {scheduled} running deployments")
+
+if __name__ == '__main__':
+    main()
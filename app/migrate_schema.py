@@ -0,0 +1,47 @@
+import argparse
+from sqlalchemy import inspect, text
+from app import create_app, db
+
+# Brings a database created by an older version up to the current models. create_app() runs
+# db.create_all(), which creates missing tables but never alters existing ones, so the columns
+# added to existing tables since are added here. Run it once with the app stopped, before
+# starting the new version:
+#   python -m app.migrate_schema [--dry-run]
+
+# (table, column, column definition) of every column added to an existing table
+ADDED_COLUMNS = [
+    ("deployment", "organization_id", "INTEGER REFERENCES organization (id)"),
+    ("deployment", "node_id", "INTEGER REFERENCES cluster_node (id)"),
+]
+
+def missing_columns(engine):
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    missing = []
+    for table, column, definition in ADDED_COLUMNS:
+        if table in tables and column not in {c["name"] for c in inspector.get_columns(table)}:
+            missing.append((table, column, definition))
+    return missing
+
+def upgrade(engine):
+    # Adds the missing columns in one transaction; returns the (table, column, definition) added
+    missing = missing_columns(engine)
+    with engine.begin() as connection:
+        for table, column, definition in missing:
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+    return missing
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add the columns of the current models to an existing database.")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the columns that would be added")
+    args = parser.parse_args(argv)
+
+    app = create_app()
+    with app.app_context():
+        columns = missing_columns(db.engine) if args.dry_run else upgrade(db.engine)
+    for table, column, definition in columns:
+        print(f"{table}.{column} {definition}")
+    print(f"{'Missing' if args.dry_run else 'Added'} {len(columns)} columns")
+
+if __name__ == '__main__':
+    main()
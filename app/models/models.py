@@ -57,7 +57,31 @@ class Cluster(db.Model):
             'created_at': self.created_at,
             'updated_at': self.updated_at,
             'created_by': self.created_by,
-            'organization_id': self.organization_id
+            'organization_id': self.organization_id,
+            'nodes': [node.to_dict() for node in self.nodes]
+        }
+
+class ClusterNode(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    cluster_id = db.Column(db.Integer, db.ForeignKey('cluster.id'), nullable=False)
+    cluster = db.relationship('Cluster', backref=db.backref('nodes', lazy=True))
+    total_ram = db.Column(db.Integer, nullable=False)
+    total_cpu = db.Column(db.Integer, nullable=False)
+    total_gpu = db.Column(db.Integer, nullable=False)
+    allocated_ram = db.Column(db.Integer, default=0)
+    allocated_cpu = db.Column(db.Integer, default=0)
+    allocated_gpu = db.Column(db.Integer, default=0)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'cluster_id': self.cluster_id,
+            'total_ram': self.total_ram,
+            'total_cpu': self.total_cpu,
+            'total_gpu': self.total_gpu,
+            'allocated_ram': self.allocated_ram,
+            'allocated_cpu': self.allocated_cpu,
+            'allocated_gpu': self.allocated_gpu
         }
 
 class Deployment(db.Model):
@@ -70,6 +94,9 @@ class Deployment(db.Model):
     status = db.Column(db.String(50), nullable=False, default='queued')
     cluster_id = db.Column(db.Integer, db.ForeignKey('cluster.id'), nullable=True)
     cluster = db.relationship('Cluster', backref='deployments')
+    node_id = db.Column(db.Integer, db.ForeignKey('cluster_node.id'), nullable=True)
+    node = db.relationship('ClusterNode', backref='deployments')
+    organization_id = db.Column(db.Integer, db.ForeignKey('organization.id'), nullable=True)  # Set for deployments that may run on any cluster of the organization
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
     created_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -84,6 +111,8 @@ class Deployment(db.Model):
             'priority': self.priority,
             'status': self.status,
             'cluster_id': self.cluster_id,
+            'organization_id': self.organization_id,
+            'node_id': self.node_id,
             'created_at': self.created_at,
             'updated_at': self.updated_at,
             'created_by': self.created_by
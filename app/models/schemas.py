@@ -1,4 +1,4 @@
-from marshmallow import Schema, fields, ValidationError
+from marshmallow import Schema, fields, ValidationError, validates_schema
 
 # Schemas for validation
 class RegisterSchema(Schema):
@@ -12,11 +12,17 @@ class LoginSchema(Schema):
 class JoinOrganizationSchema(Schema):
     invite_code = fields.Str(required=True)
 
+class ClusterNodeSchema(Schema):
+    total_ram = fields.Int(required=True)
+    total_cpu = fields.Int(required=True)
+    total_gpu = fields.Int(required=True)
+
 class CreateClusterSchema(Schema):
     name = fields.Str(required=True)
     total_ram = fields.Int(required=True)
     total_cpu = fields.Int(required=True)
     total_gpu = fields.Int(required=True)
+    nodes = fields.List(fields.Nested(ClusterNodeSchema))  # Optional machines making up the cluster
 
 class CreateDeploymentSchema(Schema):
     name = fields.Str(required=True)
@@ -25,4 +31,10 @@ class CreateDeploymentSchema(Schema):
     gpu = fields.Int(required=True)
     priority = fields.Int(required=True)
     docker_path = fields.Str(required=True)
-    cluster_name = fields.Str(required=True)
\ No newline at end of file
+    cluster_name = fields.Str()
+    any_cluster = fields.Bool(load_default=False)  # Run on any cluster of the user's organization
+
+    @validates_schema
+    def validate_cluster(self, data, **kwargs):
+        if not data.get('any_cluster') and not data.get('cluster_name'):
+            raise ValidationError("cluster_name is required unless any_cluster is set", "cluster_name")
\ No newline at end of file
@@ -1,7 +1,76 @@
 import redis
+import redis.asyncio
+from redis.cluster import RedisCluster
 import os
 
 redis_host = os.getenv('REDIS_HOST', 'localhost')
 redis_port = int(os.getenv('REDIS_PORT', 6379))
+# 'standalone' for a single server, 'cluster' for a Redis Cluster (any node is enough to discover the others)
+redis_mode = os.getenv('REDIS_MODE', 'standalone')
 
-r = redis.Redis(host=redis_host, port=redis_port, db=0)
\ No newline at end of file
+# Connections per pool (per node in cluster mode). When all are busy a caller waits up to
+# REDIS_POOL_TIMEOUT seconds for one to be returned instead of opening more.
+redis_max_connections = int(os.getenv('REDIS_MAX_CONNECTIONS', 50))
+redis_pool_timeout = float(os.getenv('REDIS_POOL_TIMEOUT', 5))
+redis_socket_timeout = float(os.getenv('REDIS_SOCKET_TIMEOUT', 5))
+redis_connect_timeout = float(os.getenv('REDIS_CONNECT_TIMEOUT', 2))
+# Idle connections older than this many seconds are checked with a PING before reuse
+redis_health_check_interval = int(os.getenv('REDIS_HEALTH_CHECK_INTERVAL', 30))
+
+# Commands are never re-sent after a timeout or a dropped connection: the queue, capacity and
+# completion scripts are not idempotent (a retried reserve or enqueue would apply twice), so
+# the error reaches the caller, which knows whether the command may be repeated.
+def connection_options():
+    return {
+        'socket_timeout': redis_socket_timeout,
+        'socket_connect_timeout': redis_connect_timeout,
+        'health_check_interval': redis_health_check_interval,
+    }
+
+# A cluster client re-runs a command on any node error by default; one attempt keeps the above
+# (redirects after a slot moves are still followed)
+cluster_options = {'cluster_error_retry_attempts': 1}
+
+def create_standalone_client(host, port):
+    pool = redis.BlockingConnectionPool(host=host, port=port, db=0, max_connections=redis_max_connections,
+                                        timeout=redis_pool_timeout, **connection_options())
+    return redis.Redis(connection_pool=pool)
+
+def create_cluster_client(host, port):
+    return RedisCluster(host=host, port=port, max_connections=redis_max_connections, **cluster_options, **connection_options())
+
+def create_async_standalone_client(host, port):
+    pool = redis.asyncio.BlockingConnectionPool(host=host, port=port, db=0, max_connections=redis_max_connections,
+                                                timeout=redis_pool_timeout, **connection_options())
+    client = redis.asyncio.Redis(connection_pool=pool)
+    # The client owns its pool, so closing the client closes its connections too
+    client.auto_close_connection_pool = True
+    return client
+
+def create_async_cluster_client(host, port):
+    # The asyncio cluster client of redis-py 4.3 keeps one unbounded pool per node
+    return redis.asyncio.RedisCluster(host=host, port=port, **cluster_options, **connection_options())
+
+# Client factories by mode; register another one here to plug in a different client
+CLIENT_FACTORIES = {
+    'standalone': create_standalone_client,
+    'cluster': create_cluster_client,
+}
+
+ASYNC_CLIENT_FACTORIES = {
+    'standalone': create_async_standalone_client,
+    'cluster': create_async_cluster_client,
+}
+
+def create_redis_client(mode=redis_mode, host=redis_host, port=redis_port):
+    if mode not in CLIENT_FACTORIES:
+        raise ValueError(f"Unknown Redis mode: {mode}")
+    return CLIENT_FACTORIES[mode](host, port)
+
+def create_async_redis_client(mode=redis_mode, host=redis_host, port=redis_port):
+    # Connections are opened lazily on the event loop that first uses the client
+    if mode not in ASYNC_CLIENT_FACTORIES:
+        raise ValueError(f"Unknown Redis mode: {mode}")
+    return ASYNC_CLIENT_FACTORIES[mode](host, port)
+
+r = create_redis_client()
@@ -1,30 +1,490 @@
+import re
+import time
+from redis.exceptions import RedisError
 from .redis_client import r
 from .scheduling.deployment_dto import DeploymentDto
 
-def add_deployment_to_redis(cluster_id, priority, deployment_id, cpu, ram, gpu):
-    r.zadd(f"P{priority}:cluster:{cluster_id}:cpu", {deployment_id: cpu})
-    r.zadd(f"P{priority}:cluster:{cluster_id}:ram", {deployment_id: ram})
-    r.zadd(f"P{priority}:cluster:{cluster_id}:gpu", {deployment_id: gpu})
+# Deployments bound to one cluster are queued per cluster; deployments submitted to
+# "any cluster" of an organization are queued per organization. The cluster (or organization)
+# is the hash tag of every key, so on a Redis Cluster all keys of one cluster live in the same
+# slot and the multi-key scripts below run on one shard, while different clusters spread out.
+def cluster_tag(cluster_id):
+    return f"{{cluster:{cluster_id}}}"
 
-def remove_deployment_from_redis(cluster_id, priority, deployment_id):
-    r.zrem(f"P{priority}:cluster:{cluster_id}:cpu", deployment_id)
-    r.zrem(f"P{priority}:cluster:{cluster_id}:ram", deployment_id)
-    r.zrem(f"P{priority}:cluster:{cluster_id}:gpu", deployment_id)
+def org_tag(organization_id):
+    return f"{{org:{organization_id}}}"
 
-def fetch_deployments(cluster_id, priority, max_cpu, max_ram, max_gpu):
+def cluster_queue(cluster_id, priority):
+    return f"P{priority}:{cluster_tag(cluster_id)}"
+
+def org_queue(organization_id, priority):
+    return f"P{priority}:{org_tag(organization_id)}"
+
+# Every cluster (or organization) keeps {tag}:priorities, a sorted set of the priority levels
+# that have a non-empty queue scored by the level, so a drain visits only levels with work,
+# highest first, however many levels are configured.
+QUEUE_NAME = re.compile(r"P(-?\d+):(\{[^}]*\})$")
+
+def priority_index(tag):
+    return f"{tag}:priorities"
+
+def queue_priority(queue):
+    # The priority index a queue is listed in, and its level
+    priority, tag = QUEUE_NAME.search(queue).groups()
+    return priority_index(tag), int(priority)
+
+def queued_priorities(tag):
+    # Levels with queued deployments, highest first
+    return [int(priority) for priority in r.zrevrange(priority_index(tag), 0, -1)]
+
+# Each queue is stored as two keys: {queue}:index, a sorted set of deployment ids scored by
+# cpu, and {queue}:demand, a hash of deployment id to its packed "cpu:ram:gpu" demand.
+# {queue}:version is bumped on every change, so cached views of a queue can tell when they
+# are stale, and {queue}:bounds holds the smallest cpu, ram and gpu demand queued, so a
+# scheduler can tell in one read that nothing queued fits. Enqueue and dequeue are scripts,
+# so all keys change atomically in one round trip (cluster clients do not support MULTI/EXEC).
+def pack_demand(cpu, ram, gpu):
+    return f"{cpu}:{ram}:{gpu}"
+
+def unpack_demand(record):
+    if isinstance(record, bytes):
+        record = record.decode()
+    return tuple(float(value) for value in record.split(":"))
+
+def queue_keys(queue):
+    return [f"{queue}:index", f"{queue}:demand", f"{queue}:version", f"{queue}:bounds", queue_priority(queue)[0]]
+
+# Queues one or more deployments of the same hash tag, each given by the five queue_keys of
+# its queue and four arguments: id, cpu, packed demand and level. Returns the last version.
+ENQUEUE_SCRIPT = """
+local version
+local n = 0
+for k = 1, #KEYS, 5 do
+    local a = n * 4
+    redis.call('ZADD', KEYS[k], ARGV[a + 2], ARGV[a + 1])
+    redis.call('HSET', KEYS[k + 1], ARGV[a + 1], ARGV[a + 3])
+    local demand = {string.match(ARGV[a + 3], '([^:]+):([^:]+):([^:]+)')}
+    local bounds = redis.call('HMGET', KEYS[k + 3], 'cpu', 'ram', 'gpu')
+    for i, field in ipairs({'cpu', 'ram', 'gpu'}) do
+        if not bounds[i] or tonumber(demand[i]) < tonumber(bounds[i]) then
+            redis.call('HSET', KEYS[k + 3], field, demand[i])
+        end
+    end
+    redis.call('ZADD', KEYS[k + 4], ARGV[a + 4], ARGV[a + 4])
+    version = redis.call('INCR', KEYS[k + 2])
+    n = n + 1
+end
+return version
+"""
+
+# Removes the deployments ARGV[2..] from a queue of level ARGV[1]. Removing deployments that
+# held a bound recomputes it once: the cpu bound is the head of the index; the ram and gpu
+# bounds scan the demands, stopping as soon as another deployment with the old bound turns up,
+# since the bound cannot drop below it (with many equal demands, such as gpu 0, that is almost
+# immediately).
+DEQUEUE_SCRIPT = """
+local removed = {}
+for k = 2, #ARGV do
+    local record = redis.call('HGET', KEYS[2], ARGV[k])
+    if record then
+        removed[#removed + 1] = {string.match(record, '([^:]+):([^:]+):([^:]+)')}
+        redis.call('ZREM', KEYS[1], ARGV[k])
+        redis.call('HDEL', KEYS[2], ARGV[k])
+    end
+end
+if #removed > 0 then
+    if redis.call('ZCARD', KEYS[1]) == 0 then
+        redis.call('DEL', KEYS[4])
+        redis.call('ZREM', KEYS[5], ARGV[1])
+        return redis.call('INCR', KEYS[3])
+    end
+    local bounds = redis.call('HMGET', KEYS[4], 'cpu', 'ram', 'gpu')
+    local held = {}
+    for _, demand in ipairs(removed) do
+        for i = 1, 3 do
+            if not bounds[i] or tonumber(demand[i]) <= tonumber(bounds[i]) then
+                held[i] = true
+            end
+        end
+    end
+    if held[1] then
+        redis.call('HSET', KEYS[4], 'cpu', redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')[2])
+    end
+    local stale = {}
+    for i = 2, 3 do
+        if held[i] then
+            stale[i] = bounds[i] and tonumber(bounds[i])
+        end
+    end
+    if next(stale) then
+        local lowest = {}
+        local cursor = '0'
+        repeat
+            local page = redis.call('HSCAN', KEYS[2], cursor, 'COUNT', 100)
+            cursor = page[1]
+            for j = 2, #page[2], 2 do
+                local values = {string.match(page[2][j], '([^:]+):([^:]+):([^:]+)')}
+                for i in pairs(stale) do
+                    local value = tonumber(values[i])
+                    if not lowest[i] or value < lowest[i] then
+                        lowest[i] = value
+                    end
+                end
+            end
+            local settled = true
+            for i, old in pairs(stale) do
+                if not (old and lowest[i] and lowest[i] <= old) then
+                    settled = false
+                end
+            end
+        until settled or tonumber(cursor) == 0
+        for i in pairs(stale) do
+            redis.call('HSET', KEYS[4], i == 2 and 'ram' or 'gpu', lowest[i])
+        end
+    end
+end
+return redis.call('INCR', KEYS[3])
+"""
+
+def add_deployment_to_queue(queue, deployment_id, cpu, ram, gpu):
+    script = r.register_script(ENQUEUE_SCRIPT)
+    return script(keys=queue_keys(queue), args=[deployment_id, cpu, pack_demand(cpu, ram, gpu), queue_priority(queue)[1]])
+
+def remove_deployments_from_queue(queue, deployment_ids):
+    script = r.register_script(DEQUEUE_SCRIPT)
+    return script(keys=queue_keys(queue), args=[queue_priority(queue)[1], *deployment_ids])
+
+# Selects, in one round trip, the queued deployments whose demands all fit the limits in
+# ARGV[1..3] (cpu, ram, gpu) and returns them as a flat list of id, cpu, ram, gpu. When a
+# previous capacity is given in ARGV[4..6] only deployments with a demand above it are
+# returned, i.e. the ones that fit now but did not fit back then; if only the cpu grew that
+# is a range of the index, otherwise every deployment within the cpu limit is checked.
+FETCH_DEPLOYMENTS_SCRIPT = """
+local max_cpu, max_ram, max_gpu = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local freed = #ARGV == 6
+local min_cpu = 0
+if freed and tonumber(ARGV[5]) >= max_ram and tonumber(ARGV[6]) >= max_gpu then
+    min_cpu = '(' .. ARGV[4]
+end
+local result = {}
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[1], min_cpu, ARGV[1])) do
+    local record = redis.call('HGET', KEYS[2], id)
+    if record then
+        local cpu, ram, gpu = string.match(record, '([^:]+):([^:]+):([^:]+)')
+        local fits = tonumber(ram) <= max_ram and tonumber(gpu) <= max_gpu
+        if fits and freed then
+            fits = tonumber(cpu) > tonumber(ARGV[4]) or tonumber(ram) > tonumber(ARGV[5]) or tonumber(gpu) > tonumber(ARGV[6])
+        end
+        if fits then
+            result[#result + 1] = id
+            result[#result + 1] = cpu
+            result[#result + 1] = ram
+            result[#result + 1] = gpu
+        end
+    end
+end
+return result
+"""
+
+def fetch_deployments_from_queue(queue, max_cpu, max_ram, max_gpu):
     # Fetch deployments within score limits
-    cpu_deployments = r.zrangebyscore(f"P{priority}:cluster:{cluster_id}:cpu", 0, max_cpu)
-    ram_deployments = r.zrangebyscore(f"P{priority}:cluster:{cluster_id}:ram", 0, max_ram)
-    gpu_deployments = r.zrangebyscore(f"P{priority}:cluster:{cluster_id}:gpu", 0, max_gpu)
-
-    # Find the intersection of all three sets
-    deployment_ids = set(ram_deployments) & set(cpu_deployments) & set(gpu_deployments)
-
-    # Fetch RAM, CPU, and GPU values for each deployment
-    deployment_resources = []
-    for deployment_id in deployment_ids:
-        ram = r.zscore(f"P{priority}:cluster:{cluster_id}:ram", deployment_id)
-        cpu = r.zscore(f"P{priority}:cluster:{cluster_id}:cpu", deployment_id)
-        gpu = r.zscore(f"P{priority}:cluster:{cluster_id}:gpu", deployment_id)
-        deployment_resources.append(DeploymentDto(deployment_id, ram, cpu, gpu))
-    return deployment_resources
+    return _fetch_deployments(queue, [max_cpu, max_ram, max_gpu])
+
+def fetch_deployments_freed_from_queue(queue, previous, current):
+    # Deployments that fit the `current` free capacity but did not fit the `previous` one, both
+    # (cpu, ram, gpu) tuples: at least one of their demands lies between the two capacities.
+    return _fetch_deployments(queue, list(current) + list(previous))
+
+def _fetch_deployments(queue, args):
+    script = r.register_script(FETCH_DEPLOYMENTS_SCRIPT)
+    return parse_deployments(script(keys=queue_keys(queue)[:2], args=args))
+
+def parse_deployments(result):
+    # The flat id, cpu, ram, gpu list returned by the fetch script
+    return [DeploymentDto(result[i], cpu=float(result[i + 1]), memory=float(result[i + 2]), gpu=float(result[i + 3]))
+            for i in range(0, len(result), 4)]
+
+# Running deployments are simulated by a completion time: {deployments}:completions is a sorted
+# set of deployment ids scored by when they finish (both keys share a hash tag). A poller claims every due id in one call;
+# claimed ids move to {deployments}:claimed, scored by when the claim lapses, and are removed
+# once handled, so completions due while no poller runs, or claimed by one that crashes, are
+# picked up by the next claim instead of being lost.
+COMPLETIONS = "{deployments}:completions"
+CLAIMED = "{deployments}:claimed"
+
+CLAIM_COMPLETIONS_SCRIPT = """
+local now, lease, limit = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local ids = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', now, 'LIMIT', 0, limit)
+if #ids < limit then
+    for _, id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now, 'LIMIT', 0, limit - #ids)) do
+        ids[#ids + 1] = id
+    end
+end
+for _, id in ipairs(ids) do
+    redis.call('ZREM', KEYS[1], id)
+    redis.call('ZADD', KEYS[2], now + lease, id)
+end
+return ids
+"""
+
+def schedule_completions(ttls):
+    # Schedules the completions of running deployments, `ttls` mapping each id to its ttl
+    if ttls:
+        now = time.time()
+        r.zadd(COMPLETIONS, {deployment_id: now + ttl for deployment_id, ttl in ttls.items()})
+
+def cancel_completions(deployment_ids):
+    if deployment_ids:
+        r.zrem(COMPLETIONS, *deployment_ids)
+
+def enqueue_deployments(queued):
+    # Queues deployments, given as (queue, id, cpu, ram, gpu) tuples, with one script call per
+    # cluster (or organization): its keys share a slot, so this also runs on a Redis Cluster,
+    # whose pipelines cannot run scripts. Returns whether each was queued.
+    by_tag = {}
+    for i, entry in enumerate(queued):
+        by_tag.setdefault(queue_priority(entry[0])[0], []).append(i)
+    script = r.register_script(ENQUEUE_SCRIPT)
+    done = [False] * len(queued)
+    for indexes in by_tag.values():
+        keys, args = [], []
+        for i in indexes:
+            queue, deployment_id, cpu, ram, gpu = queued[i]
+            keys += queue_keys(queue)
+            args += [deployment_id, cpu, pack_demand(cpu, ram, gpu), queue_priority(queue)[1]]
+        try:
+            script(keys=keys, args=args)
+        except RedisError:
+            continue
+        for i in indexes:
+            done[i] = True
+    return done
+
+def claim_due_completions(limit, lease):
+    # Ids of up to `limit` deployments that have finished, claimed for `lease` seconds
+    script = r.register_script(CLAIM_COMPLETIONS_SCRIPT)
+    ids = script(keys=[COMPLETIONS, CLAIMED], args=[time.time(), lease, limit])
+    return [int(deployment_id) for deployment_id in ids]
+
+def ack_completions(deployment_ids):
+    if deployment_ids:
+        r.zrem(CLAIMED, *deployment_ids)
+
+# Capacity ledger: {cluster:<id>}:capacity is a hash of the cluster's free cpu, ram and gpu
+# and, for clusters made up of nodes, of every node's (node:<node id>:cpu, ...). Reserving
+# checks that the deployment fits the cluster (and node) and takes its resources in one script
+# call, so concurrent admissions cannot over-commit a cluster. Every change bumps `version`.
+CAPACITY_RESOURCES = ("cpu", "ram", "gpu")
+
+def capacity_key(cluster_id):
+    return f"{cluster_tag(cluster_id)}:capacity"
+
+def node_field(node_id, resource):
+    return f"node:{node_id}:{resource}"
+
+# ARGV holds one (cpu, ram, gpu, node id or '') group per deployment; each one that fits the
+# cluster (and node) is reserved in turn. Returns -1 when the ledger is not loaded, otherwise
+# 1 or 0 per deployment for whether it was reserved.
+RESERVE_CAPACITY_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return -1
+end
+local resources = {'cpu', 'ram', 'gpu'}
+local result = {}
+for g = 1, #ARGV, 4 do
+    local prefixes = {''}
+    if ARGV[g + 3] ~= '' then
+        prefixes[2] = 'node:' .. ARGV[g + 3] .. ':'
+    end
+    local fits = 1
+    for _, prefix in ipairs(prefixes) do
+        for i, resource in ipairs(resources) do
+            if tonumber(redis.call('HGET', KEYS[1], prefix .. resource) or '0') < tonumber(ARGV[g + i - 1]) then
+                fits = 0
+            end
+        end
+    end
+    if fits == 1 then
+        for _, prefix in ipairs(prefixes) do
+            for i, resource in ipairs(resources) do
+                redis.call('HINCRBY', KEYS[1], prefix .. resource, -tonumber(ARGV[g + i - 1]))
+            end
+        end
+    end
+    result[#result + 1] = fits
+end
+redis.call('HINCRBY', KEYS[1], 'version', 1)
+return result
+"""
+
+RELEASE_CAPACITY_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return -1
+end
+local resources = {'cpu', 'ram', 'gpu'}
+for g = 1, #ARGV, 4 do
+    for i, resource in ipairs(resources) do
+        redis.call('HINCRBY', KEYS[1], resource, ARGV[g + i - 1])
+        if ARGV[g + 3] ~= '' then
+            redis.call('HINCRBY', KEYS[1], 'node:' .. ARGV[g + 3] .. ':' .. resource, ARGV[g + i - 1])
+        end
+    end
+end
+redis.call('HINCRBY', KEYS[1], 'version', 1)
+return 1
+"""
+
+# Replaces the ledger with ARGV[2..] (field, amount pairs). With an empty ARGV[1] only a missing
+# ledger is written; otherwise only one still at version ARGV[1], so a reservation or release
+# made while the replacement was computed is not lost.
+LOAD_CAPACITY_SCRIPT = """
+local version = tonumber(redis.call('HGET', KEYS[1], 'version') or '-1')
+if redis.call('EXISTS', KEYS[1]) == 1 and (ARGV[1] == '' or tonumber(ARGV[1]) ~= version) then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+for i = 2, #ARGV, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('HSET', KEYS[1], 'version', version + 1)
+return 1
+"""
+
+def capacity_args(demands):
+    # Script arguments for (cpu, ram, gpu, node id) demands
+    args = []
+    for cpu, ram, gpu, node_id in demands:
+        args += [int(cpu), int(ram), int(gpu), "" if node_id is None else node_id]
+    return args
+
+def reserve_capacity(cluster_id, demands):
+    # Whether each of the (cpu, ram, gpu, node id) demands was reserved, or None when the ledger is not loaded
+    script = r.register_script(RESERVE_CAPACITY_SCRIPT)
+    result = script(keys=[capacity_key(cluster_id)], args=capacity_args(demands))
+    return None if result == -1 else [bool(reserved) for reserved in result]
+
+def release_capacity(cluster_id, demands):
+    if demands:
+        script = r.register_script(RELEASE_CAPACITY_SCRIPT)
+        return script(keys=[capacity_key(cluster_id)], args=capacity_args(demands))
+
+def load_capacity(cluster_id, free, version=None):
+    # `free` maps ledger fields to free amounts; returns whether the ledger was written
+    script = r.register_script(LOAD_CAPACITY_SCRIPT)
+    args = ["" if version is None else version]
+    for field, amount in free.items():
+        args += [field, int(amount)]
+    return bool(script(keys=[capacity_key(cluster_id)], args=args))
+
+def parse_capacity(ledger):
+    if not ledger:
+        return None
+    return {(k.decode() if isinstance(k, bytes) else k): int(v) for k, v in ledger.items()}
+
+def read_capacity(cluster_id):
+    # The ledger of the cluster as a dict of field to amount, or None when it is not loaded
+    return parse_capacity(r.hgetall(capacity_key(cluster_id)))
+
+def read_capacities(cluster_ids):
+    pipe = r.pipeline(transaction=False)
+    for cluster_id in cluster_ids:
+        pipe.hgetall(capacity_key(cluster_id))
+    return {cluster_id: parse_capacity(ledger) for cluster_id, ledger in zip(cluster_ids, pipe.execute())}
+
+def queue_version(queue):
+    return int(r.get(f"{queue}:version") or 0)
+
+def queue_bounds(queue):
+    # Smallest (cpu, ram, gpu) demand in the queue, or None when it is empty
+    bounds = r.hmget(f"{queue}:bounds", "cpu", "ram", "gpu")
+    if None in bounds:
+        return None
+    return tuple(float(bound) for bound in bounds)
+
+def may_fit(bounds, capacity):
+    # False when no queued deployment can fit the (cpu, ram, gpu) capacity
+    return bounds is not None and all(bound <= free for bound, free in zip(bounds, capacity))
+
+# Queues written by older versions are named P{priority}:cluster:{id} (or :org:{id}) without a
+# hash tag and either kept three sorted sets with the same members ({legacy}:cpu, :ram, :gpu)
+# or already used the index + demand layout.
+LEGACY_QUEUE = re.compile(r"^P(\d+):(cluster|org):(\d+)$")
+LEGACY_RESOURCES = ("cpu", "ram", "gpu")
+
+def legacy_queue_name(legacy):
+    # The current name of a legacy queue, or None if it is not one
+    match = LEGACY_QUEUE.match(legacy)
+    if not match:
+        return None
+    priority, kind, owner_id = match.groups()
+    return cluster_queue(owner_id, priority) if kind == "cluster" else org_queue(owner_id, priority)
+
+def migrate_legacy_queue(legacy):
+    # Moves a legacy queue to its current keys. Returns the number of deployments moved and the
+    # ids of those dropped because a key drifted and lacks part of their demand.
+    queue = legacy_queue_name(legacy)
+    if r.exists(f"{legacy}:index"):
+        cpu = dict(r.zrange(f"{legacy}:index", 0, -1, withscores=True))
+        demands = r.hgetall(f"{legacy}:demand")
+        records = [(deployment_id, score, demands[deployment_id]) for deployment_id, score in cpu.items()
+                   if deployment_id in demands]
+        members = set(cpu) | set(demands)
+        old_keys = [f"{legacy}:index", f"{legacy}:demand", f"{legacy}:version"]
+    else:
+        cpu, ram, gpu = [dict(r.zrange(f"{legacy}:{resource}", 0, -1, withscores=True)) for resource in LEGACY_RESOURCES]
+        records = [(deployment_id, score, pack_demand(score, ram[deployment_id], gpu[deployment_id]))
+                   for deployment_id, score in cpu.items() if deployment_id in ram and deployment_id in gpu]
+        members = set(cpu) | set(ram) | set(gpu)
+        old_keys = [f"{legacy}:{resource}" for resource in LEGACY_RESOURCES] + [f"{legacy}:version"]
+    dropped = sorted(int(deployment_id) for deployment_id in members - {deployment_id for deployment_id, _, _ in records})
+
+    # The old and new keys may hash to different slots, so this is not a transaction;
+    # run it with the schedulers stopped
+    pipe = r.pipeline(transaction=False)
+    for deployment_id, score, record in records:
+        pipe.zadd(f"{queue}:index", {deployment_id: score})
+        pipe.hset(f"{queue}:demand", deployment_id, record)
+    if records:
+        demands = [unpack_demand(record) for _, _, record in records]
+        pipe.hset(f"{queue}:bounds", mapping=dict(zip(("cpu", "ram", "gpu"), map(min, zip(*demands)))))
+        index, priority = queue_priority(queue)
+        pipe.zadd(index, {priority: priority})
+    pipe.incr(f"{queue}:version")
+    pipe.execute()
+    r.delete(*old_keys)
+    return len(records), dropped
+
+# Older versions simulated a running deployment with a key deployment:<id> expiring when it
+# finished, and relied on keyspace notifications to learn it had
+LEGACY_TIMER = re.compile(r"^deployment:(\d+)$")
+
+def migrate_legacy_timers(keys):
+    # Schedules the completion of every deployment:<id> key among `keys` when it expires (now
+    # if it has no expiry) and deletes the keys; returns the number of completions scheduled
+    keys = [key for key in keys if LEGACY_TIMER.match(key)]
+    if not keys:
+        return 0
+    pipe = r.pipeline(transaction=False)
+    for key in keys:
+        pipe.pttl(key)
+    ttls = pipe.execute()
+    now = time.time()
+    # -2: the key expired meanwhile, its notification was the old version's to handle
+    completions = {int(LEGACY_TIMER.match(key).group(1)): now + max(ttl, 0) / 1000
+                   for key, ttl in zip(keys, ttls) if ttl != -2}
+    pipe = r.pipeline(transaction=False)
+    if completions:
+        pipe.zadd(COMPLETIONS, completions)
+    for key in keys:
+        pipe.delete(key)
+    pipe.execute()
+    return len(completions)
+
+def index_queue(queue):
+    # Lists a queue written before priority indexes existed in its index; returns whether it
+    # has deployments
+    index, priority = queue_priority(queue)
+    if not r.zcard(f"{queue}:index"):
+        return False
+    r.zadd(index, {priority: priority})
+    return True
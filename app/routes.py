@@ -5,6 +5,8 @@ from app.models.models import db, User, Organization, Cluster, Deployment
 from app.services.user_service import UserService
 from app.services.cluster_service import ClusterService
 from app.services.deployment_service import DeploymentService
+from app.services.cluster_workers import cluster_workers
+from app.events import publish_event
 from app.jwt_utils import init_jwt, generate_token, protected_route
 from app.utils import generate_invite_code
 
@@ -89,7 +91,7 @@ def create_cluster(current_user):
         data = request.get_json()
         logger.debug(f"Received data: {data}")
         CreateClusterSchema().load(data)
-        cluster = ClusterService.create_cluster(data['name'], data['total_ram'], data['total_cpu'], data['total_gpu'], current_user.id, current_user.organization_id)
+        cluster = ClusterService.create_cluster(data['name'], data['total_ram'], data['total_cpu'], data['total_gpu'], current_user.id, current_user.organization_id, data.get('nodes'))
         logger.info(f"Cluster created successfully: {cluster.name}")
         return jsonify({"message": "Cluster created successfully"}), 201
     except ValidationError as err:
@@ -113,10 +115,13 @@ def create_deployment(current_user):
         data = request.get_json()
         logger.debug(f"Received data: {data}")
         CreateDeploymentSchema().load(data)
-        deployment, status = DeploymentService.create_deployment(
-            data['name'], data['ram'], data['cpu'], data['gpu'], data['priority'], data['docker_path'], data['cluster_name'], current_user.id
+        # Deployments only go to clusters of the user's organization, whose worker admits it
+        _, status = cluster_workers.run(
+            current_user.organization_id, DeploymentService.create_deployment,
+            data['name'], data['ram'], data['cpu'], data['gpu'], data['priority'], data['docker_path'], data.get('cluster_name'), current_user.id,
+            any_cluster=data.get('any_cluster', False)
         )
-        logger.info(f"Deployment created and {status}: {deployment.name}")
+        logger.info(f"Deployment created and {status}: {data['name']}")
         return jsonify({"message": f"Deployment created and {status}"}), 201
     except ValidationError as err:
         logger.warning(f"Validation error: {err.messages}")
@@ -128,6 +133,56 @@ def create_deployment(current_user):
         logger.error(f"Error creating deployment: {err}")
         return jsonify({"message": "Internal server error"}), 500
 
+@app.route('/create_deployments', methods=['POST'])
+@protected_route
+def create_deployments(current_user):
+    logger.info(f"Create deployments endpoint called by user: {current_user.username}")
+    if(current_user.role == 'VIEWER'):
+        logger.warning(f"User {current_user.username} with role VIEWER attempted to create deployments")
+        return jsonify({"message": "Only ADMIN and DEVELOPER can create deployment"}), 403
+    try:
+        data = request.get_json()
+        logger.debug(f"Received data: {data}")
+        specs = CreateDeploymentSchema(many=True).load(data)
+        # The whole batch is admitted by the worker of the user's organization
+        deployments = cluster_workers.run(current_user.organization_id, DeploymentService.create_deployments, specs, current_user.id)
+        logger.info(f"{len(deployments)} deployments created")
+        return jsonify({"deployments": deployments}), 201
+    except ValidationError as err:
+        logger.warning(f"Validation error: {err.messages}")
+        return jsonify(err.messages), 400
+    except ValueError as err:
+        logger.warning(f"Value error: {err}")
+        return jsonify({"message": str(err)}), 400
+    except Exception as err:
+        logger.error(f"Error creating deployments: {err}")
+        return jsonify({"message": "Internal server error"}), 500
+
+@app.route('/submit_deployment', methods=['POST'])
+@protected_route
+def submit_deployment(current_user):
+    logger.info(f"Submit deployment endpoint called by user: {current_user.username}")
+    if(current_user.role == 'VIEWER'):
+        logger.warning(f"User {current_user.username} with role VIEWER attempted to submit a deployment")
+        return jsonify({"message": "Only ADMIN and DEVELOPER can create deployment"}), 403
+    try:
+        data = request.get_json()
+        logger.debug(f"Received data: {data}")
+        spec = CreateDeploymentSchema().load(data)
+        # Started or queued by the admitter; poll /deployments/<id> for the outcome
+        deployment = DeploymentService.submit_deployment(spec, current_user.id)
+        logger.info(f"Deployment {deployment.status}: {data['name']}")
+        return jsonify({"message": f"Deployment {deployment.status}", "id": deployment.id, "status": deployment.status}), 202
+    except ValidationError as err:
+        logger.warning(f"Validation error: {err.messages}")
+        return jsonify(err.messages), 400
+    except ValueError as err:
+        logger.warning(f"Value error: {err}")
+        return jsonify({"message": str(err)}), 400
+    except Exception as err:
+        logger.error(f"Error submitting deployment: {err}")
+        return jsonify({"message": "Internal server error"}), 500
+
 @app.route('/trigger_deployment', methods=['POST'])
 @protected_route
 def trigger_deployment(current_user):
@@ -139,9 +194,13 @@ def trigger_deployment(current_user):
         data = request.get_json()
         logger.debug(f"Received data: {data}")
         cluster_id = data.get('cluster_id')
-        DeploymentService.trigger_deployment_in_cluster(cluster_id)
-        logger.info(f"Queue processed for cluster ID: {cluster_id}")
-        return jsonify({"message": "Queue processed"}), 200
+        cluster = Cluster.query.get(cluster_id)
+        if not cluster:
+            raise ValueError("Cluster not found")
+        # Handled by the consumer owning the cluster's partition
+        publish_event("trigger", cluster.id, cluster.organization_id)
+        logger.info(f"Queue processing requested for cluster ID: {cluster_id}")
+        return jsonify({"message": "Queue processing requested"}), 202
     except ValueError as err:
         logger.warning(f"Value error: {err}")
         return jsonify({"message": str(err)}), 400
@@ -161,6 +220,24 @@ def get_clusters(current_user):
         logger.error(f"Error fetching clusters: {err}")
         return jsonify({"message": "Internal server error"}), 500
 
+@app.route('/queues', methods=['GET'])
+@protected_route
+def get_queues(current_user):
+    logger.info(f"Get queues endpoint called by user: {current_user.username}")
+    try:
+        summaries = ClusterService.get_queue_summaries()
+        logger.info(f"Queues retrieved successfully")
+        return jsonify(summaries), 200
+    except Exception as err:
+        logger.error(f"Error fetching queues: {err}")
+        return jsonify({"message": "Internal server error"}), 500
+
+@app.route('/scheduler_stats', methods=['GET'])
+@protected_route
+def get_scheduler_stats(current_user):
+    logger.info(f"Scheduler stats endpoint called by user: {current_user.username}")
+    return jsonify(cluster_workers.stats()), 200
+
 @app.route('/deployments', methods=['GET'])
 @protected_route
 def get_deployments(current_user):
@@ -173,6 +250,20 @@ def get_deployments(current_user):
         logger.error(f"Error fetching deployments: {err}")
         return jsonify({"message": "Internal server error"}), 500
 
+@app.route('/deployments/<int:deployment_id>', methods=['GET'])
+@protected_route
+def get_deployment(current_user, deployment_id):
+    logger.info(f"Get deployment endpoint called by user: {current_user.username}")
+    try:
+        deployment = Deployment.query.get(deployment_id)
+        if not deployment:
+            logger.warning(f"Deployment not found: {deployment_id}")
+            return jsonify({"message": "Deployment not found"}), 404
+        return jsonify(deployment.to_dict()), 200
+    except Exception as err:
+        logger.error(f"Error fetching deployment: {err}")
+        return jsonify({"message": "Internal server error"}), 500
+
 @app.route('/create_organization', methods=['POST'])
 @protected_route
 def create_organization(current_user):
@@ -7,6 +7,8 @@ logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 class AllCombinations(SchedulingStrategy):
+    optimal = True
+
     def schedule_deployments(self, node, deployments):
         logger.info("Scheduling deployments using All Combinations with deployment size: %d", len(deployments))
         def is_valid_subset(subset):
@@ -0,0 +1,118 @@
+from time import perf_counter
+from .strategy import SchedulingStrategy
+from .branch_and_bound import BranchAndBound
+from .greedy import DominantResourceGreedy, SmallestFirstGreedy, first_fit
+from .shape_branch_and_bound import ShapeBranchAndBound
+from .shapes import has_few_shapes
+from .vectorized_genetic_algorithm import VectorizedGeneticAlgorithm
+import logging
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+def solution_order(solution, deployments):
+    # Ids of the scheduled deployments followed by the ids of the rest
+    scheduled = set(id(d) for d in solution)
+    return [d.id for d in solution] + [d.id for d in deployments if id(d) not in scheduled]
+
+# Returns a fast heuristic answer and refines it with stronger strategies until the time
+# budget (in seconds) runs out, keeping the best solution found so far. Every phase checks the
+# deadline, so a run overshoots the budget by at most one check interval. An initial order of
+# deployment ids (e.g. the ordering of the previous run on the same queue) is tried first and
+# seeds the exact search and the GA; after a run `ordering` holds the order to pass next time.
+class AnytimeStrategy(SchedulingStrategy):
+    # Rough number of (individual, deployment) pairs the vectorized GA evaluates per second,
+    # used to size its population so that a useful number of generations fits the budget
+    ga_throughput = 5_000_000
+    ga_min_generations = 10
+    ga_min_population = 4
+    # Rough number of deployments a greedy strategy sorts and fills per second; a greedy that
+    # would not finish within the remaining budget is skipped
+    greedy_throughput = 1_000_000
+
+    def __init__(self, time_budget=0.005, exact_size_limit=60, ga_population_size=50, initial_order=None):
+        self.time_budget = time_budget
+        self.exact_size_limit = exact_size_limit
+        self.ga_population_size = ga_population_size
+        self.initial_order = initial_order
+        self.optimal = False
+        # (solution, deployments) of the last run; `ordering` is built from it on first use, so
+        # the O(n) pass is not charged to the run's budget
+        self.last_run = ([], [])
+        self._ordering = None
+
+    def schedule_deployments(self, node, deployments):
+        logger.info("Scheduling deployments using Anytime strategy with deployment size: %d and budget: %.1f ms",
+                    len(deployments), self.time_budget * 1000)
+        deadline = perf_counter() + self.time_budget
+        best_solution = self._search(node, deployments, deadline)
+
+        self.last_run, self._ordering = (best_solution, deployments), None
+        logger.info("Anytime strategy scheduled %d deployments", len(best_solution))
+        return best_solution
+
+    @property
+    def ordering(self):
+        if self._ordering is None:
+            self._ordering = solution_order(*self.last_run)
+        return self._ordering
+
+    def adopt(self, node, deployments, scheduled):
+        self.last_run, self._ordering = (scheduled, deployments), None
+        self.optimal = True
+
+    def _search(self, node, deployments, deadline):
+        # Sets `optimal` when every deployment fits or the exact search finishes
+        self.optimal = True
+        if self.initial_order:
+            rank = {deployment_id: i for i, deployment_id in enumerate(self.initial_order)}
+            best_solution = first_fit(node, sorted(deployments, key=lambda d: rank.get(d.id, len(rank))), deadline)
+        elif self._greedy_fits(deployments, deadline):
+            best_solution = []
+        else:
+            # Not even one sort fits the budget: fill in queue order
+            best_solution = first_fit(node, deployments, deadline)
+        if len(best_solution) == len(deployments):
+            return best_solution
+        for greedy in (SmallestFirstGreedy, DominantResourceGreedy):
+            if not self._greedy_fits(deployments, deadline):
+                break
+            solution = greedy(time_limit=deadline - perf_counter()).schedule_deployments(node, deployments)
+            if len(solution) > len(best_solution):
+                best_solution = solution
+            if len(best_solution) == len(deployments):
+                return best_solution
+
+        # Exact search proves optimality when it finishes within the budget. Larger queues made
+        # of few shapes are searched over counts per shape instead of single deployments.
+        if perf_counter() >= deadline:
+            exact_strategy = None
+        elif len(deployments) <= self.exact_size_limit:
+            exact_strategy = BranchAndBound
+        elif has_few_shapes(deployments, self.exact_size_limit):
+            exact_strategy = ShapeBranchAndBound
+        else:
+            exact_strategy = None
+        if exact_strategy and perf_counter() < deadline:
+            strategy = exact_strategy(time_limit=deadline - perf_counter(), initial_solution=best_solution)
+            solution = strategy.schedule_deployments(node, deployments)
+            if len(solution) > len(best_solution):
+                best_solution = solution
+            if not strategy.timed_out:
+                return best_solution
+
+        self.optimal = False
+        remaining = deadline - perf_counter()
+        population_size = min(self.ga_population_size,
+                              int(remaining * self.ga_throughput / (self.ga_min_generations * len(deployments))))
+        if population_size >= self.ga_min_population:
+            strategy = VectorizedGeneticAlgorithm(population_size=population_size, time_limit=remaining,
+                                                  initial_order=solution_order(best_solution, deployments))
+            solution = strategy.schedule_deployments(node, deployments)
+            if len(solution) > len(best_solution):
+                best_solution = solution
+        return best_solution
+
+    def _greedy_fits(self, deployments, deadline):
+        return (deadline - perf_counter()) * self.greedy_throughput >= len(deployments)
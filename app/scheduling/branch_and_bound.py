@@ -0,0 +1,124 @@
+from bisect import bisect_right
+from itertools import accumulate
+from time import perf_counter
+from .strategy import SchedulingStrategy
+import logging
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+def normalized_size(node, deployment):
+    # Sum of the deployment's demand as a fraction of the node's capacity in each dimension
+    size = 0
+    for demand, capacity in ((deployment.cpu, node.cpu), (deployment.memory, node.memory), (deployment.gpu, node.gpu)):
+        if capacity > 0:
+            size += demand / capacity
+    return size
+
+# Exact search for the largest set of deployments that fits the node, pruned by
+# per-resource upper bounds and by skipping demands that dominate excluded ones
+class BranchAndBound(SchedulingStrategy):
+    def __init__(self, time_limit=None, initial_solution=None):
+        # With a time limit the search stops early and returns the best set found so far
+        self.time_limit = time_limit
+        # A known feasible subset of the deployments (e.g. the previous schedule) to start from
+        self.initial_solution = initial_solution
+        self.timed_out = False
+
+    @property
+    def optimal(self):
+        return not self.timed_out
+
+    def schedule_deployments(self, node, deployments):
+        logger.info("Scheduling deployments using Branch and Bound with deployment size: %d", len(deployments))
+        deadline = perf_counter() + self.time_limit if self.time_limit is not None else None
+        self.timed_out = False
+        items = [d for d in deployments if node.can_schedule(d)]
+        if not items:
+            return []
+
+        items.sort(key=lambda d: normalized_size(node, d))
+        demands = [(d.cpu, d.memory, d.gpu) for d in items]
+        n = len(items)
+
+        # Bounds are taken over each resource alone and over normalized sums of resources
+        # (surrogate constraints), which are much tighter when all resources are contended.
+        scale = [1 / capacity if capacity > 0 else 0 for capacity in (node.cpu, node.memory, node.gpu)]
+        weights = [tuple(scale), (scale[0], scale[1], 0), (scale[0], 0, scale[2]), (0, scale[1], scale[2]),
+                   (1, 0, 0), (0, 1, 0), (0, 0, 1)]
+        weighted = [[c * w[0] + m * w[1] + g * w[2] for c, m, g in demands] for w in weights]
+
+        # prefix_sums[i][k] holds the sorted prefix sums of surrogate k over items[i:],
+        # so the most suffix items that fit a budget is a single bisect.
+        prefix_sums = [None] * (n + 1)
+        prefix_sums[n] = tuple([0] for _ in weights)
+        sorted_suffix = tuple([] for _ in weights)
+        for i in range(n - 1, -1, -1):
+            for k in range(len(weights)):
+                sorted_suffix[k].insert(bisect_right(sorted_suffix[k], weighted[k][i]), weighted[k][i])
+            prefix_sums[i] = tuple(list(accumulate(values, initial=0)) for values in sorted_suffix)
+
+        # next_distinct[i] is the first index after i with a different demand
+        next_distinct = [n] * n
+        for i in range(n - 2, -1, -1):
+            next_distinct[i] = next_distinct[i + 1] if demands[i] == demands[i + 1] else i + 1
+
+        def can_add(i, cpu, memory, gpu, count):
+            # Whether `count` more deployments from items[i:] could fit the remaining capacity
+            if n - i < count:
+                return False
+            for w, sums in zip(weights, prefix_sums[i]):
+                if sums[count] > cpu * w[0] + memory * w[1] + gpu * w[2] + 1e-9:
+                    return False
+            return True
+
+        # Greedy fill in sorted order gives the initial incumbent
+        best = []
+        cpu, memory, gpu = node.cpu, node.memory, node.gpu
+        for i, (c, m, g) in enumerate(demands):
+            if c <= cpu and m <= memory and g <= gpu:
+                cpu, memory, gpu = cpu - c, memory - m, gpu - g
+                best.append(i)
+        if self.initial_solution and len(self.initial_solution) > len(best):
+            position = {id(d): i for i, d in enumerate(items)}
+            initial = sorted(position[id(d)] for d in self.initial_solution if id(d) in position)
+            if len(initial) > len(best):
+                best = initial
+
+        # Largest count the surrogate bounds allow at the root; reaching it proves optimality
+        root_bound = len(best)
+        while can_add(0, node.cpu, node.memory, node.gpu, root_bound + 1):
+            root_bound += 1
+        chosen = []
+        excluded = []
+
+        def search(i, cpu, memory, gpu):
+            nonlocal best
+            if len(chosen) > len(best):
+                best = list(chosen)
+            if self.timed_out or (deadline is not None and perf_counter() >= deadline):
+                self.timed_out = True
+                return
+            if len(best) == root_bound or not can_add(i, cpu, memory, gpu, len(best) - len(chosen) + 1):
+                return
+
+            c, m, g = demands[i]
+            fits = c <= cpu and m <= memory and g <= gpu
+            # Any set using a deployment that dominates an excluded one can swap it for
+            # the excluded deployment, which was already covered by an earlier branch.
+            dominated = any(ec <= c and em <= m and eg <= g for ec, em, eg in excluded)
+            if fits and not dominated:
+                chosen.append(i)
+                search(i + 1, cpu - c, memory - m, gpu - g)
+                chosen.pop()
+
+            # Excluding this deployment excludes all identical ones as well
+            excluded.append(demands[i])
+            search(next_distinct[i], cpu, memory, gpu)
+            excluded.pop()
+
+        search(0, node.cpu, node.memory, node.gpu)
+        if self.timed_out:
+            logger.info("Branch and Bound stopped at the time limit with %d deployments", len(best))
+        return [items[i] for i in best]
@@ -1,64 +1,182 @@
+import multiprocessing
+import os
 import random
+from concurrent.futures import Future, ProcessPoolExecutor
+from threading import Lock
 from .strategy import SchedulingStrategy
 from .node import Node
+from .deployment_dto import DeploymentDto
 import logging
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# Individuals are permutations of deployment indices, so islands evolved in other processes
+# exchange them without sharing deployment objects
+def _evaluate_fitness(demands, capacity, individual):
+    node_copy = Node(None, *capacity)
+    scheduled = []
+    for i in individual:
+        if node_copy.schedule(demands[i]):
+            scheduled.append(i)
+    return len(scheduled), scheduled
+
+def _crossover(parent1, parent2, rng):
+    n = len(parent1)
+    crossover_point = rng.randint(1, n - 1) if n > 1 else 0
+    head = parent1[:crossover_point]
+    taken = set(head)
+    return head + [i for i in parent2 if i not in taken]
+
+def _evolve(demands, capacity, population, generations, seed):
+    # Runs the GA on one population and returns the best schedule found together with the final
+    # population ordered from fittest to weakest
+    rng = random.Random(seed)
+    demands = [DeploymentDto(i, *demand) for i, demand in enumerate(demands)]
+    n = len(population[0])
+    best_fitness, best_solution = -1, []
+
+    for generation in range(generations + 1):
+        fitness_scores = []
+        for individual in population:
+            fitness, scheduled = _evaluate_fitness(demands, capacity, individual)
+            fitness_scores.append((fitness, individual))
+            if fitness > best_fitness:
+                best_fitness, best_solution = fitness, scheduled
+
+        fitness_scores.sort(key=lambda x: x[0], reverse=True)
+        population = [individual for _, individual in fitness_scores]
+        if generation == generations or best_fitness == n:  # Early stopping
+            break
+
+        next_population = []
+        for _ in range(len(population)):
+            parent1, parent2 = rng.sample(population, 2) if len(population) > 1 else population * 2
+            child = _crossover(parent1, parent2, rng)
+            if len(child) > 1:
+                idx1, idx2 = rng.sample(range(len(child)), 2)
+                child[idx1], child[idx2] = child[idx2], child[idx1]  # Swap mutation
+            next_population.append(child)
+        population = next_population
+
+    return best_fitness, best_solution, population
+
+_island_pool = None
+_island_pool_lock = Lock()
+
+def island_pool():
+    # Process pool shared by every island run in this process, started on first use with one
+    # worker per core. Workers come from a fork server rather than being forked from this
+    # multithreaded process.
+    global _island_pool
+    with _island_pool_lock:
+        if _island_pool is None:
+            _island_pool = ProcessPoolExecutor(max_workers=os.cpu_count() or 1,
+                                               mp_context=multiprocessing.get_context("forkserver"))
+        return _island_pool
+
+# One island-model run. Each epoch evolves every island for migration_interval generations in
+# the island pool; the callback of the last island to finish migrates the best individuals and
+# submits the next epoch, so no thread waits on the run unless it asks for the result.
+class _IslandRun:
+    def __init__(self, strategy, deployments, capacity, rng):
+        self.strategy = strategy
+        self.deployments = deployments
+        self.demands = [(d.cpu, d.memory, d.gpu) for d in deployments]
+        self.capacity = capacity
+        self.rng = rng
+        n = len(deployments)
+        population_size = min(strategy.population_size, n)
+        self.populations = [[rng.sample(range(n), n) for _ in range(population_size)] for _ in range(strategy.islands)]
+        self.remaining = strategy.generations
+        self.best_fitness, self.best_solution = -1, []
+        self.futures = []
+        self.pending = 0
+        self.lock = Lock()
+        self.result = Future()
+
+    def start_epoch(self):
+        generations = min(self.strategy.migration_interval, self.remaining)
+        self.remaining -= generations
+        # Seeds are drawn in island order, so a seeded run does not depend on completion order
+        seeds = [self.rng.random() for _ in self.populations]
+        self.pending = len(self.populations)
+        try:
+            pool = island_pool()
+            self.futures = [pool.submit(_evolve, self.demands, self.capacity, population, generations, seed)
+                            for population, seed in zip(self.populations, seeds)]
+        except Exception as e:
+            self.result.set_exception(e)
+            return
+        for future in self.futures:
+            future.add_done_callback(self.island_done)
+
+    def island_done(self, _):
+        with self.lock:
+            self.pending -= 1
+            if self.pending:
+                return
+        try:
+            results = [future.result() for future in self.futures]
+        except Exception as e:
+            self.result.set_exception(e)
+            return
+        for fitness, solution, _ in results:
+            if fitness > self.best_fitness:
+                self.best_fitness, self.best_solution = fitness, solution
+        if self.remaining <= 0 or self.best_fitness == len(self.deployments):  # Early stopping
+            logger.info("Genetic Algorithm fitness: %d", self.best_fitness)
+            self.result.set_result([self.deployments[i] for i in self.best_solution])
+            return
+
+        # Ring migration: the best individuals of island i replace the weakest of island i + 1
+        self.populations = [population for _, _, population in results]
+        migrants = [population[:self.strategy.migration_size] for population in self.populations]
+        for i, population in enumerate(self.populations):
+            incoming = [list(individual) for individual in migrants[i - 1]]
+            if incoming and len(population) > len(incoming):
+                population[-len(incoming):] = incoming
+        self.start_epoch()
+
 class GeneticAlgorithm(SchedulingStrategy):
-    def __init__(self, generations=10, population_size=10):
+    # With islands > 1 the populations evolve independently in the island pool and every
+    # migration_interval generations the best migration_size individuals of each island
+    # replace the weakest of the next one
+    def __init__(self, generations=10, population_size=10, seed=None, islands=1, migration_interval=5, migration_size=2):
         self.generations = generations
         self.population_size = population_size
-        
+        self.seed = seed
+        self.islands = islands
+        self.migration_interval = migration_interval
+        self.migration_size = migration_size
+
     def schedule_deployments(self, node, deployments):
         logger.info("Scheduling deployments using Genetic Algorithm with deployment size: %d", len(deployments))
-        def evaluate_fitness(individual, best_fitness):
-            node_copy = Node(node.id, node.cpu, node.memory, node.gpu)
-            scheduled_deployments = []
-            for deployment in individual:
-                if node_copy.schedule(deployment):
-                    scheduled_deployments.append(deployment)
-                if len(scheduled_deployments) + len(individual) - len(scheduled_deployments) <= best_fitness:
-                    break  # No point in continuing
-            return len(scheduled_deployments), scheduled_deployments
-
         if not deployments:
             return []
+        if self.islands > 1:
+            return self.schedule_deployments_async(node, deployments).result()
+
+        rng = random.Random(self.seed)
+        n = len(deployments)
+        demands = [(d.cpu, d.memory, d.gpu) for d in deployments]
+        capacity = (node.cpu, node.memory, node.gpu)
+        self.population_size = min(self.population_size, n)
+
+        population = [rng.sample(range(n), n) for _ in range(self.population_size)]
+        best_fitness, best_solution, _ = _evolve(demands, capacity, population, self.generations, rng.random())
+
+        logger.info("Genetic Algorithm fitness: %d", best_fitness)
+        return [deployments[i] for i in best_solution]
 
-        self.population_size = min(self.population_size, len(deployments))
-        population = [random.sample(deployments, len(deployments)) for _ in range(self.population_size)]
-        best_solution = []
-        best_fitness = 0
-
-        for _ in range(self.generations):
-            fitness_scores = []
-            for individual in population:
-                fitness, scheduled_deployments = evaluate_fitness(individual, best_fitness)
-                fitness_scores.append((fitness, individual))
-                if fitness > best_fitness:
-                    best_fitness = fitness
-                    best_solution = scheduled_deployments
-
-            fitness_scores.sort(key=lambda x: x[0], reverse=True)
-            population = [individual for _, individual in fitness_scores[:self.population_size]]
-
-            next_population = []
-            for _ in range(self.population_size):
-                parent1, parent2 = random.sample(population, 2)
-                
-                crossover_point = random.randint(1, len(deployments) - 1) if len(deployments) > 1 else 0
-                child = parent1[:crossover_point] + [d for d in parent2 if d not in parent1[:crossover_point]]
-
-                if len(child) > 1:
-                    idx1, idx2 = random.sample(range(len(child)), 2)
-                    child[idx1], child[idx2] = child[idx2], child[idx1]  # Swap mutation
-                next_population.append(child)
-
-            population = next_population
-
-            if best_fitness == len(deployments):  # Early stopping
-                break
-        print(f"fitness: {best_fitness}")
-        return best_solution
\ No newline at end of file
+    def schedule_deployments_async(self, node, deployments):
+        # Future of the schedule. With islands the calling thread only submits the first epoch;
+        # a single population is evolved before returning.
+        if self.islands <= 1 or not deployments:
+            future = Future()
+            future.set_result(self.schedule_deployments(node, deployments))
+            return future
+        run = _IslandRun(self, deployments, (node.cpu, node.memory, node.gpu), random.Random(self.seed))
+        run.start_epoch()
+        return run.result
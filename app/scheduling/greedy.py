@@ -0,0 +1,95 @@
+from abc import abstractmethod
+from time import perf_counter
+from .strategy import SchedulingStrategy
+import logging
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+def capacity_scale(node):
+    # Multipliers that turn a demand into a fraction of the node's capacity per resource
+    return tuple(1 / capacity if capacity > 0 else 0 for capacity in (node.cpu, node.memory, node.gpu))
+
+def first_fit(node, deployments, deadline=None):
+    # With a deadline (a perf_counter() time) the fill stops once it passes, checked every 256
+    # deployments, and returns what it has scheduled so far
+    cpu, memory, gpu = node.cpu, node.memory, node.gpu
+    scheduled_deployments = []
+    for i, d in enumerate(deployments):
+        if deadline is not None and i % 256 == 255 and perf_counter() >= deadline:
+            break
+        if d.cpu <= cpu and d.memory <= memory and d.gpu <= gpu:
+            cpu -= d.cpu
+            memory -= d.memory
+            gpu -= d.gpu
+            scheduled_deployments.append(d)
+    return scheduled_deployments
+
+# Deterministic O(n log n) strategies: sort once by a per-deployment key, then fill the node in that order
+class GreedyStrategy(SchedulingStrategy):
+    name = "Greedy"
+    reverse = False
+
+    def __init__(self, time_limit=None):
+        # With a time limit the fill stops early and returns the deployments scheduled so far
+        self.time_limit = time_limit
+
+    @abstractmethod
+    def sort_key(self, node):
+        pass
+
+    def schedule_deployments(self, node, deployments):
+        logger.info("Scheduling deployments using %s with deployment size: %d", self.name, len(deployments))
+        deadline = perf_counter() + self.time_limit if self.time_limit is not None else None
+        return first_fit(node, sorted(deployments, key=self.sort_key(node), reverse=self.reverse), deadline)
+
+class DominantResourceGreedy(GreedyStrategy):
+    # Smallest first by dominant share: the largest fraction of the node any one resource takes
+    name = "Dominant Resource Greedy"
+
+    def sort_key(self, node):
+        sc, sm, sg = capacity_scale(node)
+        return lambda d: max(d.cpu * sc, d.memory * sm, d.gpu * sg)
+
+class SmallestFirstGreedy(GreedyStrategy):
+    # Smallest first by the sum of normalized demands
+    name = "Smallest First Greedy"
+
+    def sort_key(self, node):
+        sc, sm, sg = capacity_scale(node)
+        return lambda d: d.cpu * sc + d.memory * sm + d.gpu * sg
+
+class FirstFitDecreasing(GreedyStrategy):
+    # Largest first by the length of the normalized demand vector
+    name = "First Fit Decreasing"
+    reverse = True
+
+    def sort_key(self, node):
+        sc, sm, sg = capacity_scale(node)
+        return lambda d: (d.cpu * sc) ** 2 + (d.memory * sm) ** 2 + (d.gpu * sg) ** 2
+
+class BestFitGreedy(SchedulingStrategy):
+    # Repeatedly takes the deployment that leaves the least normalized slack on the node
+    def schedule_deployments(self, node, deployments):
+        logger.info("Scheduling deployments using Best Fit Greedy with deployment size: %d", len(deployments))
+        sc, sm, sg = capacity_scale(node)
+        size = lambda d: d.cpu * sc + d.memory * sm + d.gpu * sg
+        # Largest last, so the best fit is always popped off the end of the list
+        items = sorted(deployments, key=size)
+
+        cpu, memory, gpu = node.cpu, node.memory, node.gpu
+        slack = cpu * sc + memory * sm + gpu * sg + 1e-9
+        scheduled_deployments = []
+        # Capacity only shrinks, so a deployment that does not fit now never will and is dropped:
+        # every deployment is popped once, O(n) after the sort
+        while items:
+            d = items.pop()
+            if size(d) > slack or d.cpu > cpu or d.memory > memory or d.gpu > gpu:
+                continue
+            cpu -= d.cpu
+            memory -= d.memory
+            gpu -= d.gpu
+            slack = cpu * sc + memory * sm + gpu * sg + 1e-9
+            scheduled_deployments.append(d)
+        return scheduled_deployments
@@ -0,0 +1,33 @@
+from copy import copy
+from .greedy import capacity_scale
+from .node import Node
+from .node_index import NodeIndex
+import logging
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# Assigns one queue of deployments across several nodes (e.g. every cluster of an organization
+# or every machine of a cluster). Deployments are taken smallest first by dominant share of the
+# combined capacity and each one goes to the node it fits most tightly, found through a
+# NodeIndex, which keeps large holes free for large deployments.
+class MultiNodeScheduler:
+    def schedule_deployments(self, nodes, deployments):
+        logger.info("Scheduling %d deployments across %d nodes", len(deployments), len(nodes))
+        nodes = [copy(node) for node in nodes]
+        assignments = {node.id: [] for node in nodes}
+        if not nodes:
+            return assignments
+
+        total = Node(None, sum(node.cpu for node in nodes), sum(node.memory for node in nodes), sum(node.gpu for node in nodes))
+        sc, sm, sg = capacity_scale(total)
+
+        index = NodeIndex(nodes)
+        for deployment in sorted(deployments, key=lambda d: max(d.cpu * sc, d.memory * sm, d.gpu * sg)):
+            node = index.schedule(deployment)
+            if node is not None:
+                assignments[node.id].append(deployment)
+
+        logger.info("Scheduled %d deployments across nodes", sum(len(scheduled) for scheduled in assignments.values()))
+        return assignments
@@ -0,0 +1,110 @@
+from bisect import bisect_left, insort
+
+# Nodes of one GPU level sorted by (free memory, free cpu, id), split into blocks of at most
+# 2 * BLOCK_SIZE that each know the most free cpu of their nodes. A lookup bisects to the first
+# node with enough memory and skips every block without enough cpu, so a find, add or remove
+# costs O(n / BLOCK_SIZE + BLOCK_SIZE) rather than a scan of every node with enough memory.
+class MemoryBucket:
+    BLOCK_SIZE = 32
+
+    def __init__(self):
+        self.blocks = []
+        self.last = []
+        self.max_cpu = []
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def add(self, entry):
+        self.size += 1
+        if not self.blocks:
+            self.blocks.append([entry])
+            self.last.append(entry)
+            self.max_cpu.append(entry[1])
+            return
+        i = min(bisect_left(self.last, entry), len(self.blocks) - 1)
+        block = self.blocks[i]
+        insort(block, entry)
+        self.last[i] = block[-1]
+        self.max_cpu[i] = max(self.max_cpu[i], entry[1])
+        if len(block) > 2 * self.BLOCK_SIZE:
+            half = block[self.BLOCK_SIZE:]
+            del block[self.BLOCK_SIZE:]
+            self.blocks.insert(i + 1, half)
+            self.last[i:i + 1] = [block[-1], half[-1]]
+            self.max_cpu[i:i + 1] = [max(cpu for _, cpu, _ in block), max(cpu for _, cpu, _ in half)]
+
+    def remove(self, entry):
+        i = bisect_left(self.last, entry)
+        block = self.blocks[i]
+        del block[bisect_left(block, entry)]
+        self.size -= 1
+        if not block:
+            del self.blocks[i], self.last[i], self.max_cpu[i]
+            return
+        self.last[i] = block[-1]
+        if entry[1] == self.max_cpu[i]:
+            self.max_cpu[i] = max(cpu for _, cpu, _ in block)
+
+    def find(self, memory, cpu):
+        # Id of the node with the least free memory of at least `memory` and cpu of at least `cpu`
+        first = bisect_left(self.last, (memory,))
+        for i in range(first, len(self.blocks)):
+            if self.max_cpu[i] < cpu:
+                continue
+            block = self.blocks[i]
+            for j in range(bisect_left(block, (memory,)) if i == first else 0, len(block)):
+                if block[j][1] >= cpu:
+                    return block[j][2]
+        return None
+
+# Index of nodes by free capacity for finding a node a deployment fits on without scanning
+# every node. Nodes are bucketed by free GPU (the scarcest resource) and, inside a bucket,
+# indexed by free memory and cpu; a lookup walks the buckets with enough GPU from the tightest
+# up and takes the node with the least memory that still fits from the first that has one.
+class NodeIndex:
+    def __init__(self, nodes=()):
+        self.nodes = {}
+        self.gpu_levels = []
+        self.buckets = {}
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def add(self, node):
+        self.nodes[node.id] = node
+        bucket = self.buckets.get(node.gpu)
+        if bucket is None:
+            bucket = self.buckets[node.gpu] = MemoryBucket()
+            insort(self.gpu_levels, node.gpu)
+        bucket.add((node.memory, node.cpu, node.id))
+
+    def remove(self, node_id):
+        node = self.nodes.pop(node_id)
+        bucket = self.buckets[node.gpu]
+        bucket.remove((node.memory, node.cpu, node.id))
+        if not bucket:
+            del self.buckets[node.gpu]
+            del self.gpu_levels[bisect_left(self.gpu_levels, node.gpu)]
+        return node
+
+    def find(self, deployment):
+        # Best fit: the least free GPU, then the least free memory that still fits
+        for level in self.gpu_levels[bisect_left(self.gpu_levels, deployment.gpu):]:
+            node_id = self.buckets[level].find(deployment.memory, deployment.cpu)
+            if node_id is not None:
+                return self.nodes[node_id]
+        return None
+
+    def schedule(self, deployment):
+        # Places the deployment on the best fitting node and returns it, or None if no node fits
+        node = self.find(deployment)
+        if node is None:
+            return None
+        self.remove(node.id)
+        node.schedule(deployment)
+        self.add(node)
+        return node
@@ -0,0 +1,43 @@
+from collections import OrderedDict
+from threading import Lock
+
+# What the last scheduling run on a queue left behind: the free capacity it fetched with, the
+# queue version at that point, the queued deployments that fitted but were not started and
+# the ordering the strategy ended with. While the version is unchanged these are exactly the
+# queued deployments that fit `capacity`, so the next run only has to fetch the ones freed
+# capacity makes eligible and can start from `ordering`.
+class QueueState:
+    def __init__(self, capacity, version, candidates, ordering):
+        self.capacity = capacity
+        self.version = version
+        self.candidates = candidates
+        self.ordering = ordering
+
+# QueueState of the last scheduling run on the maxsize most recently scheduled queues, evicting
+# the least recently used; shared by the worker threads of the process
+class QueueStates:
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, queue):
+        with self.lock:
+            state = self.entries.get(queue)
+            if state is not None:
+                self.entries.move_to_end(queue)
+            return state
+
+    def put(self, queue, state):
+        with self.lock:
+            self.entries[queue] = state
+            self.entries.move_to_end(queue)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def pop(self, queue):
+        with self.lock:
+            return self.entries.pop(queue, None)
@@ -0,0 +1,59 @@
+from collections import Counter, OrderedDict
+from threading import Lock
+from .shapes import group_by_shape, shape, take_counts
+
+# LRU cache of scheduling decisions. The key is the free capacity together with the multiset
+# of demand shapes in the queue, and the value how many deployments of each shape were
+# scheduled, so an answer carries over to queues of other deployments with the same shapes.
+# Only answers the strategy proved optimal are kept, and it is shared by the worker threads.
+class ScheduleCache:
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def key(node, groups):
+        return (node.cpu, node.memory, node.gpu), tuple(sorted((s, len(group)) for s, group in groups.items()))
+
+    def get(self, key):
+        with self.lock:
+            counts = self.entries.get(key)
+            if counts is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return counts
+
+    def put(self, key, counts):
+        with self.lock:
+            self.entries[key] = counts
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def schedule(self, node, deployments, strategy):
+        groups = group_by_shape(deployments)
+        key = self.key(node, groups)
+        counts = self.get(key)
+        if counts is not None:
+            scheduled = take_counts(groups, counts)
+            strategy.adopt(node, deployments, scheduled)
+            return scheduled
+        scheduled = strategy.schedule_deployments(node, deployments)
+        # A heuristic answer cut short by its time budget would otherwise be served for good
+        if strategy.optimal or len(scheduled) == len(deployments):
+            self.put(key, tuple(Counter(shape(d) for d in scheduled).items()))
+        return scheduled
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
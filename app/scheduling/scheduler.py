@@ -2,15 +2,20 @@ from copy import copy
 from time import time
 
 class Scheduler:
-    def __init__(self, strategy):
+    def __init__(self, strategy, cache=None):
         self.strategy = strategy
+        # Optional ScheduleCache shared between schedulers
+        self.cache = cache
 
     def set_strategy(self, strategy):
         self.strategy = strategy
 
     def schedule_deployments(self, node, deployments):
         st = time()
-        scheduled_deployements = self.strategy.schedule_deployments(copy(node), deployments)
+        if self.cache is not None:
+            scheduled_deployements = self.cache.schedule(copy(node), deployments, self.strategy)
+        else:
+            scheduled_deployements = self.strategy.schedule_deployments(copy(node), deployments)
         for deployment in scheduled_deployements:
             node.schedule(deployment)
         rem_cpu = node.cpu
@@ -0,0 +1,165 @@
+from collections import Counter
+from time import perf_counter
+from .strategy import SchedulingStrategy
+from .branch_and_bound import normalized_size
+from .shapes import group_by_shape, shape, take_counts
+import logging
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+def surrogate_bound(w, shapes, counts, cpu, memory, gpu):
+    # Fractional count of deployments fitting the capacity under the single constraint w
+    budget = cpu * w[0] + memory * w[1] + gpu * w[2] + 1e-9
+    total = 0
+    for size, count in sorted((c * w[0] + m * w[1] + g * w[2], count) for (c, m, g), count in zip(shapes, counts)):
+        if size * count <= budget:
+            total += count
+            budget -= size * count
+        else:
+            return total + budget / size
+    return total
+
+def best_mix(scale, shapes, counts, cpu, memory, gpu):
+    # The tightest surrogate mixes the normalized resources in proportions that depend on the
+    # queue: search a coarse grid over the mixes, then refine around the best point
+    def bound(mix):
+        return surrogate_bound(tuple(p * s for p, s in zip(mix, scale)), shapes, counts, cpu, memory, gpu)
+
+    steps = 10
+    grid = [(a / steps, b / steps, (steps - a - b) / steps) for a in range(steps + 1) for b in range(steps + 1 - a)]
+    mix = min(grid, key=bound)
+    value = bound(mix)
+    step = 1 / steps
+    while step > 1 / 200:
+        step /= 2
+        improved = True
+        while improved:
+            improved = False
+            for src, dst in ((0, 1), (0, 2), (1, 0), (1, 2), (2, 0), (2, 1)):
+                if mix[src] < step:
+                    continue
+                candidate = list(mix)
+                candidate[src] -= step
+                candidate[dst] += step
+                candidate_value = bound(candidate)
+                if candidate_value < value:
+                    mix, value, improved = tuple(candidate), candidate_value, True
+    return tuple(p * s for p, s in zip(mix, scale))
+
+# Exact search over how many deployments of each shape to schedule rather than over single
+# deployments, so a queue of n deployments in k shapes is searched k levels deep. Pruned
+# with the same surrogate bounds and dominance rule as BranchAndBound.
+class ShapeBranchAndBound(SchedulingStrategy):
+    def __init__(self, time_limit=None, initial_solution=None):
+        # With a time limit the search stops early and returns the best set found so far
+        self.time_limit = time_limit
+        # A known feasible subset of the deployments (e.g. the previous schedule) to start from
+        self.initial_solution = initial_solution
+        self.timed_out = False
+
+    @property
+    def optimal(self):
+        return not self.timed_out
+
+    def schedule_deployments(self, node, deployments):
+        logger.info("Scheduling deployments using Shape Branch and Bound with deployment size: %d", len(deployments))
+        deadline = perf_counter() + self.time_limit if self.time_limit is not None else None
+        self.timed_out = False
+        groups = group_by_shape(d for d in deployments if node.can_schedule(d))
+        if not groups:
+            return []
+
+        shapes = sorted(groups, key=lambda s: normalized_size(node, groups[s][0]))
+        counts = [len(groups[s]) for s in shapes]
+        k = len(shapes)
+
+        scale = [1 / capacity if capacity > 0 else 0 for capacity in (node.cpu, node.memory, node.gpu)]
+        weights = [tuple(scale), (scale[0], scale[1], 0), (scale[0], 0, scale[2]), (0, scale[1], scale[2]),
+                   (1, 0, 0), (0, 1, 0), (0, 0, 1)]
+        weights.append(best_mix(scale, shapes, counts, node.cpu, node.memory, node.gpu))
+        weighted = [[c * w[0] + m * w[1] + g * w[2] for c, m, g in shapes] for w in weights]
+        orders = [sorted(range(k), key=lambda j: sizes[j]) for sizes in weighted]
+
+        def upper_bound(j, cpu, memory, gpu, most=None):
+            # Most deployments of shapes[j:] that could fit, taking the smallest first under each
+            # surrogate and allowing a fraction of the last shape; `most` caps the count of shapes[j]
+            bound = float('inf')
+            for w, sizes, order in zip(weights, weighted, orders):
+                budget = cpu * w[0] + memory * w[1] + gpu * w[2] + 1e-9
+                total = 0
+                for i in order:
+                    if i < j:
+                        continue
+                    count = most if i == j and most is not None else counts[i]
+                    if sizes[i] * count <= budget:
+                        total += count
+                        budget -= sizes[i] * count
+                    else:
+                        total += budget / sizes[i]
+                        break
+                bound = min(bound, int(total + 1e-9))
+            return bound
+
+        def most_that_fit(j, cpu, memory, gpu):
+            c, m, g = shapes[j]
+            take = counts[j]
+            for demand, capacity in ((c, cpu), (m, memory), (g, gpu)):
+                if demand > 0:
+                    take = min(take, int(capacity / demand + 1e-9))
+            while take > 0 and (take * c > cpu or take * m > memory or take * g > gpu):
+                take -= 1
+            return take
+
+        # Greedy fill in sorted order gives the initial incumbent
+        taken = [0] * k
+        cpu, memory, gpu = node.cpu, node.memory, node.gpu
+        for j, (c, m, g) in enumerate(shapes):
+            taken[j] = most_that_fit(j, cpu, memory, gpu)
+            cpu, memory, gpu = cpu - taken[j] * c, memory - taken[j] * m, gpu - taken[j] * g
+        best, best_total = taken, sum(taken)
+        if self.initial_solution and len(self.initial_solution) > best_total:
+            initial = Counter(shape(d) for d in self.initial_solution)
+            best = [min(initial[s], count) for s, count in zip(shapes, counts)]
+            best_total = sum(best)
+
+        root_bound = upper_bound(0, node.cpu, node.memory, node.gpu)
+        chosen = [0] * k
+        excluded = []
+
+        def search(j, cpu, memory, gpu, total):
+            nonlocal best, best_total
+            if total > best_total:
+                best, best_total = list(chosen), total
+            if self.timed_out or (deadline is not None and perf_counter() >= deadline):
+                self.timed_out = True
+                return
+            if j == k or best_total >= root_bound or total + upper_bound(j, cpu, memory, gpu) <= best_total:
+                return
+
+            c, m, g = shapes[j]
+            # A set with a shape that dominates a partly excluded one can swap it for the
+            # excluded shape, which an earlier branch (taking more of it) already covered
+            if any(ec <= c and em <= m and eg <= g for ec, em, eg in excluded):
+                most = 0
+            else:
+                most = most_that_fit(j, cpu, memory, gpu)
+            for take in range(most, -1, -1):
+                # Taking fewer only lowers the bound, so once it is reached the rest can be skipped
+                if take < most and total + upper_bound(j, cpu, memory, gpu, take) <= best_total:
+                    break
+                chosen[j] = take
+                if take < counts[j]:
+                    excluded.append(shapes[j])
+                search(j + 1, cpu - take * c, memory - take * m, gpu - take * g, total + take)
+                if take < counts[j]:
+                    excluded.pop()
+                if self.timed_out:
+                    break
+            chosen[j] = 0
+
+        search(0, node.cpu, node.memory, node.gpu, 0)
+        if self.timed_out:
+            logger.info("Shape Branch and Bound stopped at the time limit with %d deployments", best_total)
+        return take_counts(groups, [(s, count) for s, count in zip(shapes, best) if count])
@@ -0,0 +1,24 @@
+# A deployment's shape is its (cpu, memory, gpu) demand; queues tend to hold many deployments
+# of a few shapes, which the cache and the shape-aware search exploit.
+def shape(deployment):
+    return (deployment.cpu, deployment.memory, deployment.gpu)
+
+def has_few_shapes(deployments, limit):
+    # Whether the deployments come in at most `limit` shapes, stopping as soon as there are more
+    shapes = set()
+    for deployment in deployments:
+        shapes.add(shape(deployment))
+        if len(shapes) > limit:
+            return False
+    return True
+
+def group_by_shape(deployments):
+    # Deployments of each shape, in input order
+    groups = {}
+    for deployment in deployments:
+        groups.setdefault(shape(deployment), []).append(deployment)
+    return groups
+
+def take_counts(groups, counts):
+    # The first `count` deployments of each shape in `counts`, a list of (shape, count) pairs
+    return [deployment for s, count in counts for deployment in groups[s][:count]]
@@ -1,6 +1,13 @@
 from abc import ABC, abstractmethod
 
 class SchedulingStrategy(ABC):
+    # Whether the last answer is proven to schedule as many deployments as possible
+    optimal = False
+
     @abstractmethod
     def schedule_deployments(self, node, deployments):
-        pass
\ No newline at end of file
+        pass
+
+    def adopt(self, node, deployments, scheduled):
+        # Called instead of schedule_deployments with an answer found elsewhere, e.g. in a cache
+        pass
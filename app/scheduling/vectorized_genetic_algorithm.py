@@ -0,0 +1,126 @@
+import numpy as np
+from time import perf_counter
+from .strategy import SchedulingStrategy
+from .node import Node
+import logging
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# Genetic algorithm that keeps the population as a (population_size, n) permutation matrix
+# and evaluates, recombines and mutates every individual with array operations.
+class VectorizedGeneticAlgorithm(SchedulingStrategy):
+    def __init__(self, generations=200, population_size=50, mutation_rate=0.3, seed=None, time_limit=None,
+                 initial_order=None):
+        self.generations = generations
+        self.population_size = population_size
+        self.mutation_rate = mutation_rate
+        self.seed = seed
+        self.time_limit = time_limit
+        # Deployment ids in a previously good order, used as a second starting individual
+        self.initial_order = initial_order
+
+    def schedule_deployments(self, node, deployments):
+        logger.info("Scheduling deployments using Vectorized Genetic Algorithm with deployment size: %d", len(deployments))
+        deadline = perf_counter() + self.time_limit if self.time_limit is not None else None
+        capacity = np.array([node.cpu, node.memory, node.gpu], dtype=np.float64)
+        candidates = [d for d in deployments if node.can_schedule(d)]
+        if not candidates:
+            return []
+
+        rng = np.random.default_rng(self.seed)
+        demands = np.array([(d.cpu, d.memory, d.gpu) for d in candidates], dtype=np.float64)
+        n = len(candidates)
+        population_size = max(2, self.population_size)
+
+        population = rng.permuted(np.tile(np.arange(n), (population_size, 1)), axis=1)
+        # Smallest normalized demand first is a strong starting individual
+        scale = np.divide(1.0, capacity, out=np.zeros(3), where=capacity > 0)
+        population[0] = np.argsort(demands @ scale, kind='stable')
+        if self.initial_order:
+            rank = {deployment_id: i for i, deployment_id in enumerate(self.initial_order)}
+            population[1] = sorted(range(n), key=lambda i: rank.get(candidates[i].id, len(rank)))
+
+        # No individual can fit more deployments than the smallest demands of any one resource allow
+        upper_bound = min(np.searchsorted(np.cumsum(np.sort(demands[:, k])), capacity[k], side='right') for k in range(3))
+
+        best_individual = population[0].copy()
+        best_fitness = -1
+        for _ in range(self.generations):
+            fitness = self._evaluate(population, demands, capacity)
+            ranking = np.argsort(-fitness, kind='stable')
+            if fitness[ranking[0]] > best_fitness:
+                best_fitness = int(fitness[ranking[0]])
+                best_individual = population[ranking[0]].copy()
+            if best_fitness == upper_bound:  # Early stopping
+                break
+            if deadline is not None and perf_counter() >= deadline:
+                break
+
+            elite = population[ranking[:max(1, population_size // 2)]]
+            parents = rng.integers(0, len(elite), size=(2, population_size))
+            population = self._crossover(elite[parents[0]], elite[parents[1]], rng)
+            self._mutate(population, rng)
+            population[0] = best_individual
+
+        # The fitness counts the feasible prefix; finish with a greedy fill over the rest, for as
+        # long as the time limit allows
+        prefix = max(best_fitness, 0)
+        node_copy = Node(node.id, node.cpu, node.memory, node.gpu)
+        scheduled_deployments = [candidates[i] for i in best_individual[:prefix]]
+        for d in scheduled_deployments:
+            node_copy.schedule(d)
+        for j, i in enumerate(best_individual[prefix:]):
+            if deadline is not None and j % 256 == 255 and perf_counter() >= deadline:
+                break
+            if node_copy.schedule(candidates[i]):
+                scheduled_deployments.append(candidates[i])
+        logger.info("Vectorized Genetic Algorithm fitness: %d", len(scheduled_deployments))
+        return scheduled_deployments
+
+    @staticmethod
+    def _evaluate(population, demands, capacity):
+        # Demands are non-negative, so the running totals only grow and the positions that
+        # fit the capacity form a prefix of each individual.
+        fitness = None
+        for k in range(demands.shape[1]):
+            fits = np.count_nonzero(np.cumsum(demands[:, k][population], axis=1) <= capacity[k], axis=1)
+            fitness = fits if fitness is None else np.minimum(fitness, fits)
+        return fitness
+
+    @staticmethod
+    def _crossover(parent1, parent2, rng):
+        # Order crossover: keep a random segment of parent1 and fill the remaining positions
+        # with the missing genes in the order they appear in parent2.
+        size, n = parent1.shape
+        rows = np.arange(size)[:, None]
+        bounds = np.sort(rng.integers(0, n + 1, size=(size, 2)), axis=1)
+        start, end = bounds[:, :1], bounds[:, 1:]
+        positions = np.arange(n)
+        in_segment = (positions >= start) & (positions < end)
+
+        taken = np.zeros((size, n), dtype=bool)
+        segment_rows, _ = np.nonzero(in_segment)
+        taken[segment_rows, parent1[in_segment]] = True
+
+        fill_genes = np.take_along_axis(parent2, np.argsort(taken[rows, parent2], axis=1, kind='stable'), axis=1)
+        # Positions outside the segment in order, followed by the segment positions
+        outside = n - (end - start)
+        fill_positions = np.where(positions < outside, np.where(positions < start, positions, positions + end - start),
+                                  positions - outside + start)
+        child = np.empty_like(parent1)
+        child[rows, fill_positions] = fill_genes
+        child[in_segment] = parent1[in_segment]
+        return child
+
+    def _mutate(self, population, rng):
+        size, n = population.shape
+        rows = np.nonzero(rng.random(size) < self.mutation_rate)[0]
+        if n < 2 or len(rows) == 0:
+            return
+        first = rng.integers(0, n, size=len(rows))
+        second = rng.integers(0, n, size=len(rows))
+        swapped = population[rows, first]
+        population[rows, first] = population[rows, second]
+        population[rows, second] = swapped
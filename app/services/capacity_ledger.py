@@ -0,0 +1,128 @@
+import logging
+from sqlalchemy import func
+from app.models.models import db, Deployment, Cluster
+from app.redis_helper import CAPACITY_RESOURCES, node_field, reserve_capacity, release_capacity, load_capacity, read_capacity, read_capacities
+from app.scheduling.node import Node
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# Free capacity of every cluster is held in a Redis ledger and admission reserves it with one
+# atomic script call. The allocated_* columns of clusters and nodes are written from the ledger
+# by sync() in the background, and reconcile() rebuilds a ledger from the running deployments
+# in the database should the two drift apart (e.g. a crash between a reservation and its commit).
+class CapacityLedger:
+    # Drift found by the last reconcile() of each cluster in this process, as (ledger version,
+    # free capacity in the database)
+    drifts = {}
+
+    @staticmethod
+    def from_database(cluster):
+        # Free capacity of the cluster and its nodes as ledger fields, from the running deployments
+        used = db.session.query(Deployment.node_id, func.sum(Deployment.cpu), func.sum(Deployment.ram), func.sum(Deployment.gpu)).filter(
+            Deployment.cluster_id == cluster.id, Deployment.status == 'running').group_by(Deployment.node_id).all()
+        used = {node_id: (cpu or 0, ram or 0, gpu or 0) for node_id, cpu, ram, gpu in used}
+        totals = [sum(u[i] for u in used.values()) for i in range(3)]
+        free = {resource: total - totals[i]
+                for i, (resource, total) in enumerate(zip(CAPACITY_RESOURCES, (cluster.total_cpu, cluster.total_ram, cluster.total_gpu)))}
+        for node in cluster.nodes:
+            node_used = used.get(node.id, (0, 0, 0))
+            for i, (resource, total) in enumerate(zip(CAPACITY_RESOURCES, (node.total_cpu, node.total_ram, node.total_gpu))):
+                free[node_field(node.id, resource)] = total - node_used[i]
+        return free
+
+    @staticmethod
+    def load(cluster):
+        # Loads the ledger of a cluster unless one is already there
+        load_capacity(cluster.id, CapacityLedger.from_database(cluster))
+        return read_capacity(cluster.id)
+
+    @staticmethod
+    def ledger(cluster):
+        return read_capacity(cluster.id) or CapacityLedger.load(cluster)
+
+    @staticmethod
+    def free(cluster):
+        # Free (cpu, ram, gpu) of the cluster, in the order queue demands are packed
+        ledger = CapacityLedger.ledger(cluster)
+        return tuple(ledger[resource] for resource in CAPACITY_RESOURCES)
+
+    @staticmethod
+    def free_nodes(cluster):
+        ledger = CapacityLedger.ledger(cluster)
+        return [Node(id=node.id, **{key: ledger.get(node_field(node.id, resource), 0)
+                                    for key, resource in zip(("cpu", "memory", "gpu"), CAPACITY_RESOURCES)})
+                for node in cluster.nodes]
+
+    @staticmethod
+    def reserve_all(cluster, placements):
+        # Reserves (deployment, node id) placements on the cluster in one call; returns whether
+        # each was reserved
+        demands = [(deployment.cpu, deployment.ram, deployment.gpu, node_id) for deployment, node_id in placements]
+        if not demands:
+            return []
+        reserved = reserve_capacity(cluster.id, demands)
+        if reserved is None:
+            CapacityLedger.load(cluster)
+            reserved = reserve_capacity(cluster.id, demands)
+        return reserved
+
+    @staticmethod
+    def release(deployment):
+        CapacityLedger.release_all([deployment])
+
+    @staticmethod
+    def release_all(deployments):
+        # One call per cluster; a ledger that is not loaded is built from the database later,
+        # where the deployments are no longer running
+        by_cluster = {}
+        for deployment in deployments:
+            by_cluster.setdefault(deployment.cluster_id, []).append((deployment.cpu, deployment.ram, deployment.gpu, deployment.node_id))
+        for cluster_id, demands in by_cluster.items():
+            release_capacity(cluster_id, demands)
+
+    @staticmethod
+    def reconcile(cluster_id):
+        # Rebuilds the ledger from the database once two consecutive checks find the same drift
+        # at the same ledger version. A reservation made in any process whose deployment is not
+        # committed yet differs from the database too, but it bumps the version and is committed
+        # or released long before the next check; a leak left by a crash leaves the ledger as it
+        # is. The rebuild is skipped if the ledger changes meanwhile. Returns whether the ledger
+        # was rewritten.
+        cluster = Cluster.query.get(cluster_id)
+        if not cluster:
+            return False
+        ledger = read_capacity(cluster_id)
+        free = CapacityLedger.from_database(cluster)
+        if ledger is None:
+            return load_capacity(cluster_id, free)
+        if all(ledger.get(field) == amount for field, amount in free.items()):
+            CapacityLedger.drifts.pop(cluster_id, None)
+            return False
+        drift = (ledger["version"], free)
+        if CapacityLedger.drifts.get(cluster_id) != drift:
+            CapacityLedger.drifts[cluster_id] = drift
+            logger.info(f"Capacity ledger of cluster {cluster_id} differs from the database at version {ledger['version']}, checking again")
+            return False
+        del CapacityLedger.drifts[cluster_id]
+        logger.warning(f"Capacity ledger of cluster {cluster_id} drifted from the database, rebuilding it")
+        return load_capacity(cluster_id, free, ledger["version"])
+
+    @staticmethod
+    def sync(clusters):
+        # Writes the allocated resources of the clusters and their nodes from their ledgers in one commit
+        ledgers = read_capacities([cluster.id for cluster in clusters])
+        for cluster in clusters:
+            ledger = ledgers[cluster.id]
+            if ledger is None:
+                continue
+            cluster.allocated_cpu = cluster.total_cpu - ledger["cpu"]
+            cluster.allocated_ram = cluster.total_ram - ledger["ram"]
+            cluster.allocated_gpu = cluster.total_gpu - ledger["gpu"]
+            for node in cluster.nodes:
+                if node_field(node.id, "cpu") in ledger:
+                    node.allocated_cpu = node.total_cpu - ledger[node_field(node.id, "cpu")]
+                    node.allocated_ram = node.total_ram - ledger[node_field(node.id, "ram")]
+                    node.allocated_gpu = node.total_gpu - ledger[node_field(node.id, "gpu")]
+        db.session.commit()
@@ -1,5 +1,7 @@
 import logging
-from app.models.models import db, Cluster
+from app.models.models import db, Cluster, ClusterNode
+from app import async_redis_helper
+from app.redis_helper import cluster_tag, org_tag
 
 # Initialize logger
 logger = logging.getLogger(__name__)
@@ -7,7 +9,7 @@ logging.basicConfig(level=logging.INFO)
 
 class ClusterService:
     @staticmethod
-    def create_cluster(name, total_ram, total_cpu, total_gpu, created_by, organization_id):
+    def create_cluster(name, total_ram, total_cpu, total_gpu, created_by, organization_id, nodes=None):
         logger.info("Creating cluster")
         if(organization_id is None):
             logger.warning("You need to join an organization to create a cluster")
@@ -15,13 +17,33 @@ class ClusterService:
         if Cluster.query.filter_by(name=name).first():
             logger.warning("Cluster already exists")
             raise ValueError("Cluster already exists")
+
+        if nodes and (sum(n['total_ram'] for n in nodes) != total_ram or
+                      sum(n['total_cpu'] for n in nodes) != total_cpu or
+                      sum(n['total_gpu'] for n in nodes) != total_gpu):
+            logger.warning("Node capacities do not add up to the cluster totals")
+            raise ValueError("Node capacities must add up to the cluster totals")
         
         new_cluster = Cluster(name=name, total_ram=total_ram, total_cpu=total_cpu, total_gpu=total_gpu, created_by=created_by, organization_id=organization_id)
         db.session.add(new_cluster)
+        for node in nodes or []:
+            new_cluster.nodes.append(ClusterNode(total_ram=node['total_ram'], total_cpu=node['total_cpu'], total_gpu=node['total_gpu']))
         db.session.commit()
         logger.info(f"Cluster created: {new_cluster.name}")
         return new_cluster
 
     @staticmethod
     def get_all_clusters():
-        return Cluster.query.all()
\ No newline at end of file
+        return Cluster.query.all()
+
+    @staticmethod
+    def get_queue_summaries():
+        # The queues of every cluster and organization, read concurrently on one event loop
+        clusters = Cluster.query.all()
+        organization_ids = sorted({cluster.organization_id for cluster in clusters})
+        tags = [cluster_tag(cluster.id) for cluster in clusters] + [org_tag(organization_id) for organization_id in organization_ids]
+        summaries = async_redis_helper.run(async_redis_helper.queue_summaries, tags)
+        return {
+            "clusters": {cluster.id: summaries[cluster_tag(cluster.id)] for cluster in clusters},
+            "organizations": {organization_id: summaries[org_tag(organization_id)] for organization_id in organization_ids},
+        }
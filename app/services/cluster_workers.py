@@ -0,0 +1,104 @@
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from time import perf_counter
+from flask import current_app
+from app.config import Config
+
+# Initialize logger
+logger = logging.getLogger(__name__)
+logging.basicConfig(level=logging.INFO)
+
+# Single-writer workers: every mutation of a cluster (admitting, releasing and draining
+# deployments) made in this process runs on the one thread that owns it, so concurrent requests
+# and completions in the process never race on the cluster and need no distributed lock.
+# Clusters are owned per organization, since organization-wide deployments are packed across all
+# clusters of an organization; each organization maps to one of a fixed number of worker threads,
+# each with its own task queue. Ownership is per process: with consumers in other processes
+# (run.py --no-consumer) they and the Flask process mutate the same clusters, and only the
+# capacity ledger keeps them from over-committing one.
+class ClusterWorkers:
+    def __init__(self, size):
+        self.size = size
+        self.queues = [queue.Queue() for _ in range(size)]
+        self.threads = []
+        self.app = None
+        self.local = threading.local()
+        self.stats_lock = threading.Lock()
+        self.tasks = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+        self.max_run = 0.0
+
+    def owner(self, organization_id):
+        return (organization_id or 0) % self.size
+
+    def start(self, app):
+        with self.stats_lock:
+            if self.threads:
+                return
+            self.app = app
+            for index in range(self.size):
+                thread = threading.Thread(target=self._work, args=(index,), name=f"cluster-worker-{index}", daemon=True)
+                thread.start()
+                self.threads.append(thread)
+        logger.info(f"Started {self.size} cluster workers")
+
+    def submit(self, organization_id, fn, *args, **kwargs):
+        # Queues fn on the worker owning the organization's clusters; returns a Future
+        if not self.threads:
+            self.start(current_app._get_current_object())
+        future = Future()
+        self.queues[self.owner(organization_id)].put((perf_counter(), future, fn, args, kwargs))
+        return future
+
+    def run(self, organization_id, fn, *args, **kwargs):
+        # Runs fn on the owning worker and waits for its result; a task already on that worker
+        # runs it inline instead of waiting for itself
+        if getattr(self.local, "index", None) == self.owner(organization_id):
+            return fn(*args, **kwargs)
+        return self.submit(organization_id, fn, *args, **kwargs).result()
+
+    def _work(self, index):
+        self.local.index = index
+        tasks = self.queues[index]
+        while True:
+            enqueued, future, fn, args, kwargs = tasks.get()
+            started = perf_counter()
+            if future.set_running_or_notify_cancel():
+                try:
+                    with self.app.app_context():
+                        future.set_result(fn(*args, **kwargs))
+                except Exception as e:
+                    future.set_exception(e)
+            self._record(started - enqueued, perf_counter() - started)
+            tasks.task_done()
+
+    def _record(self, wait, run):
+        with self.stats_lock:
+            self.tasks += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            self.total_run += run
+            self.max_run = max(self.max_run, run)
+
+    def stats(self):
+        # Time tasks waited for their worker (what a lock wait used to be) and current queue depths
+        with self.stats_lock:
+            return {
+                "workers": self.size,
+                "tasks": self.tasks,
+                "queue_depth": [tasks.qsize() for tasks in self.queues],
+                "wait_ms": {
+                    "mean": self.total_wait / self.tasks * 1000 if self.tasks else 0,
+                    "max": self.max_wait * 1000,
+                },
+                "run_ms": {
+                    "mean": self.total_run / self.tasks * 1000 if self.tasks else 0,
+                    "max": self.max_run * 1000,
+                },
+            }
+
+cluster_workers = ClusterWorkers(Config.SCHEDULER_WORKERS)
@@ -1,12 +1,17 @@
-import json
 import random
+from app.config import Config
 from app.models.models import db, Deployment, Cluster, User
-from app.redis_client import r
-from app.redis_helper import add_deployment_to_redis, remove_deployment_from_redis, fetch_deployments
-from app.scheduling.all_combinations import AllCombinations
-from app.scheduling.genetic_algorithm import GeneticAlgorithm
+from app.events import publish_event
+from app.redis_helper import org_queue, remove_deployments_from_queue, fetch_deployments_from_queue, cluster_queue, fetch_deployments_freed_from_queue, queue_version, queue_bounds, may_fit, queued_priorities, cluster_tag, org_tag, schedule_completions, cancel_completions, enqueue_deployments
+from app.services.capacity_ledger import CapacityLedger
+from app.scheduling.anytime import AnytimeStrategy
 from app.scheduling.scheduler import Scheduler
+from app.scheduling.multi_node_scheduler import MultiNodeScheduler
+from app.scheduling.node_index import NodeIndex
+from app.scheduling.queue_state import QueueState, QueueStates
+from app.scheduling.schedule_cache import ScheduleCache
 from app.scheduling.node import Node
+from app.scheduling.deployment_dto import DeploymentDto
 from copy import copy
 import logging
 
@@ -15,9 +20,14 @@ logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
 class DeploymentService:
-    priorities = [1, 0]
+    priorities = Config.PRIORITY_LEVELS
+    scheduling_time_budget = Config.SCHEDULING_TIME_BUDGET_MS / 1000
+    # QueueState of the last scheduling run on the most recently drained cluster queues in this process
+    queue_states = QueueStates(maxsize=Config.QUEUE_STATE_CACHE_SIZE)
+    # Decisions by free capacity and queued demand shapes, shared by every cluster in this process
+    schedule_cache = ScheduleCache(maxsize=Config.SCHEDULE_CACHE_SIZE)
     @staticmethod
-    def create_deployment(name, ram, cpu, gpu, priority, docker_path, cluster_name, created_by):
+    def create_deployment(name, ram, cpu, gpu, priority, docker_path, cluster_name, created_by, any_cluster=False):
         logger.info("Creating deployment for cluster: %s", cluster_name)
         if not docker_path:
             raise ValueError("Docker path is required")
@@ -25,6 +35,9 @@ class DeploymentService:
         if priority not in DeploymentService.priorities:
             logger.error("Invalid priority")
             raise ValueError("Invalid priority")
+
+        if any_cluster:
+            return DeploymentService.create_organization_deployment(name, ram, cpu, gpu, priority, created_by)
         
         cluster = Cluster.query.filter_by(name=cluster_name).first()
         if not cluster:
@@ -40,125 +53,552 @@ class DeploymentService:
             logger.error("User does not belong to the same organization as the cluster")
             raise ValueError("User does not belong to the same organization as the cluster")
         
+        # Capacity is reserved atomically in the ledger before the deployment is inserted, in its
+        # final status and in one transaction, so admissions from any number of processes never
+        # over-commit the cluster and need no lock
         new_deployment = Deployment(name=name, ram=ram, cpu=cpu, gpu=gpu, priority=priority, cluster_id=cluster.id, status='queued', created_by=created_by)
-        db.session.add(new_deployment)
-        db.session.commit()
-
-        if (cluster.allocated_ram + ram <= cluster.total_ram and
-            cluster.allocated_cpu + cpu <= cluster.total_cpu and
-            cluster.allocated_gpu + gpu <= cluster.total_gpu):
-            cluster.allocated_ram += ram
-            cluster.allocated_cpu += cpu
-            cluster.allocated_gpu += gpu
-            new_deployment.status = 'running'
-            db.session.add(cluster)
-            db.session.add(new_deployment)
-            db.session.commit()
-
-            ttl = DeploymentService.get_random_ttl()
+        if not DeploymentService.place_on_cluster(new_deployment, cluster) and not DeploymentService.fits_cluster(new_deployment, cluster):
+            new_deployment.status = 'rejected'
+        DeploymentService.commit_admission(new_deployment)
 
-            # Simulate deployment running on Redis which will complete after some random TTL
-            r.setex(f"deployment:{new_deployment.id}", ttl, json.dumps({'deployment_id': new_deployment.id}))
+        if new_deployment.status == 'running':
             logger.info("Deployment is running")
             return new_deployment, "running"
-        elif ram > cluster.total_ram or cpu > cluster.total_cpu or gpu > cluster.total_gpu:
-            new_deployment.status = 'rejected'
-            db.session.commit()
+        elif new_deployment.status == 'rejected':
             logger.info("Resources requested are more than available resources")
             raise ValueError("Resources requested are more than available resources")
         else:
-            new_deployment.status = 'queued'
-            db.session.commit()
-            add_deployment_to_redis(cluster.id, priority, new_deployment.id, new_deployment.cpu, new_deployment.ram, new_deployment.gpu)
+            DeploymentService.enqueue_admitted(new_deployment, cluster_queue(cluster.id, priority))
+            publish_event("enqueue", cluster.id, cluster.organization_id, [new_deployment.id])
             logger.info("Deployment queued to Redis")
             return new_deployment, "queued"
 
+    @staticmethod
+    def create_organization_deployment(name, ram, cpu, gpu, priority, created_by):
+        user = User.query.get(created_by)
+        if not user:
+            logger.error("User not found")
+            raise ValueError("User not found")
+
+        if user.organization_id is None:
+            logger.error("User does not belong to an organization")
+            raise ValueError("You need to join an organization to deploy on any cluster")
+
+        clusters = Cluster.query.filter_by(organization_id=user.organization_id).all()
+        if not clusters:
+            logger.error("No clusters in organization")
+            raise ValueError("No clusters in organization")
+
+        new_deployment = Deployment(name=name, ram=ram, cpu=cpu, gpu=gpu, priority=priority, organization_id=user.organization_id, status='queued', created_by=created_by)
+        if not any(DeploymentService.fits_cluster(new_deployment, c) for c in clusters):
+            new_deployment.status = 'rejected'
+            DeploymentService.commit_admission(new_deployment)
+            logger.info("Resources requested are more than any cluster in the organization provides")
+            raise ValueError("Resources requested are more than available resources")
+
+        nodes = [DeploymentService.free_capacity(c) for c in clusters]
+        assignments = MultiNodeScheduler().schedule_deployments(nodes, [DeploymentService.to_dto(new_deployment)])
+        cluster = next((c for c in clusters if assignments[c.id]), None)
+        placed = cluster is not None and DeploymentService.place_on_cluster(new_deployment, cluster)
+        DeploymentService.commit_admission(new_deployment)
+        if placed:
+            logger.info(f"Deployment is running on cluster {cluster.id}")
+            return new_deployment, "running"
+
+        DeploymentService.enqueue_admitted(new_deployment, org_queue(user.organization_id, priority))
+        publish_event("enqueue", None, user.organization_id, [new_deployment.id])
+        logger.info("Deployment queued to Redis for any cluster of organization %s", user.organization_id)
+        return new_deployment, "queued"
+
+    @staticmethod
+    def enqueue_admitted(deployment, queue):
+        # Queues a deployment committed as queued, like a batch of them in admit
+        if DeploymentService.enqueue_committed([(queue, deployment.id, deployment.cpu, deployment.ram, deployment.gpu)]):
+            raise ValueError("Deployment could not be queued")
+
+    @staticmethod
+    def create_deployments(specs, created_by):
+        # Admits a batch of deployments (CreateDeploymentSchema dicts) of one user; returns the
+        # id, name and status of each deployment, in the order given
+        logger.info(f"Creating {len(specs)} deployments")
+        deployments, organization_clusters = DeploymentService.build_deployments(specs, created_by)
+        return DeploymentService.admit(deployments, organization_clusters)
+
+    @staticmethod
+    def submit_deployment(spec, created_by):
+        # Stores a deployment as submitted and leaves starting or queueing it to the admitter of
+        # its cluster, which takes the submissions of a few milliseconds together
+        deployments, _ = DeploymentService.build_deployments([spec], created_by, status='submitted')
+        deployment, cluster = deployments[0]
+        db.session.add(deployment)
+        db.session.commit()
+        if deployment.status == 'rejected':
+            logger.info("Resources requested are more than available resources")
+            raise ValueError("Resources requested are more than available resources")
+        try:
+            publish_event("submit", deployment.cluster_id, cluster.organization_id if cluster else deployment.organization_id, [deployment.id])
+        except Exception:
+            # The admitter would never hear of it, so it is rejected rather than left submitted
+            logger.exception(f"Publishing the submission of deployment {deployment.id} failed, rejecting it")
+            deployment.status = 'rejected'
+            db.session.commit()
+            raise
+        logger.info(f"Deployment {deployment.id} submitted")
+        return deployment
+
+    @staticmethod
+    def admit_submitted(cluster_id, organization_id, deployment_ids):
+        # Admits the submitted deployments of a cluster (or, without one, of the organization's
+        # queue) as one batch
+        deployments = Deployment.query.filter(Deployment.id.in_(deployment_ids), Deployment.status == 'submitted').all()
+        if not deployments:
+            return []
+        cluster = Cluster.query.get(cluster_id) if cluster_id is not None else None
+        organization_clusters = [] if cluster_id is not None else Cluster.query.filter_by(organization_id=organization_id).all()
+        for deployment in deployments:
+            candidates = [cluster] if cluster else organization_clusters
+            fits = any(DeploymentService.fits_cluster(deployment, c) for c in candidates)
+            deployment.status = 'queued' if fits else 'rejected'
+        return DeploymentService.admit([(deployment, cluster) for deployment in deployments], organization_clusters)
+
+    @staticmethod
+    def build_deployments(specs, created_by, status='queued'):
+        # Validates deployment specs of one user and returns (deployment, cluster) pairs, the
+        # cluster being None for deployments on any cluster of the organization, and the
+        # organization's clusters when needed. Every cluster referenced is loaded once;
+        # deployments no cluster could ever hold are rejected.
+        for spec in specs:
+            if not spec.get('docker_path'):
+                raise ValueError("Docker path is required")
+            if spec['priority'] not in DeploymentService.priorities:
+                logger.error("Invalid priority")
+                raise ValueError("Invalid priority")
+
+        user = User.query.get(created_by)
+        if not user:
+            logger.error("User not found")
+            raise ValueError("User not found")
+
+        names = {spec['cluster_name'] for spec in specs if not spec.get('any_cluster')}
+        clusters = {c.name: c for c in Cluster.query.filter(Cluster.name.in_(names)).all()} if names else {}
+        for name in names:
+            if name not in clusters:
+                logger.error("Cluster not found")
+                raise ValueError(f"Cluster not found: {name}")
+            if clusters[name].organization_id != user.organization_id:
+                logger.error("User does not belong to the same organization as the cluster")
+                raise ValueError("User does not belong to the same organization as the cluster")
+
+        organization_clusters = []
+        if any(spec.get('any_cluster') for spec in specs):
+            if user.organization_id is None:
+                logger.error("User does not belong to an organization")
+                raise ValueError("You need to join an organization to deploy on any cluster")
+            organization_clusters = Cluster.query.filter_by(organization_id=user.organization_id).all()
+            if not organization_clusters:
+                logger.error("No clusters in organization")
+                raise ValueError("No clusters in organization")
+
+        deployments = []
+        for spec in specs:
+            cluster = None if spec.get('any_cluster') else clusters[spec['cluster_name']]
+            deployment = Deployment(name=spec['name'], ram=spec['ram'], cpu=spec['cpu'], gpu=spec['gpu'], priority=spec['priority'],
+                                    cluster_id=cluster.id if cluster else None, organization_id=None if cluster else user.organization_id,
+                                    status=status, created_by=created_by)
+            candidates = [cluster] if cluster else organization_clusters
+            if not any(DeploymentService.fits_cluster(deployment, c) for c in candidates):
+                deployment.status = 'rejected'
+            deployments.append((deployment, cluster))
+        return deployments, organization_clusters
+
+    @staticmethod
+    def admit(deployments, organization_clusters):
+        # Starts the best set of the queued (deployment, cluster) pairs: the deployments of each
+        # cluster are packed together against its free capacity, so the best set is admitted
+        # rather than the first ones that fit. The batch is written in one transaction and the
+        # rest is queued with one script call per cluster once it is committed.
+        by_cluster = {}
+        for deployment, cluster in deployments:
+            if cluster is not None and deployment.status == 'queued':
+                by_cluster.setdefault(cluster.id, (cluster, []))[1].append(deployment)
+        for cluster, pending in by_cluster.values():
+            DeploymentService.pack_on_cluster(cluster, pending)
+        pending = [deployment for deployment, cluster in deployments if cluster is None and deployment.status == 'queued']
+        if pending:
+            DeploymentService.pack_on_organization(organization_clusters, pending)
+
+        admitted = [deployment for deployment, _ in deployments]
+        running = [d for d in admitted if d.status == 'running']
+        db.session.add_all(admitted)
+        try:
+            # Assigns the ids
+            db.session.flush()
+        except Exception:
+            CapacityLedger.release_all(running)
+            db.session.rollback()
+            raise
+        # Read everything needed before the commit expires the rows
+        results = [{"id": d.id, "name": d.name, "status": d.status} for d in admitted]
+        queued = [(cluster_queue(d.cluster_id, d.priority) if d.cluster_id else org_queue(d.organization_id, d.priority), d.id, d.cpu, d.ram, d.gpu)
+                  for d in admitted if d.status == 'queued']
+        events = {}
+        for d, cluster in deployments:
+            if d.status == 'queued':
+                events.setdefault((d.cluster_id, cluster.organization_id if cluster else d.organization_id), []).append(d.id)
+        DeploymentService.commit_started(running)
+
+        rejected = DeploymentService.enqueue_committed(queued)
+        for result in results:
+            if result["id"] in rejected:
+                result["status"] = "rejected"
+        for (cluster_id, organization_id), ids in events.items():
+            ids = [deployment_id for deployment_id in ids if deployment_id not in rejected]
+            if ids:
+                publish_event("enqueue", cluster_id, organization_id, ids)
+        logger.info(f"Deployments admitted: {len(running)} running, {len(queued) - len(rejected)} queued, {len(results) - len(running) - len(queued) + len(rejected)} rejected")
+        return results
+
+    @staticmethod
+    def enqueue_committed(queued):
+        # Queues committed deployments, given as (queue, id, cpu, ram, gpu) tuples, retrying the
+        # ones that failed once. Those that still could not be queued are rejected, so no row is
+        # left queued that no queue holds. Returns the ids of the rejected deployments.
+        for _ in range(2):
+            try:
+                queued = [entry for entry, done in zip(queued, enqueue_deployments(queued)) if not done]
+            except Exception:
+                logger.exception("Queueing admitted deployments failed")
+            if not queued:
+                return set()
+        rejected = {entry[1] for entry in queued}
+        logger.error(f"Deployments {sorted(rejected)} could not be queued, rejecting them")
+        for deployment in Deployment.query.filter(Deployment.id.in_(rejected)).all():
+            deployment.status = 'rejected'
+        db.session.commit()
+        return rejected
+
+    @staticmethod
+    def pack_on_cluster(cluster, deployments):
+        # Starts the best set of each level of the deployments that fits the cluster, highest
+        # level first; once a level does not fit entirely, lower levels stay queued behind it
+        node_index = DeploymentService.node_index(cluster) if cluster.nodes else None
+        for priority in DeploymentService.priorities:
+            level = [d for d in deployments if d.priority == priority]
+            if not level:
+                continue
+            cpu, ram, gpu = DeploymentService.free_resources(cluster)
+            dtos = [DeploymentDto(i, cpu=d.cpu, memory=d.ram, gpu=d.gpu) for i, d in enumerate(level)]
+            strategy = AnytimeStrategy(time_budget=DeploymentService.scheduling_time_budget)
+            scheduler = Scheduler(strategy=strategy, cache=DeploymentService.schedule_cache)
+            scheduled = scheduler.schedule_deployments(Node(id=cluster.id, cpu=cpu, memory=ram, gpu=gpu), dtos)
+            # The chosen set fits the cluster as a whole; place it on individual nodes largest first
+            if node_index:
+                scheduled = sorted(scheduled, key=lambda d: (d.gpu, d.memory, d.cpu), reverse=True)
+            placed = DeploymentService.place_all([level[dto.id] for dto in scheduled], cluster, node_index)
+            if len(placed) < len(level):
+                return
+
+    @staticmethod
+    def pack_on_organization(clusters, deployments):
+        # Packs each level of organization-wide deployments across the free capacity of every
+        # cluster, highest level first
+        node_indexes = {cluster.id: DeploymentService.node_index(cluster) for cluster in clusters if cluster.nodes}
+        for priority in DeploymentService.priorities:
+            level = [d for d in deployments if d.priority == priority]
+            if not level:
+                continue
+            nodes = [DeploymentService.free_capacity(c) for c in clusters]
+            dtos = [DeploymentDto(i, cpu=d.cpu, memory=d.ram, gpu=d.gpu) for i, d in enumerate(level)]
+            assignments = MultiNodeScheduler().schedule_deployments(nodes, dtos)
+            placed = 0
+            for cluster in clusters:
+                placed += len(DeploymentService.place_all([level[dto.id] for dto in assignments[cluster.id]], cluster, node_indexes.get(cluster.id)))
+            if placed < len(level):
+                return
+
+    @staticmethod
+    def commit_admission(deployment):
+        # Inserts the deployment in its final status, a running one with its completion scheduled
+        # before the commit; if that fails, the capacity it reserved is given back
+        db.session.add(deployment)
+        if deployment.status == 'running':
+            try:
+                # Assigns the id its completion is scheduled under
+                db.session.flush()
+            except Exception:
+                CapacityLedger.release(deployment)
+                db.session.rollback()
+                raise
+            DeploymentService.commit_started([deployment])
+            return
+        try:
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+    @staticmethod
+    def to_dto(deployment):
+        return DeploymentDto(deployment.id, cpu=deployment.cpu, memory=deployment.ram, gpu=deployment.gpu)
+
+    @staticmethod
+    def free_capacity(cluster):
+        cpu, ram, gpu = DeploymentService.free_resources(cluster)
+        return Node(id=cluster.id, cpu=cpu, memory=ram, gpu=gpu)
+
+    @staticmethod
+    def free_resources(cluster):
+        # Free (cpu, ram, gpu) of the cluster, in the order queue demands are packed
+        return CapacityLedger.free(cluster)
+
+    @staticmethod
+    def node_index(cluster):
+        return NodeIndex(CapacityLedger.free_nodes(cluster))
+
+    @staticmethod
+    def fits_cluster(deployment, cluster):
+        # Whether the deployment could ever run on the cluster, i.e. fits an empty cluster (or node)
+        if cluster.nodes:
+            return any(deployment.ram <= n.total_ram and deployment.cpu <= n.total_cpu and deployment.gpu <= n.total_gpu for n in cluster.nodes)
+        return deployment.ram <= cluster.total_ram and deployment.cpu <= cluster.total_cpu and deployment.gpu <= cluster.total_gpu
+
+    @staticmethod
+    def place_on_cluster(deployment, cluster, node_index=None):
+        return bool(DeploymentService.place_all([deployment], cluster, node_index))
+
+    @staticmethod
+    def place_all(deployments, cluster, node_index=None):
+        # Reserves the deployments' resources in the cluster's capacity ledger in one call and,
+        # for clusters made up of nodes, on the best fitting node of each. Returns the ones placed.
+        placements = []
+        for deployment in deployments:
+            node_id = None
+            if cluster.nodes:
+                if node_index is None:
+                    node_index = DeploymentService.node_index(cluster)
+                node = node_index.schedule(DeploymentService.to_dto(deployment))
+                if node is None:
+                    continue
+                node_id = node.id
+            placements.append((deployment, node_id))
+        placed = []
+        for (deployment, node_id), reserved in zip(placements, CapacityLedger.reserve_all(cluster, placements)):
+            if reserved:
+                deployment.node_id = node_id
+                deployment.cluster_id = cluster.id
+                deployment.status = 'running'
+                placed.append(deployment)
+        return placed
+
+    @staticmethod
+    def start_scheduled_deployments(queue, cluster, scheduled_deployments, node_index=None):
+        # Starts the deployments scheduled from a cluster queue as one batch: one query loads
+        # them, one ledger call reserves their resources, one call schedules their completions,
+        # one transaction marks them running and one script call dequeues them. Returns the ids
+        # of the scheduled deployments taken off the queue: started, or no longer queued.
+        ids = {int(dto.id): dto.id for dto in scheduled_deployments}
+        deployments = {d.id: d for d in Deployment.query.filter(Deployment.id.in_(ids)).all()} if ids else {}
+        queued, stale = [], []
+        for deployment_id in ids:
+            deployment = deployments.get(deployment_id)
+            if deployment is None or deployment.status != 'queued':
+                logger.info(f"Deployment ID {deployment_id} is no longer queued")
+                stale.append(deployment_id)
+            else:
+                queued.append(deployment)
+
+        started = DeploymentService.place_all(queued, cluster, node_index)
+        started_ids = DeploymentService.commit_started(started) if started else []
+        # Dequeued only once committed, so a failed commit leaves them queued
+        if started_ids or stale:
+            remove_deployments_from_queue(queue, started_ids + stale)
+        if len(started) < len(queued):
+            logger.info(f"Insufficient resources for {len(queued) - len(started)} deployments")
+        logger.info(f"Deployment IDs {started_ids} are running")
+        return {ids[deployment_id] for deployment_id in started_ids + stale}
+
+    @staticmethod
+    def commit_started(deployments):
+        # Commits deployments placed on a cluster as running. Their completions are scheduled
+        # first, so a committed deployment always finishes; if the commit fails the completions
+        # are cancelled and the reservations given back. Returns their ids.
+        # Read before committing, which expires every loaded row
+        ttls = {deployment.id: DeploymentService.get_random_ttl() for deployment in deployments}
+        try:
+            schedule_completions(ttls)
+            db.session.commit()
+        except Exception:
+            # Released before the rollback reverts their node ids
+            try:
+                CapacityLedger.release_all(deployments)
+                cancel_completions(list(ttls))
+            finally:
+                db.session.rollback()
+            raise
+        return list(ttls)
+
     @staticmethod
     def get_random_ttl():
         return random.randint(20, 30)
     
     @staticmethod
     def handle_expire_deployment(deployment_id):
-        deployment = Deployment.query.get(deployment_id)
-        cluster = Cluster.query.get(deployment.cluster.id)
-        if deployment and deployment.status == 'running':
-            cluster = deployment.cluster
-            cluster.allocated_ram = max(0, cluster.allocated_ram-deployment.ram)
-            cluster.allocated_cpu = max(0, cluster.allocated_cpu-deployment.cpu)
-            cluster.allocated_gpu = max(0, cluster.allocated_gpu-deployment.gpu)
+        DeploymentService.handle_expire_deployments([deployment_id])
+
+    @staticmethod
+    def handle_expire_deployments(deployment_ids):
+        # Releases a batch of finished deployments in one transaction, then runs one scheduling
+        # pass per affected cluster (and organization) on the combined freed capacity
+        deployments = Deployment.query.filter(Deployment.id.in_(deployment_ids)).all()
+        clusters = {}
+        released = []
+        for deployment in deployments:
+            if deployment.status != 'running' or not deployment.cluster:
+                continue
             deployment.status = 'done'
-            db.session.commit()
-            from app.services.deployment_service import DeploymentService
-            DeploymentService.trigger_deployment_in_cluster(cluster.id)
+            clusters[deployment.cluster.id] = deployment.cluster
+            released.append(deployment)
+        if not clusters:
+            return 0
+        db.session.commit()
+        # Given back only once committed, so the ledger never shows capacity still in use
+        CapacityLedger.release_all(released)
+        logger.info(f"Released {len(released)} deployments on clusters {sorted(clusters)}")
+
+        for cluster in clusters.values():
+            DeploymentService.trigger_deployment_in_cluster(cluster.id, DeploymentService.free_resources(cluster))
+        for organization_id in {cluster.organization_id for cluster in clusters.values()}:
+            DeploymentService.trigger_deployment_in_organization(organization_id)
+        return len(released)
 
     @staticmethod
-    def trigger_deployment_in_cluster(cluster_id):
+    def trigger_deployment_in_cluster(cluster_id, capacity=None):
+        # `capacity` is the cluster's free (cpu, ram, gpu) when the caller already knows it; the
+        # queue bounds are checked against it before the cluster is loaded from the database
         logger.info(f"Processing queue for cluster: {cluster_id}" )
 
-        for priority in DeploymentService.priorities:
-            queue_length = r.zcard(f"P{priority}:cluster:{cluster_id}:cpu")
-            logger.info(f"P{priority} Found queue length for : {queue_length}")
-            if queue_length > 0:
+        # Built once per pass and kept up to date by the placements of every level
+        node_index = None
+        for priority in queued_priorities(cluster_tag(cluster_id)):
+            queue = cluster_queue(cluster_id, priority)
+            bounds = queue_bounds(queue)
+            logger.info(f"P{priority} Found queue bounds: {bounds}")
+            if bounds is not None:
+                if capacity is not None and not may_fit(bounds, capacity):
+                    logger.info("No queued deployment fits the free capacity")
+                    return
+
                 cluster = Cluster.query.get(cluster_id)
                 if not cluster:
                     logger.info("Cluster not found")
                     return
                 
-                available_cpu = cluster.total_cpu - cluster.allocated_cpu
-                available_ram = cluster.total_ram - cluster.allocated_ram
-                available_gpu = cluster.total_gpu - cluster.allocated_gpu
-                logger.info(f"For cluster {cluster_id}, allocated resources: CPU={cluster.allocated_cpu}, RAM={cluster.allocated_ram}, GPU={cluster.allocated_gpu}")
-                
-                deployments = fetch_deployments(cluster_id, priority, available_cpu, available_ram, available_gpu)
+                capacity = DeploymentService.free_resources(cluster)
+                logger.info(f"For cluster {cluster_id}, free resources: CPU={capacity[0]}, RAM={capacity[1]}, GPU={capacity[2]}")
+                if not may_fit(bounds, capacity):
+                    logger.info("No queued deployment fits the free capacity")
+                    return
+                version = queue_version(queue)
+                deployments, ordering = DeploymentService.fetch_queue_candidates(queue, capacity, version)
                 len_deployments = len(deployments)
                 if(len_deployments == 0):
+                    DeploymentService.queue_states.put(queue, QueueState(capacity, version, [], []))
                     logger.info("No deployments to schedule")
                     return
                 
-                # Dynamic strategy selection based on number of deployments
-                if(len_deployments < 10):
-                    strategy = AllCombinations()
-                else:
-                    strategy = GeneticAlgorithm(generations=10, population_size=10)
-                    
-                scheduler = Scheduler(strategy=strategy)
-                node = Node(id=cluster_id, cpu=available_cpu, memory=available_ram, gpu=available_gpu)
+                # Best schedule found within the latency budget, so the worker that owns this cluster's organization
+                # is busy for a bounded time before it runs the next task of its queue.
+                # The previous ordering of this queue is a good starting point after a single release.
+                strategy = AnytimeStrategy(time_budget=DeploymentService.scheduling_time_budget, initial_order=ordering)
+                scheduler = Scheduler(strategy=strategy, cache=DeploymentService.schedule_cache)
+                node = Node(id=cluster_id, cpu=capacity[0], memory=capacity[1], gpu=capacity[2])
                 scheduled_deployments = scheduler.schedule_deployments(copy(node), deployments)
+                logger.info(f"Schedule cache hits: {DeploymentService.schedule_cache.hits}, misses: {DeploymentService.schedule_cache.misses}")
                 for dp in scheduled_deployments:
                     logger.info(f"Scheduled deployment: {dp}")
 
-                for scheduled_deployment_dto in scheduled_deployments:
-                    try:
-                        deployment = Deployment.query.get(int(scheduled_deployment_dto.id))
-                        if not deployment:
-                            logger.info(f"Deployment with ID {scheduled_deployment_dto.id} not found")
-                            continue
-
-                        if not deployment.cluster:
-                            logger.info(f"Cluster for deployment ID {deployment.id} not found")
-                            continue
-
-                        if (cluster.allocated_ram + deployment.ram <= cluster.total_ram and
-                            cluster.allocated_cpu + deployment.cpu <= cluster.total_cpu and
-                            cluster.allocated_gpu + deployment.gpu <= cluster.total_gpu):
-                            cluster.allocated_ram += deployment.ram
-                            cluster.allocated_cpu += deployment.cpu
-                            cluster.allocated_gpu += deployment.gpu
-                            deployment.status = 'running'
-                            db.session.commit()
-                            remove_deployment_from_redis(cluster_id, priority, deployment.id)
-
-                            # Save deployment in Redis with random TTL
-                            ttl = DeploymentService.get_random_ttl()  # TTL between 20 and 30 seconds
-                            r.setex(f"deployment:{deployment.id}", ttl, json.dumps({'deployment_id': deployment.id}))
-                            logger.info(f"Deployment ID {deployment.id} is running")
-                        else:
-                            logger.info(f"Insufficient resources for deployment ID {deployment.id}")
-                            return
-                            # r.lpush('deployment_queue', json.dumps({'deployment_id': deployment.id, 'priority': deployment.priority}))
-                    except Exception as e:
-                        logger.info("Error processing deployment: {e}")
-                if(len_deployments > len(scheduled_deployments)):
+                # The chosen set fits the cluster as a whole; place it on individual nodes largest first
+                if cluster.nodes and node_index is None:
+                    node_index = DeploymentService.node_index(cluster)
+                if node_index:
+                    scheduled_deployments = sorted(scheduled_deployments, key=lambda d: (d.gpu, d.memory, d.cpu), reverse=True)
+                placed = DeploymentService.start_scheduled_deployments(queue, cluster, scheduled_deployments, node_index)
+
+                # Removing the batch bumps the version once; any other change makes the next run refetch
+                removed = 1 if placed else 0
+                version = version + removed if queue_version(queue) == version + removed else None
+                # A state the next run cannot use (the queue changed meanwhile or is now empty) is dropped
+                if version is None or (len_deployments == len(placed) and queue_bounds(queue) is None):
+                    DeploymentService.queue_states.pop(queue)
+                else:
+                    DeploymentService.queue_states.put(queue, QueueState(
+                        capacity, version, [d for d in deployments if d.id not in placed],
+                        [deployment_id for deployment_id in strategy.ordering if deployment_id not in placed]))
+                if(len_deployments > len(placed)):
                     logger.info("Some high priority deployments could not be scheduled")
                     return
-        logger.info("Queue processed")
\ No newline at end of file
+                capacity = DeploymentService.free_resources(cluster)
+        logger.info("Queue processed")
+
+    @staticmethod
+    def fetch_queue_candidates(queue, capacity, version):
+        # Queued deployments that fit the free capacity, and the ordering to start from. When the
+        # queue has not changed since the last run only deployments that did not fit back then are
+        # fetched, so a release costs time in proportion to what it makes eligible.
+        state = DeploymentService.queue_states.get(queue)
+        if state is None or state.version != version:
+            return fetch_deployments_from_queue(queue, *capacity), None
+        max_cpu, max_ram, max_gpu = capacity
+        candidates = [d for d in state.candidates if d.cpu <= max_cpu and d.memory <= max_ram and d.gpu <= max_gpu]
+        return candidates + fetch_deployments_freed_from_queue(queue, state.capacity, capacity), state.ordering
+
+    @staticmethod
+    def trigger_deployment_in_organization(organization_id):
+        # Packs the organization-wide queue across the free capacity of every cluster in one pass
+        logger.info(f"Processing organization queue for organization: {organization_id}")
+
+        node_indexes = {}
+        for priority in queued_priorities(org_tag(organization_id)):
+            queue = org_queue(organization_id, priority)
+            clusters = Cluster.query.filter_by(organization_id=organization_id).all()
+            nodes = [DeploymentService.free_capacity(c) for c in clusters]
+            if not nodes:
+                logger.info("No clusters in organization")
+                return
+
+            deployments = fetch_deployments_from_queue(queue, max(n.cpu for n in nodes), max(n.memory for n in nodes), max(n.gpu for n in nodes))
+            if not deployments:
+                logger.info("No organization deployments to schedule")
+                return
+
+            assignments = MultiNodeScheduler().schedule_deployments(nodes, deployments)
+            # As for a cluster queue: one query loads every assigned deployment, one ledger call
+            # per cluster reserves them, one transaction marks them running and one script call
+            # dequeues them
+            ids = [int(dto.id) for cluster in clusters for dto in assignments[cluster.id]]
+            loaded = {d.id: d for d in Deployment.query.filter(Deployment.id.in_(ids)).all()} if ids else {}
+            started, stale = [], []
+            for cluster in clusters:
+                if cluster.nodes and cluster.id not in node_indexes:
+                    node_indexes[cluster.id] = DeploymentService.node_index(cluster)
+                queued = []
+                for dto in assignments[cluster.id]:
+                    deployment = loaded.get(int(dto.id))
+                    if deployment is None or deployment.status != 'queued':
+                        stale.append(int(dto.id))
+                    else:
+                        queued.append(deployment)
+                placed = DeploymentService.place_all(queued, cluster, node_indexes.get(cluster.id))
+                if len(placed) < len(queued):
+                    logger.info(f"Insufficient resources for {len(queued) - len(placed)} deployments on cluster {cluster.id}")
+                started.extend(placed)
+            started_ids = DeploymentService.commit_started(started) if started else []
+            # Dequeued only once committed, so a failed commit leaves them queued
+            if started_ids or stale:
+                remove_deployments_from_queue(queue, started_ids + stale)
+            logger.info(f"Deployment IDs {started_ids} are running")
+
+            if len(deployments) > len(started_ids):
+                logger.info("Some high priority organization deployments could not be scheduled")
+                return
+        logger.info("Organization queue processed")
@@ -0,0 +1,141 @@
+import argparse
+import json
+import random
+import sys
+from datetime import datetime, timezone
+from time import perf_counter
+from app import redis_helper
+from app.redis_client import r
+
+# Compares the compact queue layout (one sorted set index plus a hash of packed demands) with
+# the previous layout of three sorted sets per queue on a local Redis: memory per queue and
+# enqueue / fetch / dequeue throughput. Uses keys under "bench:" and deletes them afterwards.
+#   REDIS_HOST=localhost python -m benchmarks.queue_layout --sizes 1000 10000 --output layouts.json
+
+# The previous layout's fetch: walk the cpu set and check the ram and gpu sets
+LEGACY_FETCH_SCRIPT = """
+local result = {}
+for _, id in ipairs(redis.call('ZRANGEBYSCORE', KEYS[1], 0, ARGV[1])) do
+    local ram = redis.call('ZSCORE', KEYS[2], id)
+    local gpu = redis.call('ZSCORE', KEYS[3], id)
+    if ram and gpu and tonumber(ram) <= tonumber(ARGV[2]) and tonumber(gpu) <= tonumber(ARGV[3]) then
+        result[#result + 1] = id
+        result[#result + 1] = redis.call('ZSCORE', KEYS[1], id)
+        result[#result + 1] = ram
+        result[#result + 1] = gpu
+    end
+end
+return result
+"""
+
+class LegacyLayout:
+    name = "three_sorted_sets"
+
+    def keys(self, queue):
+        return [f"{queue}:cpu", f"{queue}:ram", f"{queue}:gpu", f"{queue}:version"]
+
+    def add(self, queue, deployment_id, cpu, ram, gpu):
+        r.zadd(f"{queue}:cpu", {deployment_id: cpu})
+        r.zadd(f"{queue}:ram", {deployment_id: ram})
+        r.zadd(f"{queue}:gpu", {deployment_id: gpu})
+        r.incr(f"{queue}:version")
+
+    def remove(self, queue, deployment_id):
+        r.zrem(f"{queue}:cpu", deployment_id)
+        r.zrem(f"{queue}:ram", deployment_id)
+        r.zrem(f"{queue}:gpu", deployment_id)
+        r.incr(f"{queue}:version")
+
+    def fetch(self, queue, max_cpu, max_ram, max_gpu):
+        script = r.register_script(LEGACY_FETCH_SCRIPT)
+        return script(keys=[f"{queue}:cpu", f"{queue}:ram", f"{queue}:gpu"], args=[max_cpu, max_ram, max_gpu])
+
+class CompactLayout:
+    name = "compact"
+
+    def keys(self, queue):
+        return redis_helper.queue_keys(queue)
+
+    def add(self, queue, deployment_id, cpu, ram, gpu):
+        redis_helper.add_deployment_to_queue(queue, deployment_id, cpu, ram, gpu)
+
+    def remove(self, queue, deployment_id):
+        redis_helper.remove_deployments_from_queue(queue, [deployment_id])
+
+    def fetch(self, queue, max_cpu, max_ram, max_gpu):
+        return redis_helper.fetch_deployments_from_queue(queue, max_cpu, max_ram, max_gpu)
+
+LAYOUTS = [LegacyLayout(), CompactLayout()]
+
+def memory_usage(keys):
+    # Bytes used by the keys, or None when the server does not support MEMORY USAGE
+    try:
+        return sum(r.memory_usage(key) or 0 for key in keys)
+    except Exception:
+        return None
+
+def run_layout(layout, size, fetches, seed):
+    rng = random.Random(seed)
+    queue = f"bench:P0:{{bench:{layout.name}:{size}}}"
+    r.delete(*layout.keys(queue))
+    demands = [(rng.randint(1, 16), rng.randint(1, 64), rng.randint(0, 4)) for _ in range(size)]
+
+    start = perf_counter()
+    for deployment_id, (cpu, ram, gpu) in enumerate(demands):
+        layout.add(queue, deployment_id, cpu, ram, gpu)
+    enqueue = perf_counter() - start
+    memory = memory_usage(layout.keys(queue))
+
+    # About half of the queue fits the fetch limits
+    start = perf_counter()
+    for _ in range(fetches):
+        layout.fetch(queue, 12, 48, 3)
+    fetch = perf_counter() - start
+
+    start = perf_counter()
+    for deployment_id in range(size):
+        layout.remove(queue, deployment_id)
+    dequeue = perf_counter() - start
+    r.delete(*layout.keys(queue))
+
+    return {
+        "layout": layout.name,
+        "size": size,
+        "memory_bytes": memory,
+        "memory_bytes_per_deployment": memory / size if memory is not None else None,
+        "enqueue_per_second": size / enqueue,
+        "fetch_ms": fetch / fetches * 1000,
+        "dequeue_per_second": size / dequeue,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the Redis queue layouts.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000], help="Deployments per queue")
+    parser.add_argument("--fetches", type=int, default=20, help="Timed fetches per queue")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="queue_layout_results.json", help="Path of the JSON report")
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in args.sizes:
+        for layout in LAYOUTS:
+            result = run_layout(layout, size, args.fetches, args.seed)
+            results.append(result)
+            memory = result["memory_bytes_per_deployment"]
+            print(f"{layout.name:>18} {size:>7}  memory/deployment {memory if memory is None else round(memory, 1)!s:>8} B"
+                  f"  enqueue {result['enqueue_per_second']:10.0f}/s  fetch {result['fetch_ms']:8.2f} ms"
+                  f"  dequeue {result['dequeue_per_second']:10.0f}/s")
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "redis": r.info("server").get("redis_version"),
+        "config": vars(args),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    return report
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+import argparse
+import json
+import logging
+import platform
+import random
+import sys
+import tracemalloc
+from copy import copy
+from datetime import datetime, timezone
+from time import perf_counter
+from app.scheduling.all_combinations import AllCombinations
+from app.scheduling.anytime import AnytimeStrategy
+from app.scheduling.branch_and_bound import BranchAndBound
+from app.scheduling.genetic_algorithm import GeneticAlgorithm
+from app.scheduling.greedy import BestFitGreedy, DominantResourceGreedy, FirstFitDecreasing, SmallestFirstGreedy
+from app.scheduling.shape_branch_and_bound import ShapeBranchAndBound
+from app.scheduling.vectorized_genetic_algorithm import VectorizedGeneticAlgorithm
+from .workloads import WORKLOADS
+
+# Runs every scheduling strategy against the synthetic workloads and writes latency
+# percentiles, packing quality and peak memory to JSON, e.g.
+#   python -m benchmarks.scheduling --sizes 5 50 500 --output results.json
+
+# Strategy factories with the largest queue each one is run on; the exponential and
+# pure-Python searches are skipped on queues they cannot finish in reasonable time.
+STRATEGIES = {
+    "AllCombinations": (AllCombinations, 16),
+    "BranchAndBound": (lambda: BranchAndBound(time_limit=10), 60),
+    "ShapeBranchAndBound": (lambda: ShapeBranchAndBound(time_limit=1), 50000),
+    "GeneticAlgorithm": (lambda: GeneticAlgorithm(seed=0), 5000),
+    "IslandGeneticAlgorithm": (lambda: GeneticAlgorithm(seed=0, islands=4), 5000),
+    "VectorizedGeneticAlgorithm": (lambda: VectorizedGeneticAlgorithm(seed=0, time_limit=1), 50000),
+    "AnytimeStrategy": (AnytimeStrategy, 50000),
+    "SmallestFirstGreedy": (SmallestFirstGreedy, 50000),
+    "DominantResourceGreedy": (DominantResourceGreedy, 50000),
+    "FirstFitDecreasing": (FirstFitDecreasing, 50000),
+    "BestFitGreedy": (BestFitGreedy, 50000),
+}
+
+DEFAULT_SIZES = [5, 50, 500, 5000, 50000]
+
+def percentile(samples, q):
+    # Nearest-rank percentile of a non-empty list
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100 * len(ordered))) - 1))]
+
+def optimum(node, deployments, limit, time_limit):
+    # Largest number of deployments that fit, when the exact search finishes in time
+    if len(deployments) > limit:
+        return None
+    strategy = BranchAndBound(time_limit=time_limit)
+    scheduled = strategy.schedule_deployments(copy(node), deployments)
+    return None if strategy.timed_out else len(scheduled)
+
+def check_fits(node, scheduled):
+    for resource in ("cpu", "memory", "gpu"):
+        if sum(getattr(d, resource) for d in scheduled) > getattr(node, resource):
+            raise AssertionError(f"Schedule exceeds the node's {resource}")
+
+def run_strategy(factory, node, deployments, repeats):
+    latencies = []
+    for _ in range(repeats):
+        strategy = factory()
+        start = perf_counter()
+        scheduled = strategy.schedule_deployments(copy(node), deployments)
+        latencies.append((perf_counter() - start) * 1000)
+    check_fits(node, scheduled)
+
+    # Memory is measured in a separate run since tracing slows allocations down
+    tracemalloc.start()
+    factory().schedule_deployments(copy(node), deployments)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return scheduled, latencies, peak
+
+def run(sizes, strategies, workloads, repeats, seed, exact_limit, exact_time_limit):
+    results = []
+    for workload in workloads:
+        for size in sizes:
+            node, deployments = WORKLOADS[workload](size, random.Random(f"{seed}:{workload}:{size}"))
+            best = optimum(node, deployments, exact_limit, exact_time_limit)
+            for name in strategies:
+                factory, max_size = STRATEGIES[name]
+                if size > max_size:
+                    continue
+                scheduled, latencies, peak = run_strategy(factory, node, deployments, repeats)
+                result = {
+                    "workload": workload,
+                    "size": size,
+                    "strategy": name,
+                    "latency_ms": {
+                        "p50": percentile(latencies, 50),
+                        "p90": percentile(latencies, 90),
+                        "p99": percentile(latencies, 99),
+                        "max": max(latencies),
+                        "mean": sum(latencies) / len(latencies),
+                    },
+                    "scheduled": len(scheduled),
+                    "optimum": best,
+                    "quality": len(scheduled) / best if best else None,
+                    "utilization": {
+                        resource: sum(getattr(d, resource) for d in scheduled) / getattr(node, resource)
+                        for resource in ("cpu", "memory", "gpu")
+                    },
+                    "peak_memory_bytes": peak,
+                }
+                results.append(result)
+                print(f"{workload:>14} {size:>6} {name:>27}  p50 {result['latency_ms']['p50']:10.3f} ms"
+                      f"  p99 {result['latency_ms']['p99']:10.3f} ms  scheduled {len(scheduled):>6}"
+                      f"  optimum {best if best is not None else '-':>4}  peak {peak / 1024:10.1f} KiB")
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the scheduling strategies on synthetic workloads.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Queue sizes to generate")
+    parser.add_argument("--strategies", nargs="+", choices=list(STRATEGIES), default=list(STRATEGIES))
+    parser.add_argument("--workloads", nargs="+", choices=list(WORKLOADS), default=list(WORKLOADS))
+    parser.add_argument("--repeats", type=int, default=5, help="Timed runs per strategy and queue")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--exact-limit", type=int, default=60, help="Largest queue to compute the optimum for")
+    parser.add_argument("--exact-time-limit", type=float, default=10, help="Seconds allowed to compute an optimum")
+    parser.add_argument("--output", default="benchmark_results.json", help="Path of the JSON report")
+    args = parser.parse_args(argv)
+
+    # The strategies log every call
+    logging.disable(logging.INFO)
+    results = run(args.sizes, args.strategies, args.workloads, args.repeats, args.seed,
+                  args.exact_limit, args.exact_time_limit)
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "config": vars(args),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    return report
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+import math
+from app.scheduling.node import Node
+from app.scheduling.deployment_dto import DeploymentDto
+
+# Seeded synthetic queues for benchmarking the scheduling strategies. Every generator returns
+# the node to schedule on and the queued deployments; the node capacity is a fraction of the
+# queue's total demand so that the queue is always oversubscribed, whatever its size.
+
+def _node(deployments, load):
+    # Capacity per resource is `load` times the total demand (at least 1)
+    totals = [sum(getattr(d, resource) for d in deployments) for resource in ("cpu", "memory", "gpu")]
+    return Node(0, *(max(1, int(total * factor)) for total, factor in zip(totals, load)))
+
+def _pareto(rng, alpha, cap):
+    return min(cap, math.ceil(rng.paretovariate(alpha)))
+
+def uniform(size, rng):
+    deployments = [DeploymentDto(i, rng.randint(1, 16), rng.randint(1, 64), rng.randint(0, 4)) for i in range(size)]
+    return _node(deployments, (0.5, 0.5, 0.5)), deployments
+
+def heavy_tailed(size, rng):
+    # Most deployments are small, a few are very large
+    deployments = [DeploymentDto(i, _pareto(rng, 1.5, 256), 2 * _pareto(rng, 1.3, 1024),
+                                 _pareto(rng, 2, 16) if rng.random() < 0.2 else 0)
+                   for i in range(size)]
+    return _node(deployments, (0.5, 0.5, 0.5)), deployments
+
+def gpu_skewed(size, rng):
+    # GPU is the contended resource: most deployments need several GPUs and few are available
+    deployments = [DeploymentDto(i, rng.randint(1, 8), rng.randint(1, 32), rng.randint(1, 8) if rng.random() < 0.7 else 0)
+                   for i in range(size)]
+    return _node(deployments, (0.8, 0.8, 0.25)), deployments
+
+def near_capacity(size, rng):
+    # Almost everything fits, so the last few choices decide the packing
+    deployments = [DeploymentDto(i, rng.randint(1, 16), rng.randint(1, 64), rng.randint(0, 4)) for i in range(size)]
+    return _node(deployments, (0.95, 0.95, 0.95)), deployments
+
+WORKLOADS = {
+    "uniform": uniform,
+    "heavy_tailed": heavy_tailed,
+    "gpu_skewed": gpu_skewed,
+    "near_capacity": near_capacity,
+}
@@ -0,0 +1,77 @@
+import unittest
+from unittest.mock import patch, AsyncMock
+import redis
+from app import async_redis_helper
+from app.redis_client import create_async_redis_client
+from app.redis_helper import ENQUEUE_SCRIPT, FETCH_DEPLOYMENTS_SCRIPT
+
+class TestAsyncRedisHelper(unittest.IsolatedAsyncioTestCase):
+
+    @patch('app.async_redis_helper.get_client')
+    async def test_add_deployment_to_queue(self, mock_get_client):
+        client = mock_get_client.return_value
+        client.register_script.return_value = AsyncMock(return_value=1)
+
+        await async_redis_helper.add_deployment_to_queue('P0:{cluster:1}', 123, 4, 1024, 1)
+        client.register_script.assert_called_once_with(ENQUEUE_SCRIPT)
+        client.register_script.return_value.assert_awaited_once_with(
+            keys=['P0:{cluster:1}:index', 'P0:{cluster:1}:demand', 'P0:{cluster:1}:version', 'P0:{cluster:1}:bounds', '{cluster:1}:priorities'], args=[123, 4, '4:1024:1', 0])
+
+    @patch('app.async_redis_helper.get_client')
+    async def test_fetch_clusters_concurrently(self, mock_get_client):
+        client = mock_get_client.return_value
+        results = {'P0:{cluster:1}:index': [b'7', b'2', b'512', b'0'], 'P0:{cluster:2}:index': []}
+        client.register_script.return_value = AsyncMock(side_effect=lambda keys, args: results[keys[0]])
+
+        fetched = await async_redis_helper.fetch_clusters({1: (4, 1024, 0), 2: (8, 2048, 1)}, 0)
+        client.register_script.assert_called_with(FETCH_DEPLOYMENTS_SCRIPT)
+        self.assertEqual([(d.id, d.cpu, d.memory) for d in fetched[1]], [(b'7', 2, 512)])
+        self.assertEqual(fetched[2], [])
+
+    @patch('app.async_redis_helper.get_client')
+    async def test_queue_version(self, mock_get_client):
+        mock_get_client.return_value.get = AsyncMock(return_value=None)
+        self.assertEqual(await async_redis_helper.queue_version('P0:{cluster:1}'), 0)
+
+    @patch('app.async_redis_helper.get_client')
+    async def test_queue_summaries(self, mock_get_client):
+        client = mock_get_client.return_value
+        client.zrevrange = AsyncMock(side_effect=lambda key, start, end: [b'1', b'0'] if key == '{cluster:1}:priorities' else [])
+        client.zcard = AsyncMock(side_effect=lambda key: {'P1:{cluster:1}:index': 2, 'P0:{cluster:1}:index': 5}[key])
+        client.hmget = AsyncMock(side_effect=lambda key, *fields: {'P1:{cluster:1}:bounds': [b'2', b'512', b'0'],
+                                                                   'P0:{cluster:1}:bounds': [None, None, None]}[key])
+
+        summaries = await async_redis_helper.queue_summaries(['{cluster:1}', '{org:1}'])
+        self.assertEqual(summaries, {
+            '{cluster:1}': [{'priority': 1, 'queued': 2, 'min_demand': [2.0, 512.0, 0.0]},
+                            {'priority': 0, 'queued': 5, 'min_demand': None}],
+            '{org:1}': [],
+        })
+
+    @patch('app.async_redis_helper.create_async_redis_client')
+    def test_run_closes_the_client_of_its_session(self, mock_create_client):
+        client = mock_create_client.return_value
+        client.close = AsyncMock()
+        client.get = AsyncMock(return_value=b'3')
+
+        self.assertEqual(async_redis_helper.run(async_redis_helper.queue_version, 'P0:{cluster:1}'), 3)
+        client.get.assert_awaited_once_with('P0:{cluster:1}:version')
+        client.close.assert_awaited_once()
+        with self.assertRaises(LookupError):
+            async_redis_helper.get_client()
+
+class TestAsyncRedisClient(unittest.TestCase):
+
+    def test_standalone_clients_use_a_bounded_pool(self):
+        with patch('app.redis_client.redis_max_connections', 7):
+            client = create_async_redis_client('standalone', 'localhost', 6379)
+        self.assertIsInstance(client.connection_pool, redis.asyncio.BlockingConnectionPool)
+        self.assertEqual(client.connection_pool.max_connections, 7)
+        self.assertTrue(client.auto_close_connection_pool)
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            create_async_redis_client('sentinel')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import random
+import unittest
+from benchmarks.scheduling import percentile, run
+from benchmarks.workloads import WORKLOADS
+
+class TestBenchmarks(unittest.TestCase):
+    def test_workloads_are_seeded_and_oversubscribed(self):
+        for name, generate in WORKLOADS.items():
+            node, deployments = generate(200, random.Random(1))
+            _, again = generate(200, random.Random(1))
+            self.assertEqual([(d.cpu, d.memory, d.gpu) for d in deployments], [(d.cpu, d.memory, d.gpu) for d in again])
+            self.assertGreater(sum(d.cpu for d in deployments), node.cpu, name)
+
+    def test_percentile(self):
+        samples = list(range(1, 101))
+        self.assertEqual(percentile(samples, 50), 50)
+        self.assertEqual(percentile(samples, 99), 99)
+        self.assertEqual(percentile([3.0], 90), 3.0)
+
+    def test_run_reports_quality_against_optimum(self):
+        results = run([8], ["AllCombinations", "SmallestFirstGreedy"], ["uniform"], repeats=2, seed=0,
+                      exact_limit=60, exact_time_limit=10)
+        self.assertEqual([result["strategy"] for result in results], ["AllCombinations", "SmallestFirstGreedy"])
+        exact = results[0]
+        self.assertEqual(exact["scheduled"], exact["optimum"])
+        self.assertEqual(exact["quality"], 1)
+        for result in results:
+            self.assertLessEqual(result["latency_ms"]["p50"], result["latency_ms"]["max"])
+            self.assertGreater(result["peak_memory_bytes"], 0)
+            self.assertTrue(all(0 <= value <= 1 for value in result["utilization"].values()))
+
+if __name__ == '__main__':
+    unittest.main()
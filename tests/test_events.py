@@ -0,0 +1,127 @@
+import unittest
+from concurrent.futures import Future
+from unittest.mock import patch, MagicMock
+from app.events import publish_event, read_events, ack_events, ensure_group, stream_key, GROUP
+from app.event_consumer import handle_events, owned_partitions, process_cluster_events, consume
+from redis.exceptions import ResponseError
+
+def run_now(organization_id, fn, *args):
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+class Stop(BaseException):
+    pass
+
+class TestEvents(unittest.TestCase):
+
+    @patch('app.events.Config')
+    @patch('app.events.r')
+    def test_events_are_partitioned_by_organization(self, mock_redis, mock_config):
+        mock_config.EVENT_PARTITIONS = 4
+        publish_event("release", 3, 6, [10, 11])
+        mock_redis.xadd.assert_called_once_with('events:{2}', {
+            "type": "release", "cluster_id": 3, "organization_id": 6, "deployment_ids": "10,11"})
+
+    @patch('app.events.r')
+    def test_read_events(self, mock_redis):
+        mock_redis.xreadgroup.return_value = [[b'events:{2}', [
+            (b'1-0', {b'type': b'release', b'cluster_id': b'3', b'organization_id': b'6', b'deployment_ids': b'10,11'}),
+            (b'2-0', None),
+            (b'3-0', {b'type': b'release', b'cluster_id': b'x'}),
+        ]]]
+        entries = read_events(2, 'consumer-0', 100, after='0')
+        mock_redis.xreadgroup.assert_called_once_with(GROUP, 'consumer-0', {'events:{2}': '0'}, count=100)
+        self.assertEqual(entries, [
+            (b'1-0', {"type": "release", "cluster_id": 3, "organization_id": 6, "deployment_ids": [10, 11]}),
+            (b'2-0', None),
+            (b'3-0', None),
+        ])
+
+        mock_redis.xreadgroup.return_value = []
+        self.assertEqual(read_events(2, 'consumer-0', 100), [])
+        mock_redis.xreadgroup.assert_called_with(GROUP, 'consumer-0', {'events:{2}': '>'}, count=100)
+
+    @patch('app.events.r')
+    def test_ack_deletes_handled_entries(self, mock_redis):
+        ack_events(2, [b'1-0'])
+        pipe = mock_redis.pipeline.return_value
+        pipe.xack.assert_called_once_with('events:{2}', GROUP, b'1-0')
+        pipe.xdel.assert_called_once_with('events:{2}', b'1-0')
+
+    @patch('app.events.r')
+    def test_ensure_group_tolerates_existing_group(self, mock_redis):
+        mock_redis.xgroup_create.side_effect = ResponseError("BUSYGROUP Consumer Group name already exists")
+        ensure_group(1)
+        mock_redis.xgroup_create.assert_called_once_with(stream_key(1), GROUP, id="0", mkstream=True)
+
+class TestEventConsumer(unittest.TestCase):
+
+    @patch('app.event_consumer.Config')
+    def test_owned_partitions(self, mock_config):
+        mock_config.EVENT_PARTITIONS = 8
+        self.assertEqual(owned_partitions(1, 3), [1, 4, 7])
+
+    @patch('app.event_consumer.process_cluster_events')
+    @patch('app.event_consumer.cluster_workers')
+    def test_events_of_a_cluster_are_coalesced(self, mock_workers, mock_process):
+        mock_workers.submit.side_effect = run_now
+        entries = [
+            (b'1-0', {"type": "release", "cluster_id": 3, "organization_id": 6, "deployment_ids": [10]}),
+            (b'2-0', {"type": "trigger", "cluster_id": 3, "organization_id": 6, "deployment_ids": []}),
+            (b'3-0', {"type": "release", "cluster_id": 3, "organization_id": 6, "deployment_ids": [11, 12]}),
+            (b'4-0', {"type": "enqueue", "cluster_id": None, "organization_id": 6, "deployment_ids": [13]}),
+            (b'5-0', {"type": "submit", "cluster_id": 3, "organization_id": 6, "deployment_ids": [14]}),
+            (b'6-0', {"type": "submit", "cluster_id": 3, "organization_id": 6, "deployment_ids": [15]}),
+        ]
+        handled = handle_events(2, entries)
+        self.assertEqual(sorted(handled), [b'1-0', b'2-0', b'3-0', b'4-0', b'5-0', b'6-0'])
+        mock_process.assert_any_call(3, 6, [10, 11, 12], True, [14, 15])
+        mock_process.assert_any_call(None, 6, [], True, [])
+        self.assertEqual(mock_process.call_count, 2)
+
+    @patch('app.services.deployment_service.DeploymentService')
+    def test_submissions_are_admitted_after_releases(self, mock_service):
+        mock_service.handle_expire_deployments.return_value = 1
+        process_cluster_events(3, 6, [10], False, [14, 15])
+        mock_service.handle_expire_deployments.assert_called_once_with([10])
+        mock_service.admit_submitted.assert_called_once_with(3, 6, [14, 15])
+        mock_service.trigger_deployment_in_cluster.assert_not_called()
+
+    @patch('app.event_consumer.process_cluster_events')
+    @patch('app.event_consumer.cluster_workers')
+    def test_failed_events_stay_pending(self, mock_workers, mock_process):
+        mock_workers.submit.side_effect = run_now
+        mock_process.side_effect = [RuntimeError("database is locked"), None]
+        entries = [
+            (b'1-0', {"type": "release", "cluster_id": 3, "organization_id": 6, "deployment_ids": [10]}),
+            (b'2-0', {"type": "release", "cluster_id": 4, "organization_id": 6, "deployment_ids": [11]}),
+        ]
+        self.assertEqual(handle_events(2, entries), [b'2-0'])
+
+    @patch('app.event_consumer.time.sleep', side_effect=[None, None, Stop])
+    @patch('app.event_consumer.ack_events')
+    @patch('app.event_consumer.handle_events')
+    @patch('app.event_consumer.read_events')
+    @patch('app.event_consumer.ensure_group')
+    @patch('app.event_consumer.Config')
+    def test_consume_replays_pending_entries_once_and_survives_errors(self, mock_config, mock_ensure, mock_read, mock_handle, mock_ack, mock_sleep):
+        mock_config.EVENT_PARTITIONS = 1
+        mock_config.EVENT_BATCH_SIZE = 100
+        mock_config.EVENT_POLL_INTERVAL_MS = 0
+        mock_config.ADMISSION_BATCH_WINDOW_MS = 0
+        mock_config.EVENT_CLAIM_IDLE_MS = 10 ** 9
+        mock_read.side_effect = [[(b'1-0', {"type": "trigger", "cluster_id": 3, "organization_id": 6, "deployment_ids": []})], [], []]
+        mock_handle.side_effect = RuntimeError("database is locked")
+
+        with self.assertRaises(Stop):
+            consume(MagicMock(), 0, 1)
+        # The failing entry is not read again from the pending list; new entries are read next
+        self.assertEqual([c.args[3] for c in mock_read.call_args_list], ['0', b'1-0', None])
+        mock_ack.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
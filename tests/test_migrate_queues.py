@@ -0,0 +1,15 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from app.migrate_queues import requeue
+
+class TestMigrateQueues(unittest.TestCase):
+
+    @patch('app.migrate_queues.add_deployment_to_queue')
+    @patch('app.migrate_queues.Deployment')
+    def test_requeue_enqueues_deployments_still_queued(self, mock_deployment, mock_add):
+        mock_deployment.query.filter.return_value.all.return_value = [MagicMock(id=2, cpu=4, ram=1024, gpu=1)]
+        self.assertEqual(requeue('P0:{cluster:1}', [2, 3]), [2])
+        mock_add.assert_called_once_with('P0:{cluster:1}', 2, 4, 1024, 1)
+
+if __name__ == '__main__':
+    unittest.main()
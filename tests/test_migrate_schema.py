@@ -0,0 +1,24 @@
+import unittest
+from sqlalchemy import create_engine, inspect, text
+from app.migrate_schema import missing_columns, upgrade
+
+class TestMigrateSchema(unittest.TestCase):
+
+    def test_upgrade_adds_the_missing_columns_once(self):
+        engine = create_engine('sqlite://')
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TABLE organization (id INTEGER PRIMARY KEY)"))
+            connection.execute(text("CREATE TABLE cluster_node (id INTEGER PRIMARY KEY)"))
+            connection.execute(text("CREATE TABLE deployment (id INTEGER PRIMARY KEY, name VARCHAR(150))"))
+            connection.execute(text("INSERT INTO deployment (id, name) VALUES (1, 'old')"))
+
+        added = upgrade(engine)
+        self.assertEqual([(table, column) for table, column, _ in added], [('deployment', 'organization_id'), ('deployment', 'node_id')])
+        self.assertTrue({'organization_id', 'node_id'} <= {c['name'] for c in inspect(engine).get_columns('deployment')})
+        with engine.connect() as connection:
+            self.assertEqual(connection.execute(text("SELECT name, organization_id, node_id FROM deployment")).fetchall(), [('old', None, None)])
+        self.assertEqual(missing_columns(engine), [])
+        self.assertEqual(upgrade(engine), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,28 @@
+import unittest
+from unittest.mock import patch
+import redis
+from app.redis_client import create_redis_client, create_async_redis_client
+
+class TestRedisClient(unittest.TestCase):
+
+    def test_standalone_clients_use_a_bounded_pool(self):
+        with patch('app.redis_client.redis_max_connections', 7):
+            client = create_redis_client('standalone', 'localhost', 6379)
+        self.assertIsInstance(client.connection_pool, redis.BlockingConnectionPool)
+        self.assertEqual(client.connection_pool.max_connections, 7)
+        self.assertIn('health_check_interval', client.connection_pool.connection_kwargs)
+
+    def test_commands_are_not_retried(self):
+        client = create_redis_client('standalone', 'localhost', 6379)
+        self.assertFalse(client.connection_pool.connection_kwargs.get('retry_on_timeout', False))
+        self.assertFalse(client.connection_pool.make_connection().retry_on_timeout)
+        with patch('app.redis_client.RedisCluster') as mock_cluster:
+            create_redis_client('cluster', 'localhost', 6379)
+        self.assertEqual(mock_cluster.call_args.kwargs['cluster_error_retry_attempts'], 1)
+        self.assertNotIn('retry_on_timeout', mock_cluster.call_args.kwargs)
+        async_cluster = create_async_redis_client('cluster', 'localhost', 6379)
+        self.assertEqual(async_cluster.cluster_error_retry_attempts, 1)
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            create_redis_client('sentinel')
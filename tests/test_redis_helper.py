@@ -1,37 +1,268 @@
 import unittest
 from unittest.mock import patch, MagicMock
-from app.redis_helper import add_deployment_to_redis, remove_deployment_from_redis, fetch_deployments
+import fakeredis
+from redis.crc import key_slot
+from redis.exceptions import ResponseError, RedisClusterException
+from app.redis_helper import fetch_deployments_from_queue, fetch_deployments_freed_from_queue, migrate_legacy_queue, cluster_queue, org_queue, legacy_queue_name, claim_due_completions, ack_completions, CLAIM_COMPLETIONS_SCRIPT, queued_priorities, queue_priority, queue_bounds, queue_version, may_fit, ENQUEUE_SCRIPT, DEQUEUE_SCRIPT, reserve_capacity, release_capacity, load_capacity, read_capacities, RESERVE_CAPACITY_SCRIPT, LOAD_CAPACITY_SCRIPT, schedule_completions, cancel_completions, COMPLETIONS, add_deployment_to_queue, remove_deployments_from_queue, read_capacity, enqueue_deployments, migrate_legacy_timers, queue_keys
 from app.scheduling.deployment_dto import DeploymentDto
 
 class TestRedisHelper(unittest.TestCase):
 
     @patch('app.redis_helper.r')
-    def test_add_deployment_to_redis(self, mock_redis):
-        add_deployment_to_redis(1, 0, 123, 4, 1024, 1)
-        mock_redis.zadd.assert_any_call('P0:cluster:1:cpu', {123: 4})
-        mock_redis.zadd.assert_any_call('P0:cluster:1:ram', {123: 1024})
-        mock_redis.zadd.assert_any_call('P0:cluster:1:gpu', {123: 1})
+    def test_add_deployment_to_queue(self, mock_redis):
+        add_deployment_to_queue(cluster_queue(1, 0), 123, 4, 1024, 1)
+        mock_redis.register_script.assert_called_once_with(ENQUEUE_SCRIPT)
+        mock_redis.register_script.return_value.assert_called_once_with(
+            keys=['P0:{cluster:1}:index', 'P0:{cluster:1}:demand', 'P0:{cluster:1}:version', 'P0:{cluster:1}:bounds', '{cluster:1}:priorities'], args=[123, 4, '4:1024:1', 0])
 
     @patch('app.redis_helper.r')
-    def test_remove_deployment_from_redis(self, mock_redis):
-        remove_deployment_from_redis(1, 0, 123)
-        mock_redis.zrem.assert_any_call('P0:cluster:1:cpu', 123)
-        mock_redis.zrem.assert_any_call('P0:cluster:1:ram', 123)
-        mock_redis.zrem.assert_any_call('P0:cluster:1:gpu', 123)
+    def test_remove_deployments_from_queue(self, mock_redis):
+        remove_deployments_from_queue(cluster_queue(1, 0), [123])
+        mock_redis.register_script.assert_called_once_with(DEQUEUE_SCRIPT)
+        mock_redis.register_script.return_value.assert_called_once_with(
+            keys=['P0:{cluster:1}:index', 'P0:{cluster:1}:demand', 'P0:{cluster:1}:version', 'P0:{cluster:1}:bounds', '{cluster:1}:priorities'], args=[0, 123])
 
     @patch('app.redis_helper.r')
     def test_fetch_deployments(self, mock_redis):
-        mock_redis.zrangebyscore.side_effect = [
-            [b'123', b'124'],  # CPU deployments
-            [b'123'],          # RAM deployments
-            [b'123', b'125']   # GPU deployments
-        ]
-        mock_redis.zscore.side_effect = [1024, 4, 1]
+        script = mock_redis.register_script.return_value
+        script.return_value = [b'123', b'4', b'1024', b'1']
 
-        deployments = fetch_deployments(1, 0, 4, 1024, 1)
+        deployments = fetch_deployments_from_queue(cluster_queue(1, 0), 4, 1024, 1)
+        script.assert_called_once_with(keys=['P0:{cluster:1}:index', 'P0:{cluster:1}:demand'], args=[4, 1024, 1])
         self.assertEqual(len(deployments), 1)
         self.assertEqual(deployments[0].id, b'123')
+        self.assertEqual((deployments[0].cpu, deployments[0].memory, deployments[0].gpu), (4, 1024, 1))
+        mock_redis.zscore.assert_not_called()
+
+    @patch('app.redis_helper.r')
+    def test_fetch_deployments_freed_from_queue(self, mock_redis):
+        script = mock_redis.register_script.return_value
+        script.return_value = [b'123', b'4', b'1024', b'0']
+
+        deployments = fetch_deployments_freed_from_queue('P0:{cluster:1}', (2, 512, 0), (4, 2048, 0))
+        script.assert_called_once_with(keys=['P0:{cluster:1}:index', 'P0:{cluster:1}:demand'],
+                                       args=[4, 2048, 0, 2, 512, 0])
+        self.assertEqual([(d.id, d.cpu, d.memory) for d in deployments], [(b'123', 4, 1024)])
+    @patch('app.redis_helper.r')
+    def test_migrate_legacy_queue(self, mock_redis):
+        mock_redis.exists.return_value = 0
+        mock_redis.zrange.side_effect = [
+            [(b'1', 4.0), (b'2', 2.0)],    # CPU
+            [(b'1', 1024.0), (b'2', 512.0)],  # RAM
+            [(b'1', 1.0)]                   # GPU, deployment 2 drifted out
+        ]
+        self.assertEqual(migrate_legacy_queue('P0:cluster:1'), (1, [2]))
+        pipe = mock_redis.pipeline.return_value
+        pipe.zadd.assert_any_call('P0:{cluster:1}:index', {b'1': 4.0})
+        pipe.hset.assert_any_call('P0:{cluster:1}:demand', b'1', '4.0:1024.0:1.0')
+        pipe.hset.assert_any_call('P0:{cluster:1}:bounds', mapping={'cpu': 4.0, 'ram': 1024.0, 'gpu': 1.0})
+        pipe.zadd.assert_any_call('{cluster:1}:priorities', {0: 0})
+        mock_redis.delete.assert_called_once_with('P0:cluster:1:cpu', 'P0:cluster:1:ram', 'P0:cluster:1:gpu', 'P0:cluster:1:version')
+
+    @patch('app.redis_helper.time.time', return_value=100.0)
+    @patch('app.redis_helper.r')
+    def test_migrate_legacy_timers(self, mock_redis, mock_time):
+        pipe = mock_redis.pipeline.return_value
+        pipe.execute.return_value = [5000, -1, -2]
+        self.assertEqual(migrate_legacy_timers(['deployment:1', 'deployment:2', 'deployment:3', 'P0:cluster:1:cpu']), 2)
+        pipe.pttl.assert_any_call('deployment:1')
+        pipe.zadd.assert_called_once_with(COMPLETIONS, {1: 105.0, 2: 100.0})
+        self.assertEqual(pipe.delete.call_count, 3)
+        self.assertEqual(migrate_legacy_timers([]), 0)
+
+    def test_keys_of_one_cluster_share_a_hash_tag(self):
+        self.assertEqual(cluster_queue(42, 1), 'P1:{cluster:42}')
+        self.assertEqual(org_queue(42, 0), 'P0:{org:42}')
+        self.assertEqual(legacy_queue_name('P1:cluster:42'), 'P1:{cluster:42}')
+        self.assertIsNone(legacy_queue_name('P1:{cluster:42}'))
+
+    @patch('app.redis_helper.r')
+    def test_queue_bounds(self, mock_redis):
+        mock_redis.hmget.return_value = [b'2', b'512', b'0']
+        bounds = queue_bounds('P0:{cluster:1}')
+        mock_redis.hmget.assert_called_once_with('P0:{cluster:1}:bounds', 'cpu', 'ram', 'gpu')
+        self.assertEqual(bounds, (2, 512, 0))
+        self.assertTrue(may_fit(bounds, (2, 1024, 0)))
+        self.assertFalse(may_fit(bounds, (8, 256, 4)))
+
+        mock_redis.hmget.return_value = [None, None, None]
+        self.assertIsNone(queue_bounds('P0:{cluster:1}'))
+        self.assertFalse(may_fit(None, (8, 1024, 4)))
+
+    @patch('app.redis_helper.r')
+    def test_queued_priorities(self, mock_redis):
+        mock_redis.zrevrange.return_value = [b'9', b'4', b'0']
+        self.assertEqual(queued_priorities('{cluster:1}'), [9, 4, 0])
+        mock_redis.zrevrange.assert_called_once_with('{cluster:1}:priorities', 0, -1)
+        self.assertEqual(queue_priority('P12:{org:3}'), ('{org:3}:priorities', 12))
+
+    @patch('app.redis_helper.time')
+    @patch('app.redis_helper.r')
+    def test_completions(self, mock_redis, mock_time):
+        mock_time.time.return_value = 1000.0
+        schedule_completions({7: 25})
+        mock_redis.zadd.assert_called_once_with('{deployments}:completions', {7: 1025.0})
+
+        mock_redis.register_script.return_value.return_value = [b'7', b'9']
+        self.assertEqual(claim_due_completions(100, 60), [7, 9])
+        mock_redis.register_script.assert_called_once_with(CLAIM_COMPLETIONS_SCRIPT)
+        mock_redis.register_script.return_value.assert_called_once_with(
+            keys=['{deployments}:completions', '{deployments}:claimed'], args=[1000.0, 60, 100])
+
+        ack_completions([7, 9])
+        mock_redis.zrem.assert_called_once_with('{deployments}:claimed', 7, 9)
+
+    @patch('app.redis_helper.r')
+    def test_capacity_ledger_calls(self, mock_redis):
+        script = mock_redis.register_script.return_value
+        script.return_value = [1, 0]
+        self.assertEqual(reserve_capacity(1, [(2, 512, 0, 3), (4, 512, 0, None)]), [True, False])
+        mock_redis.register_script.assert_called_with(RESERVE_CAPACITY_SCRIPT)
+        script.assert_called_with(keys=['{cluster:1}:capacity'], args=[2, 512, 0, 3, 4, 512, 0, ''])
+        script.return_value = -1
+        self.assertIsNone(reserve_capacity(1, [(2, 512, 0, 3)]))
+        release_capacity(1, [(2, 512, 0, None)])
+        script.assert_called_with(keys=['{cluster:1}:capacity'], args=[2, 512, 0, ''])
+
+        load_capacity(1, {'cpu': 4, 'ram': 2048, 'gpu': 0}, 5)
+        mock_redis.register_script.assert_called_with(LOAD_CAPACITY_SCRIPT)
+        script.assert_called_with(keys=['{cluster:1}:capacity'], args=[5, 'cpu', 4, 'ram', 2048, 'gpu', 0])
+
+        mock_redis.pipeline.return_value.execute.return_value = [{b'cpu': b'4', b'ram': b'2048', b'gpu': b'0'}, {}]
+        self.assertEqual(read_capacities([1, 2]), {1: {'cpu': 4, 'ram': 2048, 'gpu': 0}, 2: None})
+
+    @patch('app.redis_helper.time.time', return_value=1000.0)
+    @patch('app.redis_helper.r')
+    def test_completions_of_a_batch_in_one_call(self, mock_redis, mock_time):
+        schedule_completions({5: 20, 6: 30})
+        mock_redis.zadd.assert_called_once_with(COMPLETIONS, {5: 1020.0, 6: 1030.0})
+        cancel_completions([5, 6])
+        mock_redis.zrem.assert_called_once_with(COMPLETIONS, 5, 6)
+        schedule_completions({})
+        cancel_completions([])
+        self.assertEqual((mock_redis.zadd.call_count, mock_redis.zrem.call_count), (1, 1))
+
+    @patch('app.redis_helper.r')
+    def test_enqueue_deployments_with_one_call_per_slot(self, mock_redis):
+        script = mock_redis.register_script.return_value
+        script.side_effect = [1, ResponseError("OOM command not allowed")]
+        queued = enqueue_deployments([('P0:{cluster:1}', 5, 2, 512, 0), ('P1:{org:3}', 6, 1, 256, 0), ('P2:{cluster:1}', 7, 1, 128, 0)])
+        self.assertEqual(queued, [True, False, True])
+        mock_redis.register_script.assert_called_once_with(ENQUEUE_SCRIPT)
+        mock_redis.pipeline.assert_not_called()
+        self.assertEqual(script.call_count, 2)
+        script.assert_any_call(keys=queue_keys('P0:{cluster:1}') + queue_keys('P2:{cluster:1}'), args=[5, 2, '2:512:0', 0, 7, 1, '1:128:0', 2])
+        # Every call stays within one slot of a Redis Cluster
+        for call in script.call_args_list:
+            self.assertEqual(len({key_slot(key.encode()) for key in call.kwargs['keys']}), 1)
+        self.assertEqual(enqueue_deployments([]), [])
+
+# Runs the Lua scripts against an in-memory Redis
+class TestRedisScripts(unittest.TestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeStrictRedis()
+        patcher = patch('app.redis_helper.r', self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.queue = cluster_queue(1, 0)
+
+    def enqueue(self, *demands):
+        for deployment_id, cpu, ram, gpu in demands:
+            add_deployment_to_queue(self.queue, deployment_id, cpu, ram, gpu)
+
+    def fetched(self, deployments):
+        return sorted(int(d.id) for d in deployments)
+
+    def test_bounds_are_recomputed_when_their_holder_is_dequeued(self):
+        self.enqueue((1, 2, 512, 1), (2, 4, 256, 0), (3, 8, 1024, 0), (4, 6, 256, 2))
+        self.assertEqual(queue_bounds(self.queue), (2, 256, 0))
+        self.assertEqual(queued_priorities('{cluster:1}'), [0])
+
+        # 1 holds the cpu bound, 2 the ram and gpu bounds, but 4 has the same ram
+        remove_deployments_from_queue(self.queue, [1, 2])
+        self.assertEqual(queue_bounds(self.queue), (6, 256, 0))
+        remove_deployments_from_queue(self.queue, [4])
+        self.assertEqual(queue_bounds(self.queue), (8, 1024, 0))
+
+        # Removing an id that is not queued changes nothing but the version
+        version = queue_version(self.queue)
+        remove_deployments_from_queue(self.queue, [42])
+        self.assertEqual(queue_bounds(self.queue), (8, 1024, 0))
+        self.assertEqual(queue_version(self.queue), version + 1)
+
+        remove_deployments_from_queue(self.queue, [3])
+        self.assertIsNone(queue_bounds(self.queue))
+        self.assertEqual(queued_priorities('{cluster:1}'), [])
+
+    def test_fetch_returns_what_fits_the_limits(self):
+        self.enqueue((1, 2, 512, 0), (2, 4, 2048, 0), (3, 4, 256, 1), (4, 16, 256, 0))
+        self.assertEqual(self.fetched(fetch_deployments_from_queue(self.queue, 4, 1024, 0)), [1])
+        self.assertEqual(self.fetched(fetch_deployments_from_queue(self.queue, 8, 4096, 1)), [1, 2, 3])
+        deployment = fetch_deployments_from_queue(self.queue, 2, 512, 0)[0]
+        self.assertEqual((deployment.cpu, deployment.memory, deployment.gpu), (2, 512, 0))
+
+    def test_freed_fetch_returns_only_newly_fitting_deployments(self):
+        self.enqueue((1, 2, 512, 0), (2, 4, 512, 0), (3, 4, 2048, 0), (4, 6, 256, 1), (5, 12, 256, 0))
+        # Only the cpu grew: a range of the index
+        self.assertEqual(self.fetched(fetch_deployments_freed_from_queue(self.queue, (2, 1024, 0), (4, 1024, 0))), [2])
+        # The ram and gpu grew too: every deployment within the cpu limit is checked
+        self.assertEqual(self.fetched(fetch_deployments_freed_from_queue(self.queue, (4, 1024, 0), (6, 4096, 1))), [3, 4])
+        # Nothing grew
+        self.assertEqual(fetch_deployments_freed_from_queue(self.queue, (6, 4096, 1), (6, 4096, 1)), [])
+
+    def test_enqueue_deployments_runs_the_enqueue_script(self):
+        # As on a Redis Cluster, whose pipelines cannot run scripts
+        cluster_pipeline = MagicMock()
+        cluster_pipeline.eval.side_effect = RedisClusterException("method eval() is not implemented")
+        with patch.object(self.redis, 'pipeline', return_value=cluster_pipeline):
+            queued = enqueue_deployments([(self.queue, 5, 2, 512, 0), (org_queue(3, 1), 6, 1, 256, 0), (self.queue, 7, 4, 256, 1),
+                                          (cluster_queue(1, 2), 8, 1, 128, 0)])
+        self.assertEqual(queued, [True, True, True, True])
+        self.assertEqual(queue_bounds(self.queue), (2, 256, 0))
+        self.assertEqual(queue_version(self.queue), 2)
+        self.assertEqual(queued_priorities('{cluster:1}'), [2, 0])
+        self.assertEqual(self.fetched(fetch_deployments_from_queue(self.queue, 4, 512, 1)), [5, 7])
+        self.assertEqual(self.fetched(fetch_deployments_from_queue(cluster_queue(1, 2), 1, 128, 0)), [8])
+        self.assertEqual(self.fetched(fetch_deployments_from_queue(org_queue(3, 1), 1, 256, 0)), [6])
+
+    def test_reserve_refuses_what_does_not_fit_and_release_restores_it(self):
+        self.assertIsNone(reserve_capacity(1, [(1, 1, 0, None)]))
+        self.assertTrue(load_capacity(1, {'cpu': 8, 'ram': 4096, 'gpu': 1, 'node:3:cpu': 4, 'node:3:ram': 2048, 'node:3:gpu': 1,
+                                          'node:4:cpu': 4, 'node:4:ram': 2048, 'node:4:gpu': 0}))
+        # A loaded ledger is not replaced without its version
+        self.assertFalse(load_capacity(1, {'cpu': 0, 'ram': 0, 'gpu': 0}))
+
+        # The third fits the cluster but not node 3 once the first took it; the fourth exceeds the cluster
+        self.assertEqual(reserve_capacity(1, [(3, 1024, 1, 3), (1, 1024, 0, None), (2, 512, 0, 3), (9, 512, 0, None)]),
+                         [True, True, False, False])
+        ledger = read_capacity(1)
+        self.assertEqual((ledger['cpu'], ledger['ram'], ledger['gpu']), (4, 2048, 0))
+        self.assertEqual((ledger['node:3:cpu'], ledger['node:3:ram'], ledger['node:3:gpu']), (1, 1024, 0))
+        self.assertEqual(reserve_capacity(1, [(1, 1, 1, None)]), [False])
+
+        release_capacity(1, [(3, 1024, 1, 3), (1, 1024, 0, None)])
+        ledger = read_capacity(1)
+        self.assertEqual((ledger['cpu'], ledger['ram'], ledger['gpu']), (8, 4096, 1))
+        self.assertEqual((ledger['node:3:cpu'], ledger['node:3:ram'], ledger['node:3:gpu']), (4, 2048, 1))
+
+        # A rebuild applies only at the version it was computed for
+        self.assertFalse(load_capacity(1, {'cpu': 1, 'ram': 1, 'gpu': 0}, ledger['version'] - 1))
+        self.assertTrue(load_capacity(1, {'cpu': 1, 'ram': 1, 'gpu': 0}, ledger['version']))
+        self.assertEqual(read_capacity(1), {'cpu': 1, 'ram': 1, 'gpu': 0, 'version': ledger['version'] + 1})
 
+    @patch('app.redis_helper.time.time')
+    def test_due_completions_are_claimed_once(self, mock_time):
+        mock_time.return_value = 1000.0
+        schedule_completions({7: 10, 8: 30})
+        mock_time.return_value = 1020.0
+        self.assertEqual(claim_due_completions(100, 60), [7])
+        self.assertEqual(claim_due_completions(100, 60), [])
+        # A claim that is not acknowledged lapses and the completion is claimed again
+        mock_time.return_value = 1090.0
+        self.assertEqual(sorted(claim_due_completions(100, 60)), [7, 8])
+        ack_completions([7, 8])
+        mock_time.return_value = 1200.0
+        self.assertEqual(claim_due_completions(100, 60), [])
 
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
@@ -0,0 +1,97 @@
+import random
+import unittest
+from time import perf_counter
+from app.scheduling.anytime import AnytimeStrategy
+from app.scheduling.branch_and_bound import BranchAndBound
+from app.scheduling.node import Node
+from app.scheduling.deployment_dto import DeploymentDto
+
+class TestAnytimeStrategy(unittest.TestCase):
+    def setUp(self):
+        self.strategy = AnytimeStrategy(time_budget=0.05)
+        self.node = Node(id=1, cpu=10, memory=20, gpu=5)
+
+    def test_no_deployments(self):
+        scheduled = self.strategy.schedule_deployments(self.node, [])
+        self.assertEqual(scheduled, [])
+
+    def test_multiple_deployments_all_fit(self):
+        deployments = [
+            DeploymentDto(id=1, cpu=3, memory=5, gpu=1),
+            DeploymentDto(id=2, cpu=4, memory=8, gpu=2),
+            DeploymentDto(id=3, cpu=2, memory=4, gpu=1)
+        ]
+        scheduled = self.strategy.schedule_deployments(self.node, deployments)
+        self.assertEqual(set(d.id for d in scheduled), {1, 2, 3})
+
+    def test_refines_greedy_answer(self):
+        node = Node(id=1, cpu=10, memory=10, gpu=0)
+        deployments = [
+            DeploymentDto(id=1, cpu=1, memory=6, gpu=0),
+            DeploymentDto(id=2, cpu=5, memory=5, gpu=0),
+            DeploymentDto(id=3, cpu=5, memory=5, gpu=0)
+        ]
+        scheduled = self.strategy.schedule_deployments(node, deployments)
+        self.assertEqual(set(d.id for d in scheduled), {2, 3})
+        self.assertTrue(self.strategy.optimal)
+
+        # Out of budget before the exact search proves anything
+        strategy = AnytimeStrategy(time_budget=0)
+        strategy.schedule_deployments(node, deployments)
+        self.assertFalse(strategy.optimal)
+
+    def test_large_queue_returns_within_budget(self):
+        rng = random.Random(5)
+        deployments = [DeploymentDto(id=i, cpu=rng.randint(1, 20), memory=rng.randint(1, 64), gpu=rng.randint(0, 4)) for i in range(2000)]
+        node = Node(id=1, cpu=10000, memory=30000, gpu=2000)
+        start = perf_counter()
+        scheduled = AnytimeStrategy(time_budget=0.02).schedule_deployments(node, deployments)
+        self.assertLess(perf_counter() - start, 1)
+        self.assertGreater(len(scheduled), 0)
+        self.assertLessEqual(sum(d.cpu for d in scheduled), node.cpu)
+        self.assertLessEqual(sum(d.memory for d in scheduled), node.memory)
+        self.assertLessEqual(sum(d.gpu for d in scheduled), node.gpu)
+
+    def test_very_large_queue_holds_the_budget(self):
+        rng = random.Random(5)
+        deployments = [DeploymentDto(id=i, cpu=rng.randint(1, 20), memory=rng.randint(1, 64), gpu=rng.randint(0, 4)) for i in range(20000)]
+        node = Node(id=1, cpu=80000, memory=240000, gpu=20000)
+        strategy = AnytimeStrategy(time_budget=0.005)
+        start = perf_counter()
+        scheduled = strategy.schedule_deployments(node, deployments)
+        # Sorting and filling all 20000 deployments twice takes several times the budget
+        self.assertLess(perf_counter() - start, 0.025)
+        self.assertGreater(len(scheduled), 0)
+        self.assertLessEqual(sum(d.cpu for d in scheduled), node.cpu)
+        self.assertEqual(len(strategy.ordering), len(deployments))
+
+    def test_branch_and_bound_time_limit(self):
+        deployments = [DeploymentDto(id=i, cpu=i % 5 + 1, memory=i % 3 + 1, gpu=0) for i in range(40)]
+        strategy = BranchAndBound(time_limit=0)
+        scheduled = strategy.schedule_deployments(self.node, deployments)
+        self.assertTrue(strategy.timed_out)
+        self.assertFalse(strategy.optimal)
+        self.assertLessEqual(sum(d.cpu for d in scheduled), self.node.cpu)
+        self.assertLessEqual(sum(d.memory for d in scheduled), self.node.memory)
+
+    def test_initial_order_is_tried_first(self):
+        node = Node(id=1, cpu=10, memory=10, gpu=0)
+        deployments = [
+            DeploymentDto(id=1, cpu=1, memory=6, gpu=0),
+            DeploymentDto(id=2, cpu=5, memory=5, gpu=0),
+            DeploymentDto(id=3, cpu=5, memory=5, gpu=0)
+        ]
+        strategy = AnytimeStrategy(time_budget=0.05, initial_order=[3, 2, 1])
+        scheduled = strategy.schedule_deployments(node, deployments)
+        self.assertEqual([d.id for d in scheduled], [3, 2])
+        self.assertEqual(strategy.ordering, [3, 2, 1])
+
+    def test_branch_and_bound_keeps_better_initial_solution(self):
+        deployments = [DeploymentDto(id=i, cpu=i % 5 + 1, memory=i % 3 + 1, gpu=0) for i in range(40)]
+        initial = [d for d in deployments if d.cpu == 1][:6]
+        strategy = BranchAndBound(time_limit=0, initial_solution=initial)
+        scheduled = strategy.schedule_deployments(self.node, deployments)
+        self.assertGreaterEqual(len(scheduled), len(initial))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import random
+import unittest
+from app.scheduling.branch_and_bound import BranchAndBound
+from app.scheduling.all_combinations import AllCombinations
+from app.scheduling.node import Node
+from app.scheduling.deployment_dto import DeploymentDto
+
+class TestBranchAndBound(unittest.TestCase):
+    def setUp(self):
+        self.strategy = BranchAndBound()
+        self.node = Node(id=1, cpu=10, memory=20, gpu=5)
+
+    def test_no_deployments(self):
+        deployments = []
+        scheduled = self.strategy.schedule_deployments(self.node, deployments)
+        self.assertEqual(scheduled, [])
+
+    def test_single_deployment_does_not_fit(self):
+        deployments = [DeploymentDto(id=1, cpu=15, memory=25, gpu=10)]
+        scheduled = self.strategy.schedule_deployments(self.node, deployments)
+        self.assertEqual(scheduled, [])
+
+    def test_multiple_deployments_all_fit(self):
+        deployments = [
+            DeploymentDto(id=1, cpu=3, memory=5, gpu=1),
+            DeploymentDto(id=2, cpu=4, memory=8, gpu=2),
+            DeploymentDto(id=3, cpu=2, memory=4, gpu=1)
+        ]
+        scheduled = self.strategy.schedule_deployments(self.node, deployments)
+        self.assertEqual(set(d.id for d in scheduled), {1, 2, 3})
+
+    def test_multiple_deployments_some_fit(self):
+        deployments = [
+            DeploymentDto(id=1, cpu=3, memory=5, gpu=1),
+            DeploymentDto(id=2, cpu=4, memory=8, gpu=2),
+            DeploymentDto(id=3, cpu=10, memory=20, gpu=5)
+        ]
+        scheduled = self.strategy.schedule_deployments(self.node, deployments)
+        self.assertEqual(set(d.id for d in scheduled), {1, 2})
+
+    def test_greedy_order_is_not_optimal(self):
+        # Taking the smallest deployment first leaves room for only one more
+        node = Node(id=1, cpu=10, memory=10, gpu=0)
+        deployments = [
+            DeploymentDto(id=1, cpu=1, memory=6, gpu=0),
+            DeploymentDto(id=2, cpu=5, memory=5, gpu=0),
+            DeploymentDto(id=3, cpu=5, memory=5, gpu=0)
+        ]
+        scheduled = self.strategy.schedule_deployments(node, deployments)
+        self.assertEqual(set(d.id for d in scheduled), {2, 3})
+
+    def test_matches_all_combinations(self):
+        rng = random.Random(7)
+        for _ in range(100):
+            deployments = [
+                DeploymentDto(id=i, cpu=rng.randint(0, 10), memory=rng.randint(0, 10), gpu=rng.randint(0, 4))
+                for i in range(rng.randint(0, 10))
+            ]
+            node = Node(id=1, cpu=rng.randint(0, 30), memory=rng.randint(0, 30), gpu=rng.randint(0, 8))
+            expected = AllCombinations().schedule_deployments(node, deployments)
+            scheduled = self.strategy.schedule_deployments(node, deployments)
+            self.assertEqual(len(scheduled), len(expected))
+            self.assertLessEqual(sum(d.cpu for d in scheduled), node.cpu)
+            self.assertLessEqual(sum(d.memory for d in scheduled), node.memory)
+            self.assertLessEqual(sum(d.gpu for d in scheduled), node.gpu)
+
+if __name__ == '__main__':
+    unittest.main()
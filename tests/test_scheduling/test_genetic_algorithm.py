@@ -1,5 +1,6 @@
 import unittest
-from app.scheduling.genetic_algorithm import GeneticAlgorithm
+from concurrent.futures import Future
+from app.scheduling.genetic_algorithm import GeneticAlgorithm, island_pool
 from app.scheduling.node import Node
 from app.scheduling.deployment_dto import DeploymentDto
 from copy import copy
@@ -33,5 +34,37 @@ class TestGeneticAlgorithm(unittest.TestCase):
         scheduled = self.strategy.schedule_deployments(copy(self.node), deployments)
         self.assertEqual(scheduled, [])
 
+    def test_single_deployment(self):
+        deployments = [DeploymentDto(id=1, cpu=3, memory=5, gpu=1)]
+        scheduled = self.strategy.schedule_deployments(copy(self.node), deployments)
+        self.assertEqual([d.id for d in scheduled], [1])
+
+    def test_is_reproducible_with_seed(self):
+        deployments = [DeploymentDto(id=i, cpu=i % 3 + 1, memory=i % 5 + 1, gpu=i % 2) for i in range(30)]
+        first = GeneticAlgorithm(generations=4, population_size=4, seed=7)
+        second = GeneticAlgorithm(generations=4, population_size=4, seed=7)
+        self.assertEqual(
+            [d.id for d in first.schedule_deployments(copy(self.node), deployments)],
+            [d.id for d in second.schedule_deployments(copy(self.node), deployments)]
+        )
+
+    def test_islands_are_reproducible_with_seed(self):
+        deployments = [DeploymentDto(id=i, cpu=i % 3 + 1, memory=i % 5 + 1, gpu=i % 2) for i in range(30)]
+        first = GeneticAlgorithm(generations=6, population_size=4, seed=7, islands=3, migration_interval=2)
+        second = GeneticAlgorithm(generations=6, population_size=4, seed=7, islands=3, migration_interval=2)
+        scheduled = first.schedule_deployments(copy(self.node), deployments)
+        self.assertEqual([d.id for d in scheduled], [d.id for d in second.schedule_deployments(copy(self.node), deployments)])
+        self.assertLessEqual(sum(d.cpu for d in scheduled), self.node.cpu)
+        self.assertLessEqual(sum(d.memory for d in scheduled), self.node.memory)
+        self.assertLessEqual(sum(d.gpu for d in scheduled), self.node.gpu)
+        # Every run shares one pool
+        self.assertIs(island_pool(), island_pool())
+
+    def test_islands_schedule_asynchronously(self):
+        deployments = [DeploymentDto(id=1, cpu=3, memory=5, gpu=1), DeploymentDto(id=2, cpu=4, memory=8, gpu=2)]
+        future = GeneticAlgorithm(islands=2, seed=1).schedule_deployments_async(copy(self.node), deployments)
+        self.assertIsInstance(future, Future)
+        self.assertEqual(set(d.id for d in future.result(timeout=60)), {1, 2})
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,85 @@
+import random
+import unittest
+from app.scheduling.greedy import first_fit, GreedyStrategy, DominantResourceGreedy, SmallestFirstGreedy, FirstFitDecreasing, BestFitGreedy
+from app.scheduling.node import Node
+from app.scheduling.deployment_dto import DeploymentDto
+
+class TestGreedyStrategies(unittest.TestCase):
+    def setUp(self):
+        self.strategies = [DominantResourceGreedy(), SmallestFirstGreedy(), FirstFitDecreasing(), BestFitGreedy()]
+        self.node = Node(id=1, cpu=10, memory=20, gpu=5)
+
+    def test_no_deployments(self):
+        for strategy in self.strategies:
+            self.assertEqual(strategy.schedule_deployments(self.node, []), [])
+
+    def test_multiple_deployments_all_fit(self):
+        deployments = [
+            DeploymentDto(id=1, cpu=3, memory=5, gpu=1),
+            DeploymentDto(id=2, cpu=4, memory=8, gpu=2),
+            DeploymentDto(id=3, cpu=2, memory=4, gpu=1)
+        ]
+        for strategy in self.strategies:
+            scheduled = strategy.schedule_deployments(self.node, deployments)
+            self.assertEqual(set(d.id for d in scheduled), {1, 2, 3})
+
+    def test_multiple_deployments_none_fit(self):
+        deployments = [
+            DeploymentDto(id=1, cpu=15, memory=25, gpu=10),
+            DeploymentDto(id=2, cpu=12, memory=22, gpu=8)
+        ]
+        for strategy in self.strategies:
+            self.assertEqual(strategy.schedule_deployments(self.node, deployments), [])
+
+    def test_dominant_resource_prefers_small_dominant_share(self):
+        # Deployment 1 is small in total but takes the whole GPU capacity
+        deployments = [
+            DeploymentDto(id=1, cpu=0, memory=0, gpu=5),
+            DeploymentDto(id=2, cpu=4, memory=6, gpu=2),
+            DeploymentDto(id=3, cpu=4, memory=6, gpu=2)
+        ]
+        scheduled = DominantResourceGreedy().schedule_deployments(self.node, deployments)
+        self.assertEqual(set(d.id for d in scheduled), {2, 3})
+
+    def test_first_fit_decreasing_takes_largest_first(self):
+        deployments = [
+            DeploymentDto(id=1, cpu=2, memory=2, gpu=1),
+            DeploymentDto(id=2, cpu=9, memory=18, gpu=4)
+        ]
+        scheduled = FirstFitDecreasing().schedule_deployments(self.node, deployments)
+        self.assertEqual([d.id for d in scheduled], [2])
+
+    def test_best_fit_leaves_least_slack(self):
+        deployments = [
+            DeploymentDto(id=1, cpu=1, memory=1, gpu=1),
+            DeploymentDto(id=2, cpu=6, memory=12, gpu=3),
+            DeploymentDto(id=3, cpu=4, memory=8, gpu=2)
+        ]
+        scheduled = BestFitGreedy().schedule_deployments(self.node, deployments)
+        self.assertEqual([d.id for d in scheduled], [2, 3])
+
+    def test_scheduled_deployments_fit_node(self):
+        rng = random.Random(3)
+        deployments = [DeploymentDto(id=i, cpu=rng.randint(0, 9), memory=rng.randint(0, 9), gpu=rng.randint(0, 3)) for i in range(500)]
+        node = Node(id=1, cpu=400, memory=500, gpu=100)
+        for strategy in self.strategies:
+            scheduled = strategy.schedule_deployments(node, deployments)
+            self.assertGreater(len(scheduled), 0)
+            self.assertLessEqual(sum(d.cpu for d in scheduled), node.cpu)
+            self.assertLessEqual(sum(d.memory for d in scheduled), node.memory)
+            self.assertLessEqual(sum(d.gpu for d in scheduled), node.gpu)
+
+    def test_greedy_strategy_requires_a_sort_key(self):
+        with self.assertRaises(TypeError):
+            GreedyStrategy()
+
+    def test_first_fit_stops_at_the_deadline(self):
+        node = Node(id=1, cpu=1000, memory=1000, gpu=0)
+        deployments = [DeploymentDto(id=i, cpu=1, memory=1, gpu=0) for i in range(600)]
+        # Past the deadline the fill stops at its first check and keeps what it scheduled
+        self.assertEqual(len(first_fit(node, deployments, deadline=0)), 255)
+        self.assertEqual(len(SmallestFirstGreedy(time_limit=-1).schedule_deployments(node, deployments)), 255)
+        self.assertEqual(len(first_fit(node, deployments)), 600)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from app.scheduling.multi_node_scheduler import MultiNodeScheduler
+from app.scheduling.node import Node
+from app.scheduling.deployment_dto import DeploymentDto
+
+class TestMultiNodeScheduler(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = MultiNodeScheduler()
+
+    def test_no_nodes(self):
+        deployments = [DeploymentDto(id=1, cpu=1, memory=1, gpu=0)]
+        self.assertEqual(self.scheduler.schedule_deployments([], deployments), {})
+
+    def test_spills_over_to_idle_node(self):
+        nodes = [Node(id=1, cpu=4, memory=8, gpu=0), Node(id=2, cpu=4, memory=8, gpu=0)]
+        deployments = [DeploymentDto(id=i, cpu=2, memory=4, gpu=0) for i in range(4)]
+        assignments = self.scheduler.schedule_deployments(nodes, deployments)
+        self.assertEqual(len(assignments[1]), 2)
+        self.assertEqual(len(assignments[2]), 2)
+
+    def test_prefers_tightest_fitting_node(self):
+        nodes = [Node(id=1, cpu=10, memory=10, gpu=4), Node(id=2, cpu=2, memory=2, gpu=0)]
+        deployments = [DeploymentDto(id=1, cpu=2, memory=2, gpu=0), DeploymentDto(id=2, cpu=9, memory=9, gpu=4)]
+        assignments = self.scheduler.schedule_deployments(nodes, deployments)
+        self.assertEqual([d.id for d in assignments[2]], [1])
+        self.assertEqual([d.id for d in assignments[1]], [2])
+
+    def test_respects_each_node_capacity(self):
+        nodes = [Node(id=1, cpu=5, memory=5, gpu=1), Node(id=2, cpu=3, memory=9, gpu=0)]
+        deployments = [DeploymentDto(id=i, cpu=i % 3 + 1, memory=i % 4 + 1, gpu=i % 2) for i in range(12)]
+        assignments = self.scheduler.schedule_deployments(nodes, deployments)
+        for node in nodes:
+            scheduled = assignments[node.id]
+            self.assertLessEqual(sum(d.cpu for d in scheduled), node.cpu)
+            self.assertLessEqual(sum(d.memory for d in scheduled), node.memory)
+            self.assertLessEqual(sum(d.gpu for d in scheduled), node.gpu)
+        # The input nodes are left untouched
+        self.assertEqual((nodes[0].cpu, nodes[1].cpu), (5, 3))
+
+if __name__ == '__main__':
+    unittest.main()
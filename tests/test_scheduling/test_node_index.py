@@ -0,0 +1,62 @@
+import unittest
+import random
+from app.scheduling.node_index import NodeIndex, MemoryBucket
+from app.scheduling.node import Node
+from app.scheduling.deployment_dto import DeploymentDto
+
+class TestNodeIndex(unittest.TestCase):
+    def test_empty_index(self):
+        index = NodeIndex()
+        self.assertEqual(len(index), 0)
+        self.assertIsNone(index.find(DeploymentDto(id=1, cpu=1, memory=1, gpu=0)))
+
+    def test_finds_tightest_fit(self):
+        index = NodeIndex([Node(id=1, cpu=8, memory=32, gpu=2), Node(id=2, cpu=8, memory=16, gpu=0),
+                           Node(id=3, cpu=8, memory=8, gpu=0)])
+        self.assertEqual(index.find(DeploymentDto(id=1, cpu=2, memory=4, gpu=0)).id, 3)
+        self.assertEqual(index.find(DeploymentDto(id=2, cpu=2, memory=12, gpu=0)).id, 2)
+        self.assertEqual(index.find(DeploymentDto(id=3, cpu=2, memory=4, gpu=1)).id, 1)
+        self.assertIsNone(index.find(DeploymentDto(id=4, cpu=9, memory=4, gpu=0)))
+
+    def test_skips_nodes_short_on_cpu(self):
+        index = NodeIndex([Node(id=1, cpu=1, memory=8, gpu=0), Node(id=2, cpu=4, memory=16, gpu=0)])
+        self.assertEqual(index.find(DeploymentDto(id=1, cpu=2, memory=4, gpu=0)).id, 2)
+
+    def test_schedule_updates_free_capacity(self):
+        index = NodeIndex([Node(id=1, cpu=4, memory=8, gpu=0)])
+        deployment = DeploymentDto(id=1, cpu=3, memory=6, gpu=0)
+        self.assertEqual(index.schedule(deployment).id, 1)
+        self.assertIsNone(index.schedule(deployment))
+        self.assertEqual(index.find(DeploymentDto(id=2, cpu=1, memory=2, gpu=0)).id, 1)
+
+    def test_remove(self):
+        index = NodeIndex([Node(id=1, cpu=4, memory=8, gpu=1), Node(id=2, cpu=4, memory=8, gpu=1)])
+        index.remove(1)
+        self.assertEqual(len(index), 1)
+        self.assertEqual(index.gpu_levels, [1])
+        index.remove(2)
+        self.assertEqual(index.gpu_levels, [])
+
+    def test_matches_a_scan_across_many_blocks(self):
+        rng = random.Random(5)
+        nodes = [Node(id=i, cpu=rng.randint(0, 16), memory=rng.randint(0, 64), gpu=rng.randint(0, 2)) for i in range(300)]
+        index = NodeIndex([Node(n.id, n.cpu, n.memory, n.gpu) for n in nodes])
+        self.assertGreater(len(index.buckets[0].blocks), 1)
+        for i in range(500):
+            deployment = DeploymentDto(id=i, cpu=rng.randint(0, 6), memory=rng.randint(0, 20), gpu=rng.randint(0, 2))
+            fits = [n for n in nodes if n.gpu >= deployment.gpu and n.memory >= deployment.memory and n.cpu >= deployment.cpu]
+            expected = min(fits, key=lambda n: (n.gpu, n.memory, n.cpu, n.id)).id if fits else None
+            node = index.schedule(deployment)
+            self.assertEqual(node.id if node else None, expected)
+            if node:
+                next(n for n in nodes if n.id == node.id).schedule(deployment)
+
+    def test_skips_blocks_short_on_cpu(self):
+        # Every node with enough memory but the last is out of cpu
+        index = NodeIndex([Node(id=i, cpu=0, memory=100 + i, gpu=0) for i in range(10 * MemoryBucket.BLOCK_SIZE)] +
+                          [Node(id=-1, cpu=4, memory=10000, gpu=0)])
+        self.assertEqual(index.find(DeploymentDto(id=1, cpu=1, memory=1, gpu=0)).id, -1)
+        self.assertEqual(index.find(DeploymentDto(id=2, cpu=0, memory=150, gpu=0)).id, 50)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,24 @@
+import unittest
+from app.scheduling.queue_state import QueueState, QueueStates
+
+class TestQueueStates(unittest.TestCase):
+    def test_least_recently_used_queue_is_evicted(self):
+        states = QueueStates(maxsize=2)
+        for queue in ('P0:{cluster:1}', 'P0:{cluster:2}'):
+            states.put(queue, QueueState((4, 1024, 0), 1, [], []))
+        self.assertIsNotNone(states.get('P0:{cluster:1}'))
+        states.put('P0:{cluster:3}', QueueState((4, 1024, 0), 1, [], []))
+        self.assertEqual(len(states), 2)
+        self.assertIsNone(states.get('P0:{cluster:2}'))
+        self.assertIsNotNone(states.get('P0:{cluster:1}'))
+
+    def test_pop(self):
+        states = QueueStates()
+        state = QueueState((4, 1024, 0), 1, [], [])
+        states.put('P0:{cluster:1}', state)
+        self.assertIs(states.pop('P0:{cluster:1}'), state)
+        self.assertIsNone(states.pop('P0:{cluster:1}'))
+        self.assertEqual(len(states), 0)
+
+if __name__ == '__main__':
+    unittest.main()
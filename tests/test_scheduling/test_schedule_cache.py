@@ -0,0 +1,87 @@
+import unittest
+from app.scheduling.schedule_cache import ScheduleCache
+from app.scheduling.scheduler import Scheduler
+from app.scheduling.greedy import SmallestFirstGreedy
+from app.scheduling.anytime import AnytimeStrategy
+from app.scheduling.node import Node
+from app.scheduling.deployment_dto import DeploymentDto
+
+class CountingStrategy(SmallestFirstGreedy):
+    # Stands in for a strategy that proves its answers
+    optimal = True
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def schedule_deployments(self, node, deployments):
+        self.calls += 1
+        return super().schedule_deployments(node, deployments)
+
+class TestScheduleCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = ScheduleCache(maxsize=2)
+        self.strategy = CountingStrategy()
+        self.node = Node(id=1, cpu=10, memory=10, gpu=0)
+
+    def test_hit_maps_answer_to_other_deployments_of_same_shapes(self):
+        first = [DeploymentDto(id=i, cpu=4, memory=4, gpu=0) for i in range(3)]
+        second = [DeploymentDto(id=i, cpu=4, memory=4, gpu=0) for i in range(10, 13)]
+        self.assertEqual(len(self.cache.schedule(self.node, first, self.strategy)), 2)
+        scheduled = self.cache.schedule(self.node, second, self.strategy)
+        self.assertEqual([d.id for d in scheduled], [10, 11])
+        self.assertEqual(self.strategy.calls, 1)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_key_depends_on_capacity_and_shape_counts(self):
+        deployments = [DeploymentDto(id=i, cpu=4, memory=4, gpu=0) for i in range(3)]
+        self.cache.schedule(self.node, deployments, self.strategy)
+        self.cache.schedule(Node(id=1, cpu=20, memory=20, gpu=0), deployments, self.strategy)
+        self.cache.schedule(self.node, deployments[:2], self.strategy)
+        self.assertEqual(self.strategy.calls, 3)
+        self.assertEqual(self.cache.hits, 0)
+
+    def test_evicts_least_recently_used(self):
+        queues = [[DeploymentDto(id=1, cpu=size, memory=1, gpu=0)] for size in (1, 2, 3)]
+        self.cache.schedule(self.node, queues[0], self.strategy)
+        self.cache.schedule(self.node, queues[1], self.strategy)
+        self.cache.schedule(self.node, queues[0], self.strategy)
+        self.cache.schedule(self.node, queues[2], self.strategy)
+        self.assertEqual(len(self.cache), 2)
+        self.cache.schedule(self.node, queues[0], self.strategy)
+        self.cache.schedule(self.node, queues[1], self.strategy)
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 4))
+
+    def test_scheduler_uses_cache(self):
+        scheduler = Scheduler(self.strategy, cache=self.cache)
+        deployments = [DeploymentDto(id=i, cpu=3, memory=3, gpu=0) for i in range(4)]
+        node = Node(id=1, cpu=10, memory=10, gpu=0)
+        self.assertEqual(len(scheduler.schedule_deployments(node, deployments)), 3)
+        self.assertEqual(node.cpu, 1)
+        scheduler.schedule_deployments(Node(id=1, cpu=10, memory=10, gpu=0), deployments)
+        self.assertEqual(self.strategy.calls, 1)
+
+    def test_only_proven_answers_are_cached(self):
+        strategy = CountingStrategy()
+        strategy.optimal = False
+        deployments = [DeploymentDto(id=i, cpu=4, memory=4, gpu=0) for i in range(3)]
+        self.cache.schedule(self.node, deployments, strategy)
+        self.cache.schedule(self.node, deployments, strategy)
+        self.assertEqual((strategy.calls, len(self.cache)), (2, 0))
+
+        # Scheduling every deployment cannot be improved on
+        self.cache.schedule(self.node, deployments[:2], strategy)
+        self.cache.schedule(self.node, deployments[:2], strategy)
+        self.assertEqual((strategy.calls, self.cache.hits), (3, 1))
+
+    def test_hit_leaves_the_ordering_for_the_next_run(self):
+        deployments = [DeploymentDto(id=i, cpu=4, memory=4, gpu=0) for i in range(3)]
+        self.cache.schedule(self.node, deployments, AnytimeStrategy(time_budget=1))
+        strategy = AnytimeStrategy(time_budget=1)
+        scheduled = self.cache.schedule(self.node, deployments[::-1], strategy)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(strategy.ordering, [d.id for d in scheduled] + [0])
+        self.assertTrue(strategy.optimal)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import random
+import unittest
+from app.scheduling.shape_branch_and_bound import ShapeBranchAndBound
+from app.scheduling.all_combinations import AllCombinations
+from app.scheduling.node import Node
+from app.scheduling.deployment_dto import DeploymentDto
+
+class TestShapeBranchAndBound(unittest.TestCase):
+    def setUp(self):
+        self.strategy = ShapeBranchAndBound()
+
+    def test_no_deployments(self):
+        self.assertEqual(self.strategy.schedule_deployments(Node(id=1, cpu=10, memory=10, gpu=1), []), [])
+
+    def test_matches_all_combinations(self):
+        rng = random.Random(3)
+        for _ in range(200):
+            shapes = [(rng.randint(0, 6), rng.randint(0, 6), rng.randint(0, 2)) for _ in range(rng.randint(1, 4))]
+            deployments = [DeploymentDto(i, *rng.choice(shapes)) for i in range(rng.randint(0, 11))]
+            node = Node(id=1, cpu=rng.randint(0, 25), memory=rng.randint(0, 25), gpu=rng.randint(0, 5))
+            expected = AllCombinations().schedule_deployments(node, deployments)
+            scheduled = self.strategy.schedule_deployments(node, deployments)
+            self.assertEqual(len(scheduled), len(expected))
+            self.assertEqual(len(set(d.id for d in scheduled)), len(scheduled))
+            self.assertLessEqual(sum(d.cpu for d in scheduled), node.cpu)
+            self.assertLessEqual(sum(d.memory for d in scheduled), node.memory)
+            self.assertLessEqual(sum(d.gpu for d in scheduled), node.gpu)
+
+    def test_large_queue_of_few_shapes(self):
+        # The greedy fill takes the small shape first, the optimum mixes in the tighter medium one
+        shapes = [(2, 2, 0), (3, 1, 0), (4, 8, 1)]
+        deployments = [DeploymentDto(i, *shapes[i % 3]) for i in range(30000)]
+        node = Node(id=1, cpu=25000, memory=20000, gpu=100)
+        strategy = ShapeBranchAndBound(time_limit=5)
+        scheduled = strategy.schedule_deployments(node, deployments)
+        self.assertFalse(strategy.timed_out)
+        self.assertLessEqual(sum(d.cpu for d in scheduled), node.cpu)
+        self.assertLessEqual(sum(d.memory for d in scheduled), node.memory)
+        # x of (2, 2) and y of (3, 1): 2x + 3y <= 25000 and 2x + y <= 20000 peak at x + y = 11250
+        self.assertEqual(len(scheduled), 11250)
+
+if __name__ == '__main__':
+    unittest.main()
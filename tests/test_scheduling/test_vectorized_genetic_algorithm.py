@@ -0,0 +1,72 @@
+import unittest
+import numpy as np
+from app.scheduling.vectorized_genetic_algorithm import VectorizedGeneticAlgorithm
+from app.scheduling.node import Node
+from app.scheduling.deployment_dto import DeploymentDto
+from copy import copy
+
+class TestVectorizedGeneticAlgorithm(unittest.TestCase):
+    def setUp(self):
+        self.strategy = VectorizedGeneticAlgorithm(generations=50, population_size=20, seed=42)
+        self.node = Node(id=1, cpu=10, memory=20, gpu=5)
+
+    def test_no_deployments(self):
+        deployments = []
+        scheduled = self.strategy.schedule_deployments(copy(self.node), deployments)
+        self.assertEqual(scheduled, [])
+
+    def test_multiple_deployments_all_fit(self):
+        deployments = [
+            DeploymentDto(id=1, cpu=3, memory=5, gpu=1),
+            DeploymentDto(id=2, cpu=4, memory=8, gpu=2),
+            DeploymentDto(id=3, cpu=2, memory=4, gpu=1)
+        ]
+        scheduled = self.strategy.schedule_deployments(copy(self.node), deployments)
+        self.assertEqual(set(d.id for d in scheduled), {1, 2, 3})
+
+    def test_multiple_deployments_none_fit(self):
+        deployments = [
+            DeploymentDto(id=1, cpu=15, memory=25, gpu=10),
+            DeploymentDto(id=2, cpu=12, memory=22, gpu=8)
+        ]
+        scheduled = self.strategy.schedule_deployments(copy(self.node), deployments)
+        self.assertEqual(scheduled, [])
+
+    def test_scheduled_deployments_fit_node(self):
+        rng = np.random.default_rng(0)
+        deployments = [
+            DeploymentDto(id=i, cpu=int(c), memory=int(m), gpu=int(g))
+            for i, (c, m, g) in enumerate(rng.integers(0, 10, size=(200, 3)))
+        ]
+        node = Node(id=1, cpu=300, memory=300, gpu=300)
+        scheduled = self.strategy.schedule_deployments(copy(node), deployments)
+        self.assertGreater(len(scheduled), 0)
+        self.assertEqual(len(set(d.id for d in scheduled)), len(scheduled))
+        self.assertLessEqual(sum(d.cpu for d in scheduled), node.cpu)
+        self.assertLessEqual(sum(d.memory for d in scheduled), node.memory)
+        self.assertLessEqual(sum(d.gpu for d in scheduled), node.gpu)
+
+    def test_same_seed_is_reproducible(self):
+        deployments = [DeploymentDto(id=i, cpu=i % 4 + 1, memory=i % 7 + 1, gpu=i % 2) for i in range(50)]
+        first = VectorizedGeneticAlgorithm(seed=3).schedule_deployments(copy(self.node), deployments)
+        second = VectorizedGeneticAlgorithm(seed=3).schedule_deployments(copy(self.node), deployments)
+        self.assertEqual([d.id for d in first], [d.id for d in second])
+
+    def test_crossover_produces_permutations(self):
+        rng = np.random.default_rng(1)
+        parent1 = np.array([rng.permutation(30) for _ in range(16)])
+        parent2 = np.array([rng.permutation(30) for _ in range(16)])
+        children = VectorizedGeneticAlgorithm._crossover(parent1, parent2, rng)
+        for child in children:
+            self.assertEqual(sorted(child.tolist()), list(range(30)))
+
+    def test_initial_order_seeds_population(self):
+        node = Node(id=1, cpu=10, memory=10, gpu=0)
+        deployments = [DeploymentDto(id=1, cpu=1, memory=6, gpu=0), DeploymentDto(id=2, cpu=5, memory=5, gpu=0),
+                       DeploymentDto(id=3, cpu=5, memory=5, gpu=0)]
+        strategy = VectorizedGeneticAlgorithm(generations=1, population_size=2, seed=1, initial_order=[2, 3, 1])
+        scheduled = strategy.schedule_deployments(node, deployments)
+        self.assertEqual(set(d.id for d in scheduled), {2, 3})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import sys
+import os
+import pytest
+from unittest.mock import patch, MagicMock
+from flask import Flask
+
+# Add the root directory of the project to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.services.capacity_ledger import CapacityLedger
+
+@pytest.fixture(scope='module')
+def app():
+    return Flask(__name__)
+
+@patch.object(CapacityLedger, 'load')
+@patch('app.services.capacity_ledger.reserve_capacity')
+def test_reserve_loads_a_missing_ledger_and_retries(mock_reserve, mock_load, app):
+    cluster = MagicMock(id=1)
+    deployment = MagicMock(cpu=2, ram=512, gpu=0)
+    mock_reserve.side_effect = [None, [True]]
+
+    assert CapacityLedger.reserve_all(cluster, [(deployment, 4)]) == [True]
+    mock_load.assert_called_once_with(cluster)
+    mock_reserve.assert_called_with(1, [(2, 512, 0, 4)])
+
+    mock_reserve.side_effect = [[False]]
+    assert CapacityLedger.reserve_all(cluster, [(deployment, None)]) == [False]
+
+@patch('app.services.capacity_ledger.release_capacity')
+def test_release_all_makes_one_call_per_cluster(mock_release, app):
+    deployments = [MagicMock(cluster_id=cluster_id, node_id=None, cpu=2, ram=512, gpu=0) for cluster_id in (1, 2, 1)]
+
+    CapacityLedger.release_all(deployments)
+    assert mock_release.call_count == 2
+    mock_release.assert_any_call(1, [(2, 512, 0, None), (2, 512, 0, None)])
+    mock_release.assert_any_call(2, [(2, 512, 0, None)])
+
+@patch('app.services.capacity_ledger.read_capacity')
+def test_free_nodes_come_from_the_ledger(mock_read, app):
+    cluster = MagicMock(id=1, nodes=[MagicMock(id=3), MagicMock(id=4)])
+    mock_read.return_value = {'cpu': 6, 'ram': 3072, 'gpu': 1, 'version': 9,
+                              'node:3:cpu': 2, 'node:3:ram': 1024, 'node:3:gpu': 0,
+                              'node:4:cpu': 4, 'node:4:ram': 2048, 'node:4:gpu': 1}
+
+    assert CapacityLedger.free(cluster) == (6, 3072, 1)
+    assert [(n.id, n.cpu, n.memory, n.gpu) for n in CapacityLedger.free_nodes(cluster)] == [(3, 2, 1024, 0), (4, 4, 2048, 1)]
+
+@patch('app.services.capacity_ledger.db.session')
+@patch('app.services.capacity_ledger.read_capacities')
+def test_sync_writes_allocated_resources_from_the_ledgers(mock_read, mock_session, app):
+    node = MagicMock(id=3, total_cpu=4, total_ram=2048, total_gpu=1)
+    cluster = MagicMock(id=1, total_cpu=4, total_ram=2048, total_gpu=1, nodes=[node])
+    unloaded = MagicMock(id=2, allocated_cpu=5)
+    mock_read.return_value = {1: {'cpu': 1, 'ram': 512, 'gpu': 1, 'node:3:cpu': 1, 'node:3:ram': 512, 'node:3:gpu': 1}, 2: None}
+
+    CapacityLedger.sync([cluster, unloaded])
+    mock_read.assert_called_once_with([1, 2])
+    assert (cluster.allocated_cpu, cluster.allocated_ram, cluster.allocated_gpu) == (3, 1536, 0)
+    assert (node.allocated_cpu, node.allocated_ram, node.allocated_gpu) == (3, 1536, 0)
+    assert unloaded.allocated_cpu == 5
+    mock_session.commit.assert_called_once()
+
+@patch('app.services.capacity_ledger.load_capacity')
+@patch.object(CapacityLedger, 'from_database')
+@patch('app.services.capacity_ledger.read_capacity')
+@patch('app.services.capacity_ledger.Cluster')
+def test_reconcile_rebuilds_only_a_drifted_ledger(mock_cluster, mock_read, mock_from_database, mock_load, app):
+    mock_cluster.query.get.return_value = MagicMock(id=1)
+    mock_from_database.return_value = {'cpu': 4, 'ram': 2048, 'gpu': 0}
+
+    mock_read.return_value = {'cpu': 4, 'ram': 2048, 'gpu': 0, 'version': 7}
+    assert not CapacityLedger.reconcile(1)
+    mock_load.assert_not_called()
+
+    # A reservation whose deployment is being committed differs only until the next check
+    mock_read.return_value = {'cpu': 2, 'ram': 2048, 'gpu': 0, 'version': 8}
+    assert not CapacityLedger.reconcile(1)
+    mock_read.return_value = {'cpu': 2, 'ram': 2048, 'gpu': 0, 'version': 9}
+    assert not CapacityLedger.reconcile(1)
+    mock_load.assert_not_called()
+
+    # A crash after reserving left 2 cpus taken in the ledger only, unchanged since the last check
+    mock_load.return_value = True
+    assert CapacityLedger.reconcile(1)
+    mock_load.assert_called_once_with(1, {'cpu': 4, 'ram': 2048, 'gpu': 0}, 9)
+    assert 1 not in CapacityLedger.drifts
@@ -63,4 +63,34 @@ def test_create_cluster_organization_not_joined(mock_cluster_query, app):
                 created_by=1,
                 organization_id=None
             )
-        assert str(excinfo.value) == "You need to join an organization to create a cluster"
\ No newline at end of file
+        assert str(excinfo.value) == "You need to join an organization to create a cluster"
+
+@patch('app.services.cluster_service.Cluster.query')
+def test_create_cluster_nodes_must_add_up(mock_cluster_query, app):
+    with app.app_context():
+        mock_cluster_query.filter_by.return_value.first.return_value = None
+        with pytest.raises(ValueError) as excinfo:
+            ClusterService.create_cluster(
+                name="Test Cluster",
+                total_ram=1024,
+                total_cpu=4,
+                total_gpu=1,
+                created_by=1,
+                organization_id=1,
+                nodes=[{'total_ram': 512, 'total_cpu': 2, 'total_gpu': 1},
+                       {'total_ram': 256, 'total_cpu': 2, 'total_gpu': 0}]
+            )
+        assert str(excinfo.value) == "Node capacities must add up to the cluster totals"
+
+@patch('app.services.cluster_service.async_redis_helper.run')
+@patch('app.services.cluster_service.Cluster.query')
+def test_get_queue_summaries(mock_cluster_query, mock_run, app):
+    with app.app_context():
+        mock_cluster_query.all.return_value = [Cluster(id=1, organization_id=1), Cluster(id=2, organization_id=1)]
+        mock_run.return_value = {'{cluster:1}': [{'priority': 0, 'queued': 2, 'min_demand': [1.0, 256.0, 0.0]}],
+                                 '{cluster:2}': [], '{org:1}': []}
+
+        summaries = ClusterService.get_queue_summaries()
+        assert mock_run.call_args.args[1] == ['{cluster:1}', '{cluster:2}', '{org:1}']
+        assert summaries == {'clusters': {1: [{'priority': 0, 'queued': 2, 'min_demand': [1.0, 256.0, 0.0]}], 2: []},
+                             'organizations': {1: []}}
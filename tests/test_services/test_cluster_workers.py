@@ -0,0 +1,43 @@
+import sys
+import os
+import threading
+import pytest
+from flask import Flask
+
+# Add the root directory of the project to the Python path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app.services.cluster_workers import ClusterWorkers
+
+@pytest.fixture
+def workers():
+    workers = ClusterWorkers(2)
+    workers.start(Flask(__name__))
+    return workers
+
+def test_tasks_of_one_organization_run_in_order_on_one_thread(workers):
+    seen = []
+    futures = [workers.submit(3, lambda i=i: seen.append((i, threading.current_thread().name))) for i in range(20)]
+    for future in futures:
+        future.result(timeout=5)
+    assert [i for i, _ in seen] == list(range(20))
+    assert {name for _, name in seen} == {"cluster-worker-1"}
+
+def test_run_returns_results_and_raises_errors(workers):
+    assert workers.run(2, lambda a, b: a + b, 1, b=2) == 3
+
+    def fail():
+        raise ValueError("Cluster not found")
+    with pytest.raises(ValueError, match="Cluster not found"):
+        workers.run(2, fail)
+
+def test_run_from_the_owning_worker_runs_inline(workers):
+    assert workers.run(1, lambda: workers.run(1, lambda: "nested")) == "nested"
+
+def test_stats(workers):
+    workers.run(1, lambda: None)
+    stats = workers.stats()
+    assert stats["workers"] == 2
+    assert stats["tasks"] == 1
+    assert stats["queue_depth"] == [0, 0]
+    assert stats["wait_ms"]["max"] >= stats["wait_ms"]["mean"] >= 0
@@ -43,4 +43,342 @@ def test_create_deployment_cluster_not_found(mock_cluster_query, app):
                 cluster_name="Nonexistent Cluster",
                 created_by=1
             )
-        assert str(excinfo.value) == "Cluster not found"
\ No newline at end of file
+        assert str(excinfo.value) == "Cluster not found"
+
+@patch('app.services.deployment_service.Cluster.query')
+@patch('app.services.deployment_service.User.query')
+def test_create_deployment_any_cluster_without_clusters(mock_user_query, mock_cluster_query, app):
+    with app.app_context():
+        mock_user_query.get.return_value = MagicMock(organization_id=1)
+        mock_cluster_query.filter_by.return_value.all.return_value = []
+
+        with pytest.raises(ValueError) as excinfo:
+            DeploymentService.create_deployment(
+                name="Test Deployment",
+                ram=512,
+                cpu=2,
+                gpu=1,
+                priority=1,
+                docker_path="path/to/docker",
+                cluster_name=None,
+                created_by=1,
+                any_cluster=True
+            )
+        assert str(excinfo.value) == "No clusters in organization"
+
+@patch('app.services.deployment_service.Cluster.query')
+@patch('app.services.deployment_service.queue_bounds')
+@patch('app.services.deployment_service.queued_priorities')
+def test_trigger_skips_when_nothing_queued_fits(mock_queued_priorities, mock_queue_bounds, mock_cluster_query, app):
+    with app.app_context():
+        mock_queued_priorities.return_value = [1]
+        mock_queue_bounds.return_value = (4, 2048, 0)
+
+        DeploymentService.trigger_deployment_in_cluster(1, (2, 4096, 1))
+        mock_queued_priorities.assert_called_once_with('{cluster:1}')
+        mock_queue_bounds.assert_called_once_with('P1:{cluster:1}')
+        mock_cluster_query.get.assert_not_called()
+
+@patch('app.services.deployment_service.CapacityLedger.free')
+@patch('app.services.deployment_service.Cluster.query')
+@patch('app.services.deployment_service.queue_bounds')
+@patch('app.services.deployment_service.queued_priorities')
+def test_trigger_visits_only_queued_priorities(mock_queued_priorities, mock_queue_bounds, mock_cluster_query, mock_free, app):
+    with app.app_context():
+        mock_queued_priorities.return_value = [7, 3]
+        mock_queue_bounds.return_value = (4, 2048, 0)
+        mock_free.return_value = (2, 4096, 0)
+
+        DeploymentService.trigger_deployment_in_cluster(1)
+        # Nothing at level 7 fits, so level 3 waits behind it
+        mock_queue_bounds.assert_called_once_with('P7:{cluster:1}')
+
+@patch('app.services.deployment_service.CapacityLedger')
+@patch('app.services.deployment_service.db.session')
+@patch('app.services.deployment_service.Deployment.query')
+@patch.object(DeploymentService, 'trigger_deployment_in_organization')
+@patch.object(DeploymentService, 'trigger_deployment_in_cluster')
+def test_expired_deployments_are_released_in_one_pass_per_cluster(mock_trigger_cluster, mock_trigger_organization, mock_deployment_query, mock_session, mock_ledger, app):
+    with app.app_context():
+        cluster = MagicMock(id=1, organization_id=5)
+        deployments = [MagicMock(status='running', cluster=cluster, node=None, cpu=2, ram=2, gpu=0) for _ in range(3)]
+        mock_deployment_query.filter.return_value.all.return_value = deployments
+        mock_ledger.free.return_value = (8, 8, 0)
+
+        assert DeploymentService.handle_expire_deployments([1, 2, 3]) == 3
+        assert all(d.status == 'done' for d in deployments)
+        mock_session.commit.assert_called_once()
+        mock_ledger.release_all.assert_called_once_with(deployments)
+        mock_trigger_cluster.assert_called_once_with(1, (8, 8, 0))
+        mock_trigger_organization.assert_called_once_with(5)
+
+@patch('app.services.deployment_service.CapacityLedger')
+def test_place_on_cluster_reserves_in_the_ledger(mock_ledger, app):
+    with app.app_context():
+        cluster = MagicMock(id=1, nodes=[])
+        deployment = MagicMock(id=7, cpu=2, ram=512, gpu=0, status='queued')
+
+        mock_ledger.reserve_all.return_value = [False]
+        assert not DeploymentService.place_on_cluster(deployment, cluster)
+        assert deployment.status == 'queued'
+
+        mock_ledger.reserve_all.return_value = [True]
+        assert DeploymentService.place_on_cluster(deployment, cluster)
+        mock_ledger.reserve_all.assert_called_with(cluster, [(deployment, None)])
+        assert (deployment.status, deployment.cluster_id, deployment.node_id) == ('running', 1, None)
+
+
+@patch('app.services.deployment_service.remove_deployments_from_queue')
+@patch('app.services.deployment_service.schedule_completions')
+@patch('app.services.deployment_service.CapacityLedger')
+@patch('app.services.deployment_service.db.session')
+@patch('app.services.deployment_service.Deployment.query')
+def test_scheduled_deployments_start_in_one_batch(mock_deployment_query, mock_session, mock_ledger, mock_schedule, mock_dequeue, app):
+    with app.app_context():
+        calls = MagicMock()
+        calls.attach_mock(mock_schedule, 'schedule')
+        calls.attach_mock(mock_session.commit, 'commit')
+        calls.attach_mock(mock_dequeue, 'dequeue')
+        cluster = MagicMock(id=1, nodes=[])
+        deployments = [MagicMock(id=i, cpu=1, ram=1, gpu=0, status='queued') for i in (1, 2, 3)]
+        deployments[2].status = 'done'
+        mock_deployment_query.filter.return_value.all.return_value = deployments
+        mock_ledger.reserve_all.return_value = [True, False]
+        scheduled = [MagicMock(id=str(i).encode()) for i in (1, 2, 3, 4)]
+
+        removed = DeploymentService.start_scheduled_deployments('P1:{cluster:1}', cluster, scheduled)
+        assert removed == {b'1', b'3', b'4'}
+        mock_deployment_query.filter.assert_called_once()
+        mock_ledger.reserve_all.assert_called_once_with(cluster, [(deployments[0], None), (deployments[1], None)])
+        assert [d.status for d in deployments] == ['running', 'queued', 'done']
+        mock_session.commit.assert_called_once()
+        # A committed deployment always has a completion, and is dequeued once committed
+        assert [name for name, _, _ in calls.mock_calls] == ['schedule', 'commit', 'dequeue']
+        assert list(mock_schedule.call_args[0][0]) == [1]
+        mock_dequeue.assert_called_once_with('P1:{cluster:1}', [1, 3, 4])
+
+@patch('app.services.deployment_service.cancel_completions')
+@patch('app.services.deployment_service.schedule_completions')
+@patch('app.services.deployment_service.CapacityLedger')
+@patch('app.services.deployment_service.db.session')
+def test_failed_start_cancels_completions_and_reservations(mock_session, mock_ledger, mock_schedule, mock_cancel, app):
+    with app.app_context():
+        deployments = [MagicMock(id=1), MagicMock(id=2)]
+        mock_session.commit.side_effect = RuntimeError("database is locked")
+        with pytest.raises(RuntimeError):
+            DeploymentService.commit_started(deployments)
+        mock_ledger.release_all.assert_called_once_with(deployments)
+        mock_cancel.assert_called_once_with([1, 2])
+        mock_session.rollback.assert_called_once()
+
+@patch('app.services.deployment_service.cancel_completions')
+@patch('app.services.deployment_service.schedule_completions')
+@patch('app.services.deployment_service.CapacityLedger')
+@patch('app.services.deployment_service.db.session')
+@patch('app.services.deployment_service.Cluster.query')
+@patch('app.services.deployment_service.User.query')
+def test_create_deployment_admits_in_one_commit(mock_user_query, mock_cluster_query, mock_session, mock_ledger, mock_schedule, mock_cancel, app):
+    with app.app_context():
+        calls = MagicMock()
+        calls.attach_mock(mock_schedule, 'schedule')
+        calls.attach_mock(mock_session.commit, 'commit')
+        mock_session.flush.side_effect = lambda: setattr(mock_session.add.call_args[0][0], 'id', 7)
+        mock_cluster_query.filter_by.return_value.first.return_value = MagicMock(id=1, organization_id=5, nodes=[])
+        mock_user_query.get.return_value = MagicMock(organization_id=5)
+        mock_ledger.reserve_all.return_value = [True]
+
+        deployment, status = DeploymentService.create_deployment("Test Deployment", 512, 2, 0, 1, "path/to/docker", "c1", 1)
+        assert (status, deployment.status) == ("running", "running")
+        mock_session.commit.assert_called_once()
+        # The completion is scheduled before the commit
+        assert [name for name, _, _ in calls.mock_calls] == ['schedule', 'commit']
+        assert list(mock_schedule.call_args[0][0]) == [7]
+
+        # A failed insert gives the reservation back and cancels the completion
+        mock_session.commit.side_effect = RuntimeError("database is locked")
+        with pytest.raises(RuntimeError):
+            DeploymentService.create_deployment("Test Deployment", 512, 2, 0, 1, "path/to/docker", "c1", 1)
+        mock_ledger.release_all.assert_called_once()
+        mock_cancel.assert_called_once_with([7])
+        mock_session.rollback.assert_called_once()
+
+@patch('app.services.deployment_service.publish_event')
+@patch('app.services.deployment_service.schedule_completions')
+@patch('app.services.deployment_service.enqueue_deployments')
+@patch('app.services.deployment_service.CapacityLedger')
+@patch('app.services.deployment_service.db.session')
+@patch('app.services.deployment_service.Cluster.query')
+@patch('app.services.deployment_service.User.query')
+def test_create_deployments_admits_the_best_set(mock_user_query, mock_cluster_query, mock_session, mock_ledger, mock_enqueue, mock_schedule, mock_publish, app):
+    with app.app_context():
+        calls = MagicMock()
+        calls.attach_mock(mock_schedule, 'schedule')
+        calls.attach_mock(mock_session.commit, 'commit')
+        calls.attach_mock(mock_enqueue, 'enqueue')
+        mock_enqueue.side_effect = lambda queued: [True] * len(queued)
+        cluster = MagicMock(id=1, organization_id=5, nodes=[], total_cpu=10, total_ram=10, total_gpu=0)
+        cluster.name = 'c1'
+        mock_cluster_query.filter.return_value.all.return_value = [cluster]
+        mock_user_query.get.return_value = MagicMock(organization_id=5)
+        mock_ledger.free.return_value = (10, 10, 0)
+        mock_ledger.reserve_all.side_effect = lambda cluster, placements: [True] * len(placements)
+        # Ids as the flush would assign them
+        mock_session.add_all.side_effect = lambda deployments: [setattr(d, 'id', i) for i, d in enumerate(deployments, 1)]
+        specs = [dict(name=f'd{cpu}', ram=cpu, cpu=cpu, gpu=0, priority=1, docker_path='x', cluster_name='c1') for cpu in (6, 5, 5)]
+        specs.append(dict(name='big', ram=11, cpu=11, gpu=0, priority=1, docker_path='x', cluster_name='c1'))
+
+        results = DeploymentService.create_deployments(specs, 1)
+        # First come, first served would start the 6 and queue both 5s
+        assert [r['status'] for r in results] == ['queued', 'running', 'running', 'rejected']
+        mock_cluster_query.filter.assert_called_once()
+        mock_session.commit.assert_called_once()
+        # Completions are scheduled before the commit, the rest is queued after it
+        assert [name for name, _, _ in calls.mock_calls] == ['schedule', 'commit', 'enqueue']
+        assert sorted(mock_schedule.call_args[0][0]) == [2, 3]
+        assert [entry[:2] for entry in mock_enqueue.call_args[0][0]] == [('P1:{cluster:1}', 1)]
+        mock_publish.assert_called_once()
+
+@patch('app.services.deployment_service.Deployment.query')
+@patch('app.services.deployment_service.db.session')
+@patch('app.services.deployment_service.enqueue_deployments')
+def test_enqueue_committed_retries_then_rejects(mock_enqueue, mock_session, mock_query, app):
+    with app.app_context():
+        queued = [('P1:{cluster:1}', 5, 2, 512, 0), ('P1:{cluster:1}', 6, 2, 512, 0)]
+        mock_enqueue.side_effect = [[True, False], [True]]
+        assert DeploymentService.enqueue_committed(queued) == set()
+        assert mock_enqueue.call_args_list[1][0][0] == [queued[1]]
+        mock_session.commit.assert_not_called()
+
+        # A deployment that cannot be queued is rejected rather than left queued in the database only
+        deployment = MagicMock(id=6, status='queued')
+        mock_query.filter.return_value.all.return_value = [deployment]
+        mock_enqueue.side_effect = [[True, False], ConnectionError("Connection refused")]
+        assert DeploymentService.enqueue_committed(queued) == {6}
+        assert deployment.status == 'rejected'
+        mock_session.commit.assert_called_once()
+
+@patch('app.services.deployment_service.db.session')
+@patch('app.services.deployment_service.Cluster.query')
+@patch('app.services.deployment_service.User.query')
+def test_create_deployments_rejects_unknown_clusters_before_admitting(mock_user_query, mock_cluster_query, mock_session, app):
+    with app.app_context():
+        mock_user_query.get.return_value = MagicMock(organization_id=5)
+        mock_cluster_query.filter.return_value.all.return_value = []
+        specs = [dict(name='d', ram=1, cpu=1, gpu=0, priority=1, docker_path='x', cluster_name='nope')]
+
+        with pytest.raises(ValueError) as excinfo:
+            DeploymentService.create_deployments(specs, 1)
+        assert str(excinfo.value) == "Cluster not found: nope"
+        mock_session.commit.assert_not_called()
+
+@patch('app.services.deployment_service.publish_event')
+@patch('app.services.deployment_service.db.session')
+@patch('app.services.deployment_service.Cluster.query')
+@patch('app.services.deployment_service.User.query')
+def test_submit_deployment_leaves_admission_to_the_admitter(mock_user_query, mock_cluster_query, mock_session, mock_publish, app):
+    with app.app_context():
+        cluster = MagicMock(id=1, organization_id=5, nodes=[], total_cpu=10, total_ram=10, total_gpu=0)
+        cluster.name = 'c1'
+        mock_cluster_query.filter.return_value.all.return_value = [cluster]
+        mock_user_query.get.return_value = MagicMock(organization_id=5)
+
+        deployment = DeploymentService.submit_deployment(dict(name='d', ram=2, cpu=2, gpu=0, priority=1, docker_path='x', cluster_name='c1'), 1)
+        assert deployment.status == 'submitted'
+        mock_session.commit.assert_called_once()
+        mock_publish.assert_called_once_with("submit", 1, 5, [deployment.id])
+
+        # A submission the admitter never hears of is not left submitted
+        mock_publish.side_effect = ConnectionError("Connection refused")
+        with pytest.raises(ConnectionError):
+            DeploymentService.submit_deployment(dict(name='d', ram=2, cpu=2, gpu=0, priority=1, docker_path='x', cluster_name='c1'), 1)
+        assert mock_session.add.call_args[0][0].status == 'rejected'
+        assert mock_session.commit.call_count == 3
+
+@patch.object(DeploymentService, 'admit')
+@patch('app.services.deployment_service.Cluster.query')
+@patch('app.services.deployment_service.Deployment.query')
+def test_submitted_deployments_are_admitted_as_one_batch(mock_deployment_query, mock_cluster_query, mock_admit, app):
+    with app.app_context():
+        cluster = MagicMock(id=1, nodes=[], total_cpu=10, total_ram=10, total_gpu=0)
+        mock_cluster_query.get.return_value = cluster
+        deployments = [MagicMock(cpu=cpu, ram=cpu, gpu=0, status='submitted') for cpu in (2, 4, 12)]
+        mock_deployment_query.filter.return_value.all.return_value = deployments
+
+        DeploymentService.admit_submitted(1, 5, [1, 2, 3])
+        assert [d.status for d in deployments] == ['queued', 'queued', 'rejected']
+        mock_admit.assert_called_once_with([(d, cluster) for d in deployments], [])
+
+@patch('app.services.deployment_service.remove_deployments_from_queue')
+@patch('app.services.deployment_service.schedule_completions')
+@patch('app.services.deployment_service.CapacityLedger')
+@patch('app.services.deployment_service.db.session')
+@patch('app.services.deployment_service.Deployment.query')
+@patch('app.services.deployment_service.MultiNodeScheduler')
+@patch('app.services.deployment_service.fetch_deployments_from_queue')
+@patch.object(DeploymentService, 'free_capacity')
+@patch('app.services.deployment_service.Cluster.query')
+@patch('app.services.deployment_service.queued_priorities')
+def test_organization_queue_starts_in_one_batch(mock_queued_priorities, mock_cluster_query, mock_free_capacity, mock_fetch, mock_scheduler,
+                                                mock_deployment_query, mock_session, mock_ledger, mock_schedule, mock_dequeue, app):
+    with app.app_context():
+        mock_queued_priorities.return_value = [0]
+        clusters = [MagicMock(id=1, nodes=[]), MagicMock(id=2, nodes=[])]
+        mock_cluster_query.filter_by.return_value.all.return_value = clusters
+        mock_free_capacity.return_value = MagicMock(cpu=4, memory=1024, gpu=0)
+        dtos = [MagicMock(id=str(i).encode()) for i in (1, 2, 3)]
+        mock_fetch.return_value = dtos
+        mock_scheduler.return_value.schedule_deployments.return_value = {1: [dtos[0], dtos[2]], 2: [dtos[1]]}
+        deployments = [MagicMock(id=i, status='queued') for i in (1, 2, 3)]
+        deployments[2].status = 'done'
+        mock_deployment_query.filter.return_value.all.return_value = deployments
+        mock_ledger.reserve_all.side_effect = lambda cluster, placements: [True] * len(placements)
+
+        DeploymentService.trigger_deployment_in_organization(5)
+        mock_deployment_query.filter.assert_called_once()
+        mock_deployment_query.get.assert_not_called()
+        assert mock_ledger.reserve_all.call_args_list[0].args == (clusters[0], [(deployments[0], None)])
+        assert mock_ledger.reserve_all.call_args_list[1].args == (clusters[1], [(deployments[1], None)])
+        assert [d.status for d in deployments] == ['running', 'running', 'done']
+        mock_session.commit.assert_called_once()
+        mock_schedule.assert_called_once()
+        mock_dequeue.assert_called_once_with('P0:{org:5}', [1, 2, 3])
+
+@patch('app.services.deployment_service.publish_event')
+@patch('app.services.deployment_service.enqueue_deployments')
+@patch('app.services.deployment_service.CapacityLedger')
+@patch.object(DeploymentService, 'free_capacity')
+@patch('app.services.deployment_service.MultiNodeScheduler')
+@patch('app.services.deployment_service.db.session')
+@patch('app.services.deployment_service.Deployment.query')
+@patch('app.services.deployment_service.Cluster.query')
+@patch('app.services.deployment_service.User.query')
+def test_create_deployment_retries_the_enqueue_then_rejects(mock_user_query, mock_cluster_query, mock_deployment_query, mock_session,
+                                                           mock_scheduler, mock_free_capacity, mock_ledger, mock_enqueue, mock_publish, app):
+    with app.app_context():
+        mock_session.commit.side_effect = lambda: setattr(mock_session.add.call_args[0][0], 'id', 7)
+        cluster = MagicMock(id=1, organization_id=5, nodes=[], total_ram=4096, total_cpu=8, total_gpu=0)
+        mock_cluster_query.filter_by.return_value.first.return_value = cluster
+        mock_cluster_query.filter_by.return_value.all.return_value = [cluster]
+        mock_user_query.get.return_value = MagicMock(organization_id=5)
+        mock_ledger.reserve_all.return_value = [False]
+        mock_scheduler.return_value.schedule_deployments.return_value = {1: []}
+
+        # Queued on the second attempt
+        mock_enqueue.side_effect = [ConnectionError("Connection refused"), [True]]
+        _, status = DeploymentService.create_deployment("Test Deployment", 512, 2, 0, 1, "path/to/docker", "c1", 1)
+        assert status == "queued"
+        assert mock_enqueue.call_args_list == [(([('P1:{cluster:1}', 7, 2, 512, 0)],),)] * 2
+        mock_publish.assert_called_once_with("enqueue", 1, 5, [7])
+
+        # Never queued: rejected instead of left queued in the database only, for a cluster or an organization
+        for any_cluster, queue in ((False, 'P1:{cluster:1}'), (True, 'P1:{org:5}')):
+            mock_publish.reset_mock()
+            mock_enqueue.reset_mock()
+            mock_enqueue.side_effect = [[False], ConnectionError("Connection refused")]
+            mock_deployment_query.filter.return_value.all.side_effect = lambda: [mock_session.add.call_args[0][0]]
+            with pytest.raises(ValueError, match="could not be queued"):
+                DeploymentService.create_deployment("Test Deployment", 512, 2, 0, 1, "path/to/docker", "c1", 1, any_cluster=any_cluster)
+            assert mock_enqueue.call_count == 2
+            assert mock_enqueue.call_args[0][0] == [(queue, 7, 2, 512, 0)]
+            assert mock_session.add.call_args[0][0].status == 'rejected'
+            mock_publish.assert_not_called()